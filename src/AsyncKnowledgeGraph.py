@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from pandas import DataFrame
+from backends import AllegroGraphBackend
+from cache import QueryCache
+from helper import related_event_ids, vessels_from_data
+from KnowledgeGraph import KnowledgeGraph
+from schema import Cluster, Vessel
+
+class AsyncKnowledgeGraph:
+    """
+    Asyncio front end to KnowledgeGraph. Queries run in worker threads over a pool of connections,
+    with at most pool_size in flight at once, and return the same results as the sync API.
+    """
+
+    def __init__(self, repo_name: str = None, backend_factory = None, pool_size: int = 4, cache: QueryCache = None):
+        """
+        Opens pool_size connections to an AllegroGraph repository by name, or calls backend_factory()
+        once per connection (it may return one shared backend, e.g. an RDFLibBackend). An optional
+        QueryCache is shared by every connection, and so are the event and zone indexes, which
+        are built once, by the first connection.
+        """
+        if backend_factory is None:
+            backend_factory = lambda: AllegroGraphBackend(repo_name)
+
+        self.kgs = [KnowledgeGraph(backend = backend_factory(), cache = cache) for _ in range(pool_size)]
+        self.pool = None
+
+        for method in ("event_index", "zone_index"):
+            index = self._shared(getattr(self.kgs[0], method))
+            for kg in self.kgs:
+                setattr(kg, method, index)
+
+    def _shared(self, build):
+        """Wraps an index method so concurrent callers wait for a single build instead of each running it"""
+        lock = threading.Lock()
+
+        def index():
+            with lock:
+                return build()
+        return index
+
+    def invalidate_cache(self):
+        """Drops cached query results and the shared indexes, e.g. after the repository is updated"""
+        self.kgs[0].invalidate_cache()
+
+    async def _call(self, method: str, *args, **kwargs):
+        """Runs a KnowledgeGraph method on a free connection from the pool"""
+        if self.pool is None:
+            self.pool = asyncio.Queue()
+            for kg in self.kgs:
+                self.pool.put_nowait(kg)
+
+        kg = await self.pool.get()
+        try:
+            return await asyncio.to_thread(getattr(kg, method), *args, **kwargs)
+        finally:
+            self.pool.put_nowait(kg)
+
+    async def extract_vessels(self) -> list[str]:
+        """Extract all vessel ids"""
+        return await self._call("extract_vessels")
+
+    async def vessel_info(self, vessel_id: str) -> DataFrame:
+        """Extract vessel data"""
+        return await self._call("vessel_info", vessel_id)
+
+    async def extract_trajectory_sequences(self, vessel_id: str) -> list[str]:
+        """Extract trajectory sequences ids for each vessel"""
+        return await self._call("extract_trajectory_sequences", vessel_id)
+
+    async def extract_observations(self, traj_seq_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Extract observations from trajectory sequence"""
+        return await self._call("extract_observations", traj_seq_id, start, end, bbox)
+
+    async def observation_info(self, observation_id: str) -> DataFrame:
+        """Extract observation data"""
+        return await self._call("observation_info", observation_id)
+
+    async def event_info(self, event_id: str) -> DataFrame:
+        """Extract information about an event"""
+        return await self._call("event_info", event_id)
+
+    async def related_gap_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Return list of AIS gap events related to a vessel"""
+        return (await self.related_events("gap", [vessel_id], start, end, bbox))[vessel_id]
+
+    async def related_port_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of port visit events related to a vessel"""
+        return (await self.related_events("port", [vessel_id], start, end, bbox))[vessel_id]
+
+    async def related_fishing_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of fishing events related to a vessel"""
+        return (await self.related_events("fishing", [vessel_id], start, end, bbox))[vessel_id]
+
+    async def related_weather_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of weather events related to a vessel"""
+        return (await self.related_events("weather", [vessel_id], start, end, bbox))[vessel_id]
+
+    async def related_events(self, kind: str, vessel_ids: list[str], start = None, end = None, bbox: tuple = None) -> dict[str, list[str]]:
+        """Returns {vessel id: list of related event ids} for one kind of event"""
+        return await self._call("related_events", kind, vessel_ids, start, end, bbox)
+
+    async def find_related_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> tuple:
+        """Returns a list of events (1 list for each event type) related to a vessel"""
+        return (await self.find_related_events_batch([vessel_id], start, end, bbox))[vessel_id]
+
+    async def find_related_events_batch(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None) -> dict[str, tuple]:
+        """Returns {vessel id: (gap, port, fishing, weather)}, running the event kinds concurrently"""
+        kinds = KnowledgeGraph.RELATED_EVENTS
+        results = await asyncio.gather(*(self.related_events(kind, vessel_ids, start, end, bbox) for kind in kinds))
+        related = dict(zip(kinds, results))
+        return {
+            vessel_id: tuple(related[kind][vessel_id] for kind in kinds)
+            for vessel_id in vessel_ids
+        }
+
+    async def find_nearby_vessels(self, vessel_id: str, time_thresh: int = 600, dist_thresh: int = 30, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of nearby vessels"""
+        return await self._call("find_nearby_vessels", vessel_id, time_thresh, dist_thresh, start, end, bbox)
+
+    async def nearby_graph(self, vessel_ids: list[str] = None, time_thresh: int = 600, dist_thresh: int = 30, start = None, end = None, bbox: tuple = None) -> dict[str, list[str]]:
+        """Returns {vessel id: list of nearby vessels} for many vessels"""
+        return await self._call("nearby_graph", vessel_ids, time_thresh, dist_thresh, start, end, bbox)
+
+    async def hydrate(self, vessel_ids: list[str], event_ids: list[str], start = None, end = None, bbox: tuple = None) -> dict[str, DataFrame]:
+        """Same as KnowledgeGraph.hydrate, with every query running concurrently"""
+        by_kind = {}
+        for event_id in dict.fromkeys(event_ids):
+            by_kind.setdefault(self.kgs[0].event_kind(event_id), []).append(event_id)
+
+        vessels, observations, predictions, *events = await asyncio.gather(
+            self._call("vessels_info", vessel_ids),
+            self._call("vessels_observations", vessel_ids, "ais", start, end, bbox),
+            self._call("vessels_observations", vessel_ids, "prediction", start, end, bbox),
+            *(self._call("events_info", ids) for ids in by_kind.values())
+        )
+
+        data = {"vessels": vessels, "observations": observations, "predictions": predictions}
+        for frames in events:
+            data.update(frames)
+        return data
+
+    async def construct_vessels(self, events: dict[str, list], start = None, end = None, bbox: tuple = None) -> dict[str, Vessel]:
+        """Constructs vessel objects for many vessels at once"""
+        data = await self.hydrate(list(events), related_event_ids(events), start, end, bbox)
+        return vessels_from_data(events, data)
+
+    async def construct_cluster(self, vessel_id: str, neighbors: list[str], events: list, start = None, end = None, bbox: tuple = None) -> Cluster:
+        """Constructs a cluster given a vessel id, nearby vessels, and related events"""
+        cluster_events = await self.find_related_events_batch([n for n in neighbors if n != vessel_id], start, end, bbox)
+        cluster_events[vessel_id] = events
+
+        vessels = await self.construct_vessels(cluster_events, start, end, bbox)
+
+        return Cluster(
+            vessel = vessels[vessel_id],
+            nearby_vessels = [vessels[neighbor] for neighbor in neighbors]
+        )
@@ -1,14 +1,125 @@
-from franz.openrdf.connect import ag_connect
-from pandas import DataFrame
-from math import radians, sin, cos, asin, sqrt
+import re
+import numpy as np
+from math import nan
+from pandas import DataFrame, Timestamp, concat
+from backends import AllegroGraphBackend, RDFLibBackend
+from cache import QueryCache
+from geodesic import within
+from geometry import parse_wkt
+from intervals import EventIndex
+from metrics import traced
+from proximity import proximity_join, to_seconds
+from results import iter_decode, decode, lexical, local_name
+from zones import ZoneIndex
+
+DAY = 24 * 60 * 60
+
+XSD_DATETIME = "<http://www.w3.org/2001/XMLSchema#dateTime>"
 
 class KnowledgeGraph:
-    # Regex pattern for extracting ids
-    PATTERN = r".*#(\w+)>"
-
-    def __init__(self, repo_name):
-        self.connection = ag_connect(repo_name)
+    # Maximum number of ids bound in a single VALUES block
+    VALUES_CHUNK = 1000
+
+    # Related event kinds, in the order find_related_events returns them
+    RELATED_EVENTS = ("gap", "port", "fishing", "weather")
+
+    # Output column -> predicate, for each kind of observation
+    OBSERVATION_PROPERTIES = {
+        "ais": {
+            "lat": "lat",
+            "lon": "lon",
+            "speed": "speed",
+            "course": "course",
+            "port_dist": "distanceFromPort_km",
+            "shore_dist": "distanceFromShore_km",
+            "time": "timestamp"
+        },
+        "prediction": {
+            "lat": "lat",
+            "lon": "lon",
+            "speed": "sog",
+            "course": "cog",
+            "time": "timestamp"
+        }
+    }
+
+    # Output column -> predicate, for each kind of event
+    EVENT_PROPERTIES = {
+        "gap": {
+            "type": "eventType",
+            "location": "location",
+            "start": "startTime",
+            "end": "endTime",
+            "gap_distance": "gapDistance_km",
+            "gap_duration": "gapDuration_hours",
+            "gap_speed": "gapImpliedSpeed_knots",
+            "gap_intentional": "gapIntentionalDisabling",
+            "participant": "participantMembership"
+        },
+        "port": {
+            "type": "eventType",
+            "port": "portName",
+            "location": "location",
+            "start": "startTime",
+            "end": "endTime",
+            "port_dist": "startDistanceFromPort_km",
+            "shore_dist": "startDistanceFromShore_km"
+        },
+        "fishing": {
+            "type": "eventType",
+            "location": "location",
+            "start": "startTime",
+            "end": "endTime",
+            "score": "fishingEffortScore",
+            "gear_type": "gearType"
+        },
+        "weather": {
+            "type": "eventType",
+            "location": "location",
+            "start": "startTime",
+            "end": "endTime",
+            "weather": "weatherType",
+            "severity": "severity"
+        }
+    }
+
+    # Links a neighborhood expansion follows from subject to object (e.g. vessel -> type, event -> zone -> geometry)
+    NEIGHBOR_FORWARD = (
+        "vesselType", "location", "zoneGeometry", "berthGeometry", "weatherGeometry", "hasGeometry", "patternType",
+        "hasProvenance", "participantMembership", "memberVessel", "memberOf", "usesObservation"
+    )
+
+    # Links a neighborhood expansion follows from object back to subject (e.g. vessel <- trajectory, zone <- event).
+    # Hubs such as vessel types and provenance sources are never expanded backwards
+    NEIGHBOR_BACKWARD = ("forVessel", "memberVessel", "participantMembership", "location")
+
+    # Literal properties by which a seed can be named instead of by id
+    SEED_LABELS = ("vesselName", "zoneCode", "mmsi")
+
+    def __init__(self, repo_name: str = None, backend = None, cache: QueryCache = None):
+        """
+        Connects to an AllegroGraph repository by name, or runs against any backend
+        exposing rows(query) and construct(query) (e.g. RDFLibBackend for local files).
+        If a QueryCache is given, results are cached by query text.
+        """
+        self.backend = backend if backend is not None else AllegroGraphBackend(repo_name)
+        self.cache = cache
+        self._zone_index = None
+        self._event_index = None
+
+    @classmethod
+    def from_files(cls, *paths: str) -> "KnowledgeGraph":
+        """Creates a knowledge graph served by an embedded store loaded from local RDF files"""
+        return cls(backend = RDFLibBackend(*paths))
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "KnowledgeGraph":
+        """Creates a read-only knowledge graph served from a columnar snapshot (see snapshot.export)"""
+        from snapshot import SnapshotKnowledgeGraph
+
+        return SnapshotKnowledgeGraph(path)
     
+    @traced
     def extract_vessels(self) -> list[str]:
         """Extract all vessel ids"""
         query = f"""
@@ -17,15 +128,11 @@ class KnowledgeGraph:
                 ?vessel a :VesselIdentity 
             }}
         """
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
+        df = self._select(query)
 
-        if df.empty:
-            vessels = []
-        else:
-            vessels = list(df["vessel"].str.extract(self.PATTERN, expand = False))
-        return vessels
+        return list(df["vessel"])
 
+    @traced
     def vessel_info(self, vessel_id: str) -> DataFrame:
         """Extract vessel data"""
         query = f"""
@@ -37,13 +144,9 @@ class KnowledgeGraph:
                     :vesselType ?type
             }}
         """
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
-        
-        if not df.empty:
-            df["type"] = df["type"].str.extract(self.PATTERN, expand = False)
-        return df
+        return self._select(query)
 
+    @traced
     def extract_trajectory_sequences(self, vessel_id: str) -> list[str]:
         """Extract trajectory sequences ids for each vessel"""
         query = f"""
@@ -53,160 +156,193 @@ class KnowledgeGraph:
                     :forVessel :{vessel_id}
             }}
         """
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
+        df = self._select(query)
 
-        if df.empty:
-            trajectory_sequences = []
-        else:
-            trajectory_sequences = list(df["trajectory"].str.extract(self.PATTERN, expand = False))
-        return trajectory_sequences
+        return list(df["trajectory"])
 
-    def extract_observations(self, traj_seq_id: str) -> list[str]:
-        """Extract observations from trajectory sequence"""
+    @traced
+    def extract_observations(self, traj_seq_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """
+        Extract observations from trajectory sequence, optionally only those between start and end
+        and inside bbox (min_lon, min_lat, max_lon, max_lat)
+        """
         query = f"""
             SELECT ?observations
             WHERE {{
                 :{traj_seq_id} 
-                    :usesObservation ?observations 
+                    :usesObservation ?observations .
+                {self._scope_patterns("observations", start, end, bbox)}
             }}
             ORDER BY ?observations
         """
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
+        df = self._select(query)
 
-        if df.empty:
-            observations = []
-        else:
-            observations = list(df["observations"].str.extract(self.PATTERN, expand = False))
-        return observations
+        return list(df["observations"])
 
+    @traced
     def observation_info(self, observation_id: str) -> DataFrame:
         """Extract observation data"""
-        if observation_id[:3] == "ais":
-            query = f"""
-                SELECT ?lat ?lon ?speed ?course ?port_dist ?shore_dist ?time
-                WHERE {{
-                    :{observation_id} 
-                        :lat ?lat ;
-                        :lon ?lon ;
-                        :speed ?speed ;
-                        :course ?course ;
-                        :distanceFromPort_km ?port_dist ;
-                        :distanceFromShore_km ?shore_dist ;
-                        :timestamp ?time
-                }}
-            """
-        else:
-            query = f"""
-                SELECT ?lat ?lon ?speed ?course ?time
-                WHERE {{
-                    :{observation_id} 
-                        :lat ?lat ;
-                        :lon ?lon ;
-                        :sog ?speed ;
-                        :cog ?course ;
-                        :timestamp ?time
-                }}
-            """
-
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
-        return df
-
-    def related_gap_events(self, vessel_id: str) -> list[str]:
-        """Return list of AIS gap events related to a vessel"""
+        kind = "ais" if observation_id[:3] == "ais" else "prediction"
         query = f"""
-            SELECT ?event
+            SELECT {self._select_vars(self.OBSERVATION_PROPERTIES[kind])}
             WHERE {{
-                ?event a :Event ;
-                    :eventType "AISGapEvent" ;
-                    :participantMembership ?membership .
-                ?membership
-                    :memberVessel :{vessel_id}
+                :{observation_id} 
+                    {self._property_patterns(self.OBSERVATION_PROPERTIES[kind])}
             }}
         """
 
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
+        df = self._select(query)
+        return df
 
-        if df.empty:
-            gap_events = []
-        else:
-            gap_events = list(df["event"].str.extract(self.PATTERN, expand = False))
-        return gap_events
+    @traced
+    def related_gap_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Return list of AIS gap events related to a vessel"""
+        return self.related_events("gap", [vessel_id], start, end, bbox)[vessel_id]
 
-    def related_port_events(self, vessel_id: str) -> list[str]:
+    @traced
+    def related_port_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
         """Returns a list of port visit events related to a vessel"""
-        trajectory_sequences = self.extract_trajectory_sequences(vessel_id)
-        port_visit_events = set()
+        return self.related_events("port", [vessel_id], start, end, bbox)[vessel_id]
 
-        for seq in trajectory_sequences:
-            query = f"""
-                SELECT ?event ?obs_last_lat ?obs_last_lon ?port_lat ?port_lon
-                WHERE {{
-                    :{seq}
-                        :hasFirstObservation ?obs_first ;
-                        :hasLastObservation ?obs_last .
+    @traced
+    def related_fishing_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of fishing events related to a vessel"""
+        return self.related_events("fishing", [vessel_id], start, end, bbox)[vessel_id]
 
-                    ?obs_first
-                        :timestamp ?traj_start .
-                    ?obs_last
-                        :timestamp ?traj_end ;
-                        :lat ?obs_last_lat ;
-                        :lon ?obs_last_lon .
-                    
-                    ?event a :Event ;
-                        :eventType "PortVisitEvent" ;
-                        :startTime ?event_start ;
-                        :endTime   ?event_end ;
-                        :berthGeometry ?geom .
-
-                    ?geom :asWKT ?wkt .
-
-                    # Parse WKT "POINT(lon lat)"
-                    BIND(REPLACE(?wkt, "POINT\\\\(|\\\\)", "") AS ?coords)
-                    BIND(STRBEFORE(?coords, " ") AS ?lon_str)
-                    BIND(STRAFTER(?coords, " ") AS ?lat_str)
-                    BIND(xsd:decimal(?lon_str) AS ?port_lon)
-                    BIND(xsd:decimal(?lat_str) AS ?port_lat)
-
-                    BIND(STRBEFORE(STR(?traj_start), "T") AS ?traj_start_date)
-                    BIND(STRBEFORE(STR(?traj_end), "T") AS ?traj_end_date)
-                    BIND(STRBEFORE(STR(?event_start), "T") AS ?event_start_date)
-                    BIND(STRBEFORE(STR(?event_end), "T") AS ?event_end_date)
+    @traced
+    def related_weather_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Returns a list of weather events related to a vessel"""
+        return self.related_events("weather", [vessel_id], start, end, bbox)[vessel_id]
 
-                    FILTER(?traj_start_date <= ?event_end_date && ?event_start_date <= ?traj_end_date)
+    @traced
+    def find_related_events(self, vessel_id: str, start = None, end = None, bbox: tuple = None) -> tuple:
+        """Returns a list of events (1 list for each event type) related to a vessel"""
+        return self.find_related_events_batch([vessel_id], start, end, bbox)[vessel_id]
 
+    @traced
+    def find_related_events_batch(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None) -> dict[str, tuple]:
+        """
+        Returns {vessel id: (gap, port, fishing, weather)} for many vessels,
+        with one query per event kind across all of their trajectory sequences
+        """
+        # The port, fishing and weather matchers all start from the same trajectory windows
+        windows = self.trajectory_windows(vessel_ids, start, end, bbox)
+        related = {kind: self.related_events(kind, vessel_ids, start, end, bbox, windows) for kind in self.RELATED_EVENTS}
+        return {
+            vessel_id: tuple(related[kind][vessel_id] for kind in self.RELATED_EVENTS)
+            for vessel_id in vessel_ids
+        }
+
+    @traced
+    def related_events(
+        self,
+        kind: str,
+        vessel_ids: list[str],
+        start = None,
+        end = None,
+        bbox: tuple = None,
+        windows: DataFrame = None
+    ) -> dict[str, list[str]]:
+        """
+        Returns {vessel id: list of related event ids} for one kind of event.
+        Each kind is matched by a _match_<kind>_events method returning (vessel, event) rows,
+        so supporting a new event type means adding it to RELATED_EVENTS and writing its matcher.
+        With start / end, only events overlapping that window are matched; with bbox
+        (min_lon, min_lat, max_lon, max_lat), only trajectories ending inside it. windows, the
+        trajectory_windows of the same vessels and scope, saves matchers querying them again.
+        """
+        matches = getattr(self, f"_match_{kind}_events")(vessel_ids, start, end, bbox, windows)
+        related = {vessel_id: [] for vessel_id in vessel_ids}
+
+        if not matches.empty:
+            matches = matches[["vessel", "event"]].drop_duplicates()
+            for vessel_id, event in zip(matches["vessel"], matches["event"]):
+                related[vessel_id].append(event)
+        return related
+
+    def _match_gap_events(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None, windows: DataFrame = None) -> DataFrame:
+        """AIS gap events the vessel participates in (gap events have no coordinates, so bbox does not apply)"""
+        return self._select_values(
+            lambda values: f"""
+                SELECT ?vessel ?event
+                WHERE {{
+                    {values}
+                    ?event a :Event ;
+                        :eventType "AISGapEvent" ;
+                        :participantMembership ?membership .
+                    ?membership
+                        :memberVessel ?vessel .
+                    {self._overlap_patterns("event", start, end)}
                 }}
-            """
-            with self.connection.executeTupleQuery(query) as result:
-                df = result.toPandas()
-
-            if not df.empty:
-                df["event"] = df["event"].str.extract(self.PATTERN, expand = False)
-
-                dist_mask = df.apply(
-                    lambda r: self.is_nearby(r["obs_last_lat"], r["obs_last_lon"], r["port_lat"], r["port_lon"], 30.0),
-                    axis=1
-                )
-
-                port_visit_events.update(df[dist_mask]["event"].tolist())
-        
-        return list(port_visit_events)
-
-    def related_fishing_events(self, vessel_id: str) -> list[str]:
-        trajectory_sequences = self.extract_trajectory_sequences(vessel_id)
-        fishing_events = set()
-
-        for seq in trajectory_sequences:
-            query = f"""
-                PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-                PREFIX geof: <http://www.opengis.net/def/function/geosparql/>
+            """,
+            "vessel",
+            vessel_ids
+        )
 
-                SELECT ?event 
+    def _match_port_events(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None, windows: DataFrame = None) -> DataFrame:
+        """Port visits overlapping a trajectory (by date) whose last observation is within 30 km of the berth"""
+        if windows is None:
+            windows = self.trajectory_windows(vessel_ids, start, end, bbox)
+        if windows.empty:
+            return DataFrame(columns = ["vessel", "event"])
+
+        # Compare whole UTC days: [first day 00:00, last day 24:00)
+        starts, ends = self._clip_windows(windows, start, end)
+        starts = np.floor(starts / DAY) * DAY
+        ends = np.floor(ends / DAY) * DAY + DAY - 1e-3
+
+        index = self.event_index()
+        pairs = index.overlapping("PortVisitEvent", starts, ends)
+        df = self._pair_rows(windows, index.events, pairs).dropna(subset = ["geom_lat", "geom_lon"])
+
+        dist_mask = within(df["last_lat"], df["last_lon"], df["geom_lat"], df["geom_lon"], 30.0)
+        return df[dist_mask]
+
+    def _match_fishing_events(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None, windows: DataFrame = None) -> DataFrame:
+        """Fishing events overlapping a trajectory whose last observation is inside the event zone"""
+        return self._match_zone_events("FishingEvent", vessel_ids, start, end, bbox, windows)
+
+    def _match_weather_events(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None, windows: DataFrame = None) -> DataFrame:
+        """Weather events overlapping a trajectory whose last observation is inside the event zone"""
+        return self._match_zone_events("WeatherEvent", vessel_ids, start, end, bbox, windows)
+
+    def _match_zone_events(
+        self,
+        event_type: str,
+        vessel_ids: list[str],
+        start = None,
+        end = None,
+        bbox: tuple = None,
+        windows: DataFrame = None
+    ) -> DataFrame:
+        """Events of event_type overlapping a trajectory whose last observation is inside the event's zone"""
+        if windows is None:
+            windows = self.trajectory_windows(vessel_ids, start, end, bbox)
+        if windows.empty:
+            return DataFrame(columns = ["vessel", "event"])
+
+        # Zone membership of every trajectory's last observation, in one vectorized lookup
+        membership = self.zone_index().lookup(windows["last_lat"], windows["last_lon"])
+        windows = windows.iloc[membership["point"]].reset_index(drop = True).assign(zone = membership["zone"].to_numpy())
+
+        index = self.event_index()
+        starts, ends = self._clip_windows(windows, start, end)
+        pairs = index.overlapping(event_type, starts, ends, zones = windows["zone"])
+        return self._pair_rows(windows, index.events, pairs)
+
+    @traced
+    def trajectory_windows(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Start time, end time and last position of every trajectory sequence of many vessels,
+        optionally only trajectories overlapping start / end whose last position is inside bbox
+        """
+        df = self._select_values(
+            lambda values: f"""
+                SELECT ?vessel ?trajectory ?traj_start ?traj_end ?last_lat ?last_lon
                 WHERE {{
-                    :{seq}
+                    {values}
+                    ?trajectory a :TrajectorySequence ;
+                        :forVessel ?vessel ;
                         :hasFirstObservation ?obs_first ;
                         :hasLastObservation ?obs_last .
 
@@ -214,234 +350,524 @@ class KnowledgeGraph:
                         :timestamp ?traj_start .
                     ?obs_last
                         :timestamp ?traj_end ;
-                        :lat ?obs_last_lat ;
-                        :lon ?obs_last_lon .
-                    
-                    ?event a :Event ;
-                        :eventType "FishingEvent" ;
-                        :startTime ?event_start ;
-                        :endTime   ?event_end ;
-                        :location ?location .
-                    
-                    ?location
-                        :zoneGeometry ?zoneGeom .
-
-                    ?zoneGeom geo:asWKT ?polyWKT .
-                    BIND(
-                        STRDT(
-                            CONCAT("<http://www.opengis.net/def/crs/EPSG/0/4326> POINT(",
-                                    STR(?obs_last_lon), " ", STR(?obs_last_lat), ")"),
-                            geo:wktLiteral
-                        ) AS ?ptWKT
-                    )
-
-                    FILTER( geof:sfContains(?polyWKT, ?ptWKT) )
-                    FILTER(?traj_start <= ?event_end && ?event_start <= ?traj_end)
-
+                        :lat ?last_lat ;
+                        :lon ?last_lon .
+                    {self._scope_filter(None, "last_lat", "last_lon", None, None, bbox)}
+                    {self._scope_filter("traj_end", None, None, start, None, None)}
+                    {self._scope_filter("traj_start", None, None, None, end, None)}
                 }}
-            """
-            with self.connection.executeTupleQuery(query) as result:
-                df = result.toPandas()
-            if not df.empty:
-                df["event"] = df["event"].str.extract(self.PATTERN, expand = False)
-
-            fishing_events.update(list(df["event"]))
-        return list(fishing_events)
-
-    def related_weather_events(self, vessel_id: str) -> list[str]:
-        """Returns a list of weather events related to a vessel"""
-        trajectory_sequences = self.extract_trajectory_sequences(vessel_id)
-        weather_events = set()
-
-        for seq in trajectory_sequences:
-            query = f"""
-                PREFIX geo: <http://www.opengis.net/ont/geosparql#>
-                PREFIX geof: <http://www.opengis.net/def/function/geosparql/>
+            """,
+            "vessel",
+            vessel_ids
+        )
+        return df
 
-                SELECT ?event 
-                WHERE {{
-                    :{seq}
-                        :hasFirstObservation ?obs_first ;
-                        :hasLastObservation ?obs_last .
+    @traced
+    def event_index(self) -> EventIndex:
+        """
+        Returns the interval index over all events (by type and zone), loading them on first use.
+        Events with a point berth geometry get its coordinates as geom_lat / geom_lon.
+        """
+        if self._event_index is None:
+            df = self._event_rows()
+            points = [parse_wkt(wkt)[1][0][0] if isinstance(wkt, str) and wkt.startswith("POINT") else (nan, nan) for wkt in df["wkt"]]
+            df["geom_lon"] = [point[0] for point in points]
+            df["geom_lat"] = [point[1] for point in points]
+
+            self._event_index = EventIndex(df)
+        return self._event_index
+
+    @traced
+    def zone_index(self) -> ZoneIndex:
+        """Returns the index of all zone polygons, loading and parsing them on first use"""
+        if self._zone_index is None:
+            self._zone_index = ZoneIndex(self._zone_rows())
+        return self._zone_index
+
+    def _event_rows(self) -> DataFrame:
+        """Type, start / end time, location and berth WKT (if any) of every event"""
+        query = f"""
+            SELECT ?event ?type ?start ?end ?location ?wkt
+            WHERE {{
+                ?event a :Event ;
+                    :eventType ?type ;
+                    :startTime ?start ;
+                    :endTime ?end .
+                OPTIONAL {{ ?event :location ?location }}
+                OPTIONAL {{ ?event :berthGeometry ?geom . ?geom :asWKT ?wkt }}
+            }}
+        """
+        df = self._select(query)
+        return df if not df.empty else DataFrame(columns = ["event", "type", "start", "end", "location", "wkt"])
 
-                    ?obs_first
-                        :timestamp ?traj_start .
-                    ?obs_last
-                        :timestamp ?traj_end ;
-                        :lat ?obs_last_lat ;
-                        :lon ?obs_last_lon .
-                    
-                    ?event a :Event ;
-                        :eventType "WeatherEvent" ;
-                        :startTime ?event_start ;
-                        :endTime   ?event_end ;
-                        :location ?location .
-                    
-                    ?location
-                        :zoneGeometry ?zoneGeom .
-
-                    ?zoneGeom geo:asWKT ?polyWKT .
-                    BIND(
-                        STRDT(
-                            CONCAT("<http://www.opengis.net/def/crs/EPSG/0/4326> POINT(",
-                                    STR(?obs_last_lon), " ", STR(?obs_last_lat), ")"),
-                            geo:wktLiteral
-                        ) AS ?ptWKT
-                    )
-
-                    FILTER( geof:sfContains(?polyWKT, ?ptWKT) )
-                    FILTER(?traj_start <= ?event_end && ?event_start <= ?traj_end)
+    def _zone_rows(self) -> DataFrame:
+        """Id and WKT geometry of every zone"""
+        query = f"""
+            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
 
-                }}
-            """
-            with self.connection.executeTupleQuery(query) as result:
-                df = result.toPandas()
-            if not df.empty:
-                df["event"] = df["event"].str.extract(self.PATTERN, expand = False)
+            SELECT ?zone ?wkt
+            WHERE {{
+                ?zone a :Zone ;
+                    :zoneGeometry ?geom .
+                ?geom geo:asWKT ?wkt .
+            }}
+        """
+        df = self._select(query)
+        return df if not df.empty else DataFrame(columns = ["zone", "wkt"])
 
-            weather_events.update(list(df["event"]))
-        return list(weather_events)
+    @traced
+    def movement_patterns(self) -> DataFrame:
+        """Returns the id and WKT geometry of every reference MovementPattern"""
+        query = f"""
+            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
 
-    def find_related_events(self, vessel_id: str) -> tuple:
-        """Returns a list of events (1 list for each event type) related to a vessel"""
-        gap_events = self.related_gap_events(vessel_id)
-        port_events = self.related_port_events(vessel_id)
-        fishing_events = self.related_fishing_events(vessel_id)
-        weather_events = self.related_weather_events(vessel_id)
+            SELECT ?pattern ?wkt
+            WHERE {{
+                ?pattern a :MovementPattern ;
+                    :hasGeometry ?geom .
+                ?geom geo:asWKT ?wkt .
+            }}
+            ORDER BY ?pattern
+        """
+        df = self._select(query)
+        return df if not df.empty else DataFrame(columns = ["pattern", "wkt"])
 
-        return gap_events, port_events, fishing_events, weather_events
+    @traced
+    def occupied_tiles(self, tile_degrees: float, start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Returns the tile_degrees lat / lon tiles holding AIS observations (tile_lat, tile_lon: tile index,
+        i.e. floor(coordinate / tile_degrees)) with the first and last observation time and count in each,
+        optionally only counting observations between start and end and inside bbox
+        """
+        query = f"""
+            SELECT ?tile_lat ?tile_lon (MIN(?time) AS ?first) (MAX(?time) AS ?last) (COUNT(?obs) AS ?count)
+            WHERE {{
+                ?obs a :AISObservation ;
+                    :lat ?lat ;
+                    :lon ?lon ;
+                    :timestamp ?time .
+                {self._scope_filter("time", "lat", "lon", start, end, bbox)}
+                BIND(FLOOR(?lat / {float(tile_degrees)}) AS ?tile_lat)
+                BIND(FLOOR(?lon / {float(tile_degrees)}) AS ?tile_lon)
+            }}
+            GROUP BY ?tile_lat ?tile_lon
+            ORDER BY ?tile_lat ?tile_lon
+        """
+        df = self._select(query)
+        return df if not df.empty else DataFrame(columns = ["tile_lat", "tile_lon", "first", "last", "count"])
 
-    def find_nearby_vessels(self, vessel_id: str, time_thresh: int = 600, dist_thresh: int = 30) -> list[str]:
+    @traced
+    def find_nearby_vessels(self, vessel_id: str, time_thresh: int = 600, dist_thresh: int = 30, start = None, end = None, bbox: tuple = None) -> list[str]:
         """
         Returns a list of nearby vessels
         2 vessels are nearby if they're in the same location at some point in time
         """
-        nearby_vessels = set()
-        query = f"""
-            PREFIX geof:<http://www.opengis.net/def/function/geosparql/>
-            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
+        return self.nearby_graph([vessel_id], time_thresh, dist_thresh, start, end, bbox)[vessel_id]
+
+    @traced
+    def nearby_graph(
+        self,
+        vessel_ids: list[str] = None,
+        time_thresh: int = 600,
+        dist_thresh: int = 30,
+        start = None,
+        end = None,
+        bbox: tuple = None
+    ) -> dict[str, list[str]]:
+        """
+        Returns {vessel id: list of nearby vessels} for many vessels (all vessels if vessel_ids is None),
+        computed from one pass over the AIS observations.
+        With start / end and bbox (min_lon, min_lat, max_lon, max_lat), only observations in that
+        window and area are pulled and compared.
+        """
+        # Pull every AIS observation once (linear in observation count) and join client-side
+        df = self._observation_points(start, end, bbox)
 
-            SELECT ?vessel ?t1 ?t2 ?lat1 ?lon1 ?lat2 ?lon2
-            WHERE {{
-                :{vessel_id}
-                    :mmsi ?v1 .
+        if vessel_ids is None:
+            vessel_ids = self.extract_vessels()
+        nearby = {vessel_id: {} for vessel_id in vessel_ids}
+
+        if df.empty:
+            return {vessel_id: [] for vessel_id in vessel_ids}
 
-                ?o1 a :AISObservation ; :mmsi ?v1 ; :lat ?lat1 ; :lon ?lon1 ; :timestamp ?t1 .
-                ?o2 a :AISObservation ; :mmsi ?v2 ; :lat ?lat2 ; :lon ?lon2 ; :timestamp ?t2 .
+        df["mmsi"] = df["mmsi"].astype(str)
 
-                ?vessel a :VesselIdentity ;
-                    :mmsi ?v2 .
+        vessels_by_mmsi = df.groupby("mmsi")["vessel"].unique().to_dict()
+        points = df[["mmsi", "time", "lat", "lon"]].drop_duplicates()
+        target_mmsi = set(df.loc[df["vessel"].isin(nearby), "mmsi"])
 
-                FILTER(?v1 != ?v2)
-            }}
-        """
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
-        if not df.empty:
-            df["vessel"] = df["vessel"].str.extract(self.PATTERN, expand = False)
-            same_time = (df["t1"]- df["t2"]).abs().dt.total_seconds() <= time_thresh
+        # Only pairs sharing a time window and a spatial grid neighborhood are materialized
+        pairs = proximity_join(points[points["mmsi"].isin(target_mmsi)], points, time_thresh, dist_thresh)
 
-        dist_mask = df.apply(
-            lambda r: self.is_nearby(r["lat1"], r["lon1"], r["lat2"], r["lon2"], dist_thresh),
-            axis=1
-        )
+        if not pairs.empty:
+            dist_mask = within(pairs["lat1"], pairs["lon1"], pairs["lat2"], pairs["lon2"], dist_thresh)
+            hits = pairs[dist_mask & (pairs["mmsi1"] != pairs["mmsi2"])]
 
-        hits = df[same_time & dist_mask]
-        # ?v2 is the MMSI literal already
-        nearby_vessels.update(hits["vessel"].astype(str).tolist())
-        return list(nearby_vessels)
+            for mmsi1, mmsi2 in hits[["mmsi1", "mmsi2"]].drop_duplicates().itertuples(index = False):
+                for vessel in vessels_by_mmsi[mmsi1]:
+                    if vessel in nearby:
+                        nearby[vessel].update(dict.fromkeys(vessels_by_mmsi[mmsi2]))
 
+        return {vessel_id: list(neighbors) for vessel_id, neighbors in nearby.items()}
+
+    def _observation_points(self, start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """Vessel, MMSI, time and position of every AIS observation in scope, matched to vessels by MMSI"""
+        # The observation class is checked with FILTER EXISTS so that ?vessel is the only typed variable:
+        # rdflib orders triple patterns statically, and two independent class patterns become a cross product
+        query = f"""
+            SELECT ?vessel ?mmsi ?time ?lat ?lon
+            WHERE {{
+                ?vessel a :VesselIdentity ;
+                    :mmsi ?mmsi .
+
+                ?obs :mmsi ?mmsi ;
+                    :lat ?lat ;
+                    :lon ?lon ;
+                    :timestamp ?time .
+                FILTER EXISTS {{ ?obs a :AISObservation }}
+                {self._scope_filter("time", "lat", "lon", start, end, bbox)}
+            }}
+        """
+        return self._select(query)
+
+    @traced
     def event_info(self, event_id: str) -> DataFrame:
         """Extract information about an event"""
-        # if gap event
+        properties = self.EVENT_PROPERTIES[self.event_kind(event_id)]
+        query = f"""
+            SELECT {self._select_vars(properties)}
+            WHERE {{
+                :{event_id}
+                    {self._property_patterns(properties)}
+            }}
+        """
+
+        return self._select(query)
+
+    @traced
+    def event_kind(self, event_id: str) -> str:
+        """Returns the kind of an event (gap, port, fishing or weather) from its id"""
         if event_id[:3] == "gap":
-            query = f"""
-                SELECT ?type ?location ?start ?end ?gap_distance ?gap_duration ?gap_speed ?gap_intentional ?participant
-                WHERE {{
-                    :{event_id}
-                        :eventType ?type ;
-                        :location ?location ;
-                        :startTime ?start ;
-                        :endTime ?end ;
-                        :gapDistance_km ?gap_distance ;
-                        :gapDuration_hours ?gap_duration ;
-                        :gapImpliedSpeed_knots ?gap_speed ;
-                        :gapIntentionalDisabling ?gap_intentional ;
-                        :participantMembership ?participant
-                }}
-            """
-        # if port event
+            return "gap"
         elif event_id[:4] == "port":
-            query = f"""
-                SELECT ?type ?port ?location ?start ?end ?port_dist ?shore_dist
-                WHERE {{
-                    :{event_id}
-                        :eventType ?type ;
-                        :portName ?port ;
-                        :location ?location ;
-                        :startTime ?start ;
-                        :endTime ?end ;
-                        :startDistanceFromPort_km ?port_dist ;
-                        :startDistanceFromShore_km ?shore_dist
-                }}
-            """
-        # if fishing event
+            return "port"
         elif event_id[:4] == "fish":
-            query = f"""
-                SELECT ?type ?location ?start ?end ?score ?gear_type
+            return "fishing"
+        return "weather"
+
+    @traced
+    def vessels_info(self, vessel_ids: list[str]) -> DataFrame:
+        """Extract vessel data for many vessels in one query"""
+        return self._select_values(
+            lambda values: f"""
+                SELECT ?vessel ?name ?flag ?type
                 WHERE {{
-                    :{event_id}
-                        :eventType ?type ;
-                        :location ?location ;
-                        :startTime ?start ;
-                        :endTime ?end ;
-                        :fishingEffortScore ?score ;
-                        :gearType ?gear_type
+                    {values}
+                    ?vessel
+                        :vesselName ?name ;
+                        :flag ?flag ;
+                        :vesselType ?type
                 }}
-            """
-        # if weather event
-        else:
-            query = f"""
-                SELECT ?type ?location ?start ?end ?weather ?severity
+            """,
+            "vessel",
+            vessel_ids
+        )
+
+    @traced
+    def vessels_observations(self, vessel_ids: list[str], kind: str = "ais", start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Extract every observation (kind="ais") or prediction (kind="prediction") used by
+        the trajectory sequences of many vessels in one query, ordered by vessel, trajectory and observation,
+        optionally only those between start and end and inside bbox
+        """
+        properties = self.OBSERVATION_PROPERTIES[kind]
+        obs_class = "AISObservation" if kind == "ais" else "PredictedObservation"
+
+        # Anchored on ?vessel (the only class pattern, see nearby_graph) so each vessel's trajectories are
+        # followed directly instead of scanning every observation of the class
+        return self._select_values(
+            lambda values: f"""
+                SELECT ?vessel ?trajectory ?observation {self._select_vars(properties)}
                 WHERE {{
-                    :{event_id}
-                        :eventType ?type ;
-                        :location ?location ;
-                        :startTime ?start ;
-                        :endTime ?end ;
-                        :weatherType ?weather ;
-                        :severity ?severity
+                    {values}
+                    ?vessel a :VesselIdentity .
+                    ?trajectory :forVessel ?vessel ;
+                        :usesObservation ?observation .
+
+                    ?observation
+                        {self._property_patterns(properties)} .
+                    FILTER EXISTS {{ ?observation a :{obs_class} }}
+                    {self._scope_filter("time", "lat", "lon", start, end, bbox)}
                 }}
-            """
+                ORDER BY ?vessel ?trajectory ?observation
+            """,
+            "vessel",
+            vessel_ids
+        )
+
+    @traced
+    def events_info(self, event_ids: list[str]) -> dict[str, DataFrame]:
+        """Extract information about many events, with one query per event kind"""
+        by_kind = {}
+        for event_id in dict.fromkeys(event_ids):
+            by_kind.setdefault(self.event_kind(event_id), []).append(event_id)
+
+        events = {}
+        for kind, ids in by_kind.items():
+            properties = self.EVENT_PROPERTIES[kind]
+            events[kind] = self._select_values(
+                lambda values: f"""
+                    SELECT ?event {self._select_vars(properties)}
+                    WHERE {{
+                        {values}
+                        ?event
+                            {self._property_patterns(properties)}
+                    }}
+                """,
+                "event",
+                ids
+            )
+        return events
+
+    @traced
+    def hydrate(self, vessel_ids: list[str], event_ids: list[str], start = None, end = None, bbox: tuple = None) -> dict[str, DataFrame]:
+        """
+        Fetches everything needed to build Vessel objects for many vessels in a constant number of queries:
+        vessel info, observations, predictions (scoped to start / end and bbox, if given),
+        and one frame of event details per event kind
+        """
+        return {
+            "vessels": self.vessels_info(vessel_ids),
+            "observations": self.vessels_observations(vessel_ids, "ais", start, end, bbox),
+            "predictions": self.vessels_observations(vessel_ids, "prediction", start, end, bbox),
+            **self.events_info(event_ids)
+        }
+
+    @traced
+    def neighborhood(self, seeds: list[str], hops: int = 2, start = None, end = None, limit: int = None) -> DataFrame:
+        """
+        Returns the triples within hops links of the seed nodes (ids, or vessel names / zone codes / MMSIs)
+        in one CONSTRUCT query: every reached node's literal properties and types, and the links walked to reach it
+        (NEIGHBOR_FORWARD / NEIGHBOR_BACKWARD). With start / end, nodes with a timestamp or [startTime, endTime]
+        outside that window are neither returned nor expanded. limit caps the query's solutions; stores evaluating
+        UNION branches in order (rdflib does) then drop the deepest hops first.
+        Rows are subject, predicate, object (IRIs as local names, literals as lexical forms) and literal
+        """
+        ids = [seed for seed in seeds if re.fullmatch(r"[\w\-]+", seed)]
+        labels = " ".join('"' + seed.replace("\\", "\\\\").replace('"', '\\"') + '"' for seed in seeds)
+        paths = "|".join(f":{label}" for label in self.SEED_LABELS)
+        seeds = f"{{ VALUES ?seed {{ {labels} }} ?n0 {paths} ?seed }}"
+        if ids:
+            seeds = f"{{ {self._values('n0', ids)} }} UNION {seeds}"
+
+        template = []
+        branches = []
+        for depth in range(hops + 1):
+            template.append(f"?n{depth} ?a{depth} ?v{depth} .")
+            if depth:
+                template.append(f"?s{depth} ?p{depth} ?o{depth} .")
+            walk = "\n".join(self._hop_patterns(hop, start, end) for hop in range(1, depth + 1))
+            branches.append(f"""{{
+                    {walk}
+                    OPTIONAL {{ ?n{depth} ?a{depth} ?v{depth} FILTER(isLiteral(?v{depth}) || ?a{depth} = rdf:type) }}
+                }}""")
+
+        query = f"""
+            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+
+            CONSTRUCT {{
+                {" ".join(template)}
+            }}
+            WHERE {{
+                {seeds}
+                {" UNION ".join(branches)}
+            }}
+            {f"LIMIT {int(limit)}" if limit is not None else ""}
+        """
+        return self._construct(query)
 
-        with self.connection.executeTupleQuery(query) as result:
-            df = result.toPandas()
+    @traced
+    def invalidate_cache(self):
+        """Drops cached query results and indexes, e.g. after the repository is updated"""
+        if self.cache is not None:
+            self.cache.invalidate()
+        self._zone_index = None
+        self._event_index = None
 
-        if "location" in df.columns:
-            df["location"] = df["location"].str.extract(self.PATTERN, expand = False)
-        
-        if "participant" in df.columns:
-            df["participant"] = df["participant"].str.extract(self.PATTERN, expand = False)
-        
+    def _select(self, query: str) -> DataFrame:
+        """
+        Runs a SELECT query through the cache, if any, then the backend. Results are decoded into typed
+        columns, with IRIs as local names
+        """
+        if self.cache is None:
+            return decode(*self.backend.rows(query), local_names = True)
+
+        df = self.cache.get(query)
+        if df is None:
+            df = decode(*self.backend.rows(query), local_names = True)
+            self.cache.put(query, df)
         return df
 
-    def is_nearby(self, lat1: float, lon1: float, lat2: float, lon2: float, threshold: float = 10.0) -> bool:
+    def _construct(self, query: str) -> DataFrame:
         """
-        Return True if (lat1, lon1) and (lat2, lon2) are within 10 km.
-        Uses the haversine formula with inputs in decimal degrees.
+        Runs a CONSTRUCT query through the cache, if any, then the backend. Triples are decoded into
+        subject, predicate, object (IRIs as local names, literals as lexical forms) and literal columns
         """
-        R = 6371.0088  # Earth's radius in kilometers
+        df = self.cache.get(query) if self.cache is not None else None
+        if df is not None:
+            return df
+
+        columns, triples = self.backend.construct(query)
+        df = DataFrame(triples, columns = columns)
+        literal = [term.startswith('"') for term in df["object"]]
+        df["subject"] = [local_name(term) for term in df["subject"]]
+        df["predicate"] = [local_name(term) for term in df["predicate"]]
+        df["object"] = [lexical(term) if is_literal else local_name(term) for term, is_literal in zip(df["object"], literal)]
+        df["literal"] = np.array(literal, dtype = bool)
+
+        if self.cache is not None:
+            self.cache.put(query, df)
+        return df
 
-        # Convert to radians
-        lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, (lat1, lon1, lat2, lon2))
+    def iter_select(self, query: str, batch_size: int = 50_000):
+        """
+        Runs a SELECT query and yields its results as decoded frames of batch_size rows,
+        for results too large to decode at once. Bypasses the cache
+        """
+        yield from iter_decode(*self.backend.rows(query), local_names = True, batch_size = batch_size)
 
-        # Differences
-        delta_lat = lat2_rad - lat1_rad
-        delta_lon = lon2_rad - lon1_rad
+    def _pair_rows(self, left: DataFrame, right: DataFrame, pairs: DataFrame) -> DataFrame:
+        """Joins the rows of left and right paired by the window / event positions of an overlap query"""
+        return concat([
+            left.iloc[pairs["window"]].reset_index(drop = True),
+            right.drop(columns = [col for col in right.columns if col in left.columns]).iloc[pairs["event"]].reset_index(drop = True)
+        ], axis = 1)
 
-        # Haversine formula
-        a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2) ** 2
-        c = 2 * asin(sqrt(a))
-        distance_km = R * c
+    def _scope_filter(self, time_var: str, lat_var: str, lon_var: str, start = None, end = None, bbox: tuple = None) -> str:
+        """
+        Returns a FILTER keeping bindings of ?time_var between start and end and of ?lat_var / ?lon_var
+        inside bbox (min_lon, min_lat, max_lon, max_lat; min_lon > max_lon crosses the antimeridian).
+        Empty if there is nothing to filter
+        """
+        conditions = []
+        if start is not None:
+            conditions.append(f"?{time_var} >= {self._time_literal(start)}")
+        if end is not None:
+            conditions.append(f"?{time_var} <= {self._time_literal(end)}")
+
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox)
+            conditions.append(f"?{lat_var} >= {min_lat} && ?{lat_var} <= {max_lat}")
+            join = "&&" if min_lon <= max_lon else "||"
+            conditions.append(f"(?{lon_var} >= {min_lon} {join} ?{lon_var} <= {max_lon})")
+
+        return f"FILTER({' && '.join(conditions)})" if conditions else ""
+
+    def _scope_patterns(self, var: str, start = None, end = None, bbox: tuple = None) -> str:
+        """Binds the timestamp / position of observation ?var and filters them like _scope_filter, if scoped"""
+        patterns = []
+        if start is not None or end is not None:
+            patterns.append(f"?{var} :timestamp ?{var}_time .")
+        if bbox is not None:
+            patterns.append(f"?{var} :lat ?{var}_lat ; :lon ?{var}_lon .")
+
+        patterns.append(self._scope_filter(f"{var}_time", f"{var}_lat", f"{var}_lon", start, end, bbox))
+        return "\n".join(patterns)
+
+    def _overlap_patterns(self, var: str, start = None, end = None) -> str:
+        """Keeps events ?var whose [startTime, endTime] overlaps start / end, if given"""
+        if start is None and end is None:
+            return ""
+        return "\n".join([
+            f"?{var} :startTime ?{var}_start ; :endTime ?{var}_end .",
+            self._scope_filter(f"{var}_end", None, None, start, None),
+            self._scope_filter(f"{var}_start", None, None, None, end)
+        ])
+
+    def _hop_patterns(self, hop: int, start = None, end = None) -> str:
+        """
+        Walks one NEIGHBOR_FORWARD / NEIGHBOR_BACKWARD link from ?n{hop - 1} to ?n{hop}, binding the link as
+        ?s{hop} ?p{hop} ?o{hop}, and drops nodes outside start / end
+        """
+        forward = " ".join(f":{predicate}" for predicate in self.NEIGHBOR_FORWARD)
+        backward = " ".join(f":{predicate}" for predicate in self.NEIGHBOR_BACKWARD)
+        prev, node = f"?n{hop - 1}", f"?n{hop}"
+
+        patterns = [
+            f"{{ VALUES ?p{hop} {{ {forward} }} {prev} ?p{hop} {node} . BIND({prev} AS ?s{hop}) BIND({node} AS ?o{hop}) }}",
+            "UNION",
+            f"{{ VALUES ?p{hop} {{ {backward} }} {node} ?p{hop} {prev} . BIND({node} AS ?s{hop}) BIND({prev} AS ?o{hop}) }}"
+        ]
+        if start is not None or end is not None:
+            patterns += [
+                f"FILTER NOT EXISTS {{ {node} :timestamp ?t{hop} . {self._outside_filter(f't{hop}', start, end)} }}",
+                f"FILTER NOT EXISTS {{ {node} :endTime ?t{hop}_end . {self._outside_filter(f't{hop}_end', start, None)} }}",
+                f"FILTER NOT EXISTS {{ {node} :startTime ?t{hop}_start . {self._outside_filter(f't{hop}_start', None, end)} }}"
+            ]
+        return "\n".join(patterns)
+
+    def _outside_filter(self, time_var: str, start = None, end = None) -> str:
+        """Returns a FILTER keeping bindings of ?time_var before start or after end (never true without bounds)"""
+        conditions = []
+        if start is not None:
+            conditions.append(f"?{time_var} < {self._time_literal(start)}")
+        if end is not None:
+            conditions.append(f"?{time_var} > {self._time_literal(end)}")
+        return f"FILTER({' || '.join(conditions) or 'false'})"
+
+    def _clip_windows(self, windows: DataFrame, start = None, end = None) -> tuple[np.ndarray, np.ndarray]:
+        """Trajectory start / end times as seconds, clipped to start / end if given"""
+        starts, ends = to_seconds(windows["traj_start"]), to_seconds(windows["traj_end"])
+        if start is not None:
+            starts = np.maximum(starts, to_seconds([self._timestamp(start)]))
+        if end is not None:
+            ends = np.minimum(ends, to_seconds([self._timestamp(end)]))
+        return starts, ends
+
+    def _timestamp(self, value) -> Timestamp:
+        """Parses a time bound as a UTC timestamp (naive times are taken as UTC)"""
+        value = Timestamp(value)
+        return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+    def _time_literal(self, value) -> str:
+        """Returns a time bound as an xsd:dateTime literal"""
+        return f'"{self._timestamp(value).isoformat().replace("+00:00", "Z")}"^^{XSD_DATETIME}'
+
+    def _select_vars(self, properties: dict[str, str]) -> str:
+        """Returns the SELECT variables for a column -> predicate mapping"""
+        return " ".join(f"?{col}" for col in properties)
+
+    def _property_patterns(self, properties: dict[str, str]) -> str:
+        """Returns the predicate-object list for a column -> predicate mapping"""
+        return " ;\n                    ".join(f":{predicate} ?{col}" for col, predicate in properties.items())
+
+    def _values(self, var: str, ids: list[str]) -> str:
+        """Returns a VALUES block binding ?var to the given ids"""
+        terms = " ".join(f":{id}" for id in ids)
+        return f"VALUES ?{var} {{ {terms} }}"
+
+    def _select_values(self, build_query, var: str, ids: list[str]) -> DataFrame:
+        """
+        Runs build_query(values) with ids bound through a VALUES block,
+        one query per VALUES_CHUNK ids, and concatenates the results
+        """
+        ids = list(dict.fromkeys(ids))
+        frames = []
+
+        for start in range(0, max(len(ids), 1), self.VALUES_CHUNK):
+            chunk = ids[start:start + self.VALUES_CHUNK]
+            if not chunk:
+                break
+            frames.append(self._select(build_query(self._values(var, chunk))))
 
-        return distance_km <= threshold
\ No newline at end of file
+        if not frames:
+            return DataFrame()
+        return concat(frames, ignore_index = True)
+
+    @traced
+    def is_nearby(self, lat1: float, lon1: float, lat2: float, lon2: float, threshold: float = 10.0) -> bool:
+        """
+        Return True if (lat1, lon1) and (lat2, lon2) are within threshold km.
+        Scalar convenience wrapper around geodesic.within, which also accepts arrays.
+        """
+        return bool(within(lat1, lon1, lat2, lon2, threshold))
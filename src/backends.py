@@ -0,0 +1,114 @@
+import threading
+from geometry import wkt_contains
+from metrics import traced
+
+MARITIME = "http://example.org/maritime#"
+
+class AllegroGraphBackend:
+    """Runs queries against a live AllegroGraph repository"""
+
+    def __init__(self, repo_name: str, **kwargs):
+        from franz.openrdf.connect import ag_connect
+
+        self.connection = ag_connect(repo_name, **kwargs)
+
+    @traced
+    def rows(self, query: str) -> tuple[list[str], list[tuple]]:
+        """
+        Runs a SELECT query and returns its variables and raw result rows of N-Triples terms,
+        without building a Value object per term (see results.decode)
+        """
+        with self.connection.executeTupleQuery(query) as result:
+            return list(result.getBindingNames()), [tuple(row) for row in result.string_tuples]
+
+    @traced
+    def construct(self, query: str) -> tuple[list[str], list[tuple]]:
+        """Runs a CONSTRUCT query and returns its triples as rows of N-Triples terms, like rows()"""
+        with self.connection.executeGraphQuery(query) as result:
+            triples = [
+                (st.getSubject().toNTriples(), st.getPredicate().toNTriples(), st.getObject().toNTriples())
+                for st in result
+            ]
+        return ["subject", "predicate", "object"], triples
+
+    def add(self, ntriples: str):
+        """Adds a batch of N-Triples to the repository in one request"""
+        from franz.openrdf.rio.rdfformat import RDFFormat
+
+        self.connection.addData(ntriples, rdf_format = RDFFormat.NTRIPLES)
+
+class RDFLibBackend:
+    """
+    Runs queries against an embedded, indexed rdflib graph loaded from local files
+    (Turtle, N-Triples, or any format rdflib can guess; HDT needs rdflib-hdt).
+    Result terms are written as N-Triples, the way AllegroGraph returns raw result rows.
+    """
+
+    NAMESPACES = {
+        "": MARITIME,
+        "xsd": "http://www.w3.org/2001/XMLSchema#",
+        "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+        "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+        "geo": "http://www.opengis.net/ont/geosparql#",
+        "geof": "http://www.opengis.net/def/function/geosparql/"
+    }
+
+    def __init__(self, *paths: str):
+        import rdflib
+        from rdflib.plugins.sparql.operators import register_custom_function
+        from rdflib.util import guess_format
+
+        self.rdflib = rdflib
+        self.graph = rdflib.Graph()
+        # rdflib's SPARQL parser is not thread-safe, so queries from a thread pool take turns
+        self.lock = threading.Lock()
+
+        for path in paths:
+            if str(path).endswith(".hdt"):
+                from rdflib_hdt import HDTStore
+
+                self.graph += rdflib.Graph(store = HDTStore(str(path)))
+            else:
+                self.graph.parse(str(path), format = guess_format(str(path)) or "turtle")
+
+        # GeoSPARQL containment, which rdflib does not implement natively
+        register_custom_function(
+            rdflib.URIRef(self.NAMESPACES["geof"] + "sfContains"),
+            lambda polygon, point: rdflib.Literal(wkt_contains(polygon, point)),
+            override = True
+        )
+
+    @traced
+    def rows(self, query: str) -> tuple[list[str], list[tuple]]:
+        """Runs a SELECT query and returns its variables and raw result rows of N-Triples terms (see results.decode)"""
+        with self.lock:
+            result = self.graph.query(query, initNs = self.NAMESPACES)
+            columns = [str(var) for var in result.vars]
+            rows = [tuple(self._to_ntriples(term) for term in row) for row in result]
+        return columns, rows
+
+    @traced
+    def construct(self, query: str) -> tuple[list[str], list[tuple]]:
+        """Runs a CONSTRUCT query and returns its triples as rows of N-Triples terms, like rows()"""
+        with self.lock:
+            result = self.graph.query(query, initNs = self.NAMESPACES)
+            triples = [tuple(self._to_ntriples(term) for term in triple) for triple in result]
+        return ["subject", "predicate", "object"], triples
+
+    def add(self, ntriples: str):
+        """Adds a batch of N-Triples to the graph"""
+        with self.lock:
+            self.graph.parse(data = ntriples, format = "nt")
+
+    def _to_ntriples(self, term) -> str | None:
+        """Writes an rdflib term the way AllegroGraph returns raw result terms"""
+        if term is None:
+            return None
+        if isinstance(term, self.rdflib.Literal):
+            value = str(term).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+            if term.datatype is not None:
+                return f'"{value}"^^<{term.datatype}>'
+            return f'"{value}"@{term.language}' if term.language else f'"{value}"'
+        if isinstance(term, self.rdflib.BNode):
+            return f"_:{term}"
+        return f"<{term}>"
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import random
+import time
+from types import SimpleNamespace
+import metrics
+
+SYSTEM_PROMPT = """
+    You are a maritime analyst.
+    Given JSON data describing an encounter between two vessels, write a short, factual summary (3-5 sentences) explaining what occurred.
+    Use only the information provided in the JSON.
+    Do not invent details or numbers.
+    Keep the explanation concise, professional, and neutral in tone. It should read like smoothly like a story.
+"""
+
+# Error class names / status codes worth retrying: rate limits, timeouts and server errors
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def completed_ids(path: str, key: str = "EncounterID") -> set[str]:
+    """Returns the ids already explained in an NDJSON checkpoint file"""
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding = "utf-8") as file:
+            for line in file:
+                try:
+                    done.add(json.loads(line)[key])
+                except (ValueError, KeyError):
+                    # Partial last line from an interrupted run
+                    continue
+    return done
+
+async def explain_batch(
+    records: list[dict],
+    client,
+    output_path: str,
+    concurrency: int = 8,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    model: str = "gpt-5",
+    key: str = "EncounterID"
+) -> dict:
+    """
+    Explains every record not already in output_path with a pool of concurrent workers, appending
+    one {key, "explanation"} line per record as it finishes. Rate-limited and transient failures are
+    retried with exponential backoff and jitter (honoring Retry-After when given); re-running with the
+    same output_path resumes where the last run stopped. client is any OpenAI-compatible client,
+    sync or async, so a local fake can stand in for tests and benchmarks.
+    """
+    done = completed_ids(output_path, key)
+    pending = [record for record in records if record[key] not in done]
+
+    queue = asyncio.Queue()
+    for record in pending:
+        queue.put_nowait(record)
+
+    failed = {}
+
+    with open(output_path, "a", encoding = "utf-8") as file:
+        async def worker():
+            while not queue.empty():
+                record = queue.get_nowait()
+                try:
+                    explanation = await _explain(record, client, model, max_retries, base_delay)
+                except Exception as e:
+                    failed[record[key]] = repr(e)
+                    continue
+
+                file.write(json.dumps({key: record[key], "explanation": explanation}) + "\n")
+                file.flush()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    return {
+        "explained": len(pending) - len(failed),
+        "skipped": len(records) - len(pending),
+        "failed": failed
+    }
+
+async def _explain(record: dict, client, model: str, max_retries: int, base_delay: float) -> str:
+    """Explains one record, retrying retryable errors with exponential backoff"""
+    create = client.chat.completions.create
+    kwargs = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Data: {str(record)}"}
+        ]
+    }
+
+    for attempt in range(max_retries + 1):
+        try:
+            start = time.perf_counter()
+            if inspect.iscoroutinefunction(create):
+                res = await create(**kwargs)
+            else:
+                res = await asyncio.to_thread(create, **kwargs)
+            metrics.record_llm(model, time.perf_counter() - start, res, kind = "create")
+            return res.choices[0].message.content
+        except Exception as e:
+            if attempt == max_retries or not _retryable(e):
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt, base_delay))
+
+def _retryable(e: Exception) -> bool:
+    """Returns True for rate limits, timeouts and server errors"""
+    return type(e).__name__ in RETRYABLE_ERRORS or getattr(e, "status_code", None) in RETRYABLE_STATUS
+
+def _retry_delay(e: Exception, attempt: int, base_delay: float) -> float:
+    """Seconds to wait before the next attempt: the server's Retry-After if given, else jittered backoff"""
+    response = getattr(e, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return base_delay * 2 ** attempt * (0.5 + random.random())
+
+class FakeClient:
+    """
+    Local stand-in for the OpenAI client with a fixed latency and an optional simulated rate limit
+    (every rate_limit_every-th call fails with a 429), for tests and throughput benchmarks
+    """
+
+    class RateLimitError(Exception):
+        status_code = 429
+
+    def __init__(self, latency: float = 0.05, rate_limit_every: int = None):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.chat = SimpleNamespace(completions = SimpleNamespace(create = self.create))
+
+    async def create(self, model: str, messages: list[dict], **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise self.RateLimitError("rate limited")
+
+        content = f"Explanation of {messages[-1]['content'][:60]}"
+        return SimpleNamespace(choices = [SimpleNamespace(message = SimpleNamespace(content = content))])
+
+def main():
+    parser = argparse.ArgumentParser(description = "Explain encounter records in synthetic_events.json format")
+    parser.add_argument("input", help = "JSON file with a list of encounter records")
+    parser.add_argument("output", help = "NDJSON checkpoint file, appended to and resumed from")
+    parser.add_argument("--concurrency", type = int, default = 8)
+    parser.add_argument("--max-retries", type = int, default = 5)
+    parser.add_argument("--model", default = "gpt-5")
+    parser.add_argument("--fake", action = "store_true", help = "Use a local fake client instead of OpenAI")
+    args = parser.parse_args()
+
+    with open(args.input, encoding = "utf-8") as file:
+        records = json.load(file)
+
+    if args.fake:
+        client = FakeClient()
+    else:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI()
+
+    summary = asyncio.run(explain_batch(
+        records, client, args.output,
+        concurrency = args.concurrency, max_retries = args.max_retries, model = args.model
+    ))
+    print(json.dumps(summary, indent = 2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import metrics
+from compaction import to_prompt
+from fleet import build_clusters
+from KnowledgeGraph import KnowledgeGraph
+from proximity import grid_cells, proximity_join, to_seconds
+from synthetic import generate, scaled
+
+SCALES = (1, 10, 100)
+
+# Stored results the benchmark is compared against
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "benchmark_baseline.json")
+
+# Allowed relative increase of wall time and peak memory before a result counts as a regression
+TOLERANCE = 0.25
+
+def run(scales = SCALES, seed: int = 0, workdir: str = None) -> dict[str, dict]:
+    """Runs the pipeline benchmark at each scale and returns {scale: results}"""
+    results = {}
+    with tempfile.TemporaryDirectory(dir = workdir) as tmp:
+        for scale in scales:
+            results[str(scale)] = run_scale(scale, seed, os.path.join(tmp, f"synthetic_{scale}x.ttl"))
+    return results
+
+def run_scale(scale: int, seed: int = 0, path: str = None) -> dict:
+    """
+    Generates a synthetic graph at scale times the 1x unit, loads it into an embedded store and runs
+    retrieve -> cluster -> serialize over the whole fleet twice: once timed and counting queries, and
+    once under tracemalloc for peak memory (tracemalloc slows Python down, so it is kept out of the timings)
+    """
+    path = path or os.path.join(tempfile.gettempdir(), f"synthetic_{scale}x.ttl")
+    counts = generate(path, seed = seed, **scaled(scale))
+
+    start = time.perf_counter()
+    kg = KnowledgeGraph.from_files(path)
+    load_seconds = time.perf_counter() - start
+
+    with metrics.profile() as profile:
+        start = time.perf_counter()
+        clusters, chars, serialize_seconds = pipeline(kg)
+        wall_seconds = time.perf_counter() - start
+
+    queries = sum(value for (name, _), value in profile.counters.items() if name == "sparql_queries_total")
+    rows = sum(value for (name, _), value in profile.counters.items() if name == "sparql_rows_total")
+    query_seconds = sum(hist["sum"] for (name, _), hist in profile.histograms.items() if name == "sparql_query_seconds")
+
+    # Garbage left by the timed run would otherwise be collected at varying points of the traced one,
+    # moving the peak by more than the tolerance at small scales
+    kg.invalidate_cache()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        pipeline(kg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "vessels": counts["vessels"],
+        "observations": counts["observations"],
+        "triples": counts["triples"],
+        "load_seconds": round(load_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "query_seconds": round(query_seconds, 3),
+        "serialize_seconds": round(serialize_seconds, 3),
+        "queries": int(queries),
+        "rows": int(rows),
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+        "clusters": clusters,
+        "prompt_chars": chars
+    }
+
+def pipeline(kg: KnowledgeGraph) -> tuple[int, int, float]:
+    """Builds and serializes every vessel's cluster; returns the cluster count, total prompt characters and time spent serializing"""
+    clusters, chars, serialize_seconds = 0, 0, 0.0
+    for cluster in build_clusters(kg):
+        start = time.perf_counter()
+        chars += len(to_prompt(cluster))
+        serialize_seconds += time.perf_counter() - start
+        clusters += 1
+    return clusters, chars, serialize_seconds
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float = TOLERANCE) -> list[str]:
+    """
+    Returns a description of every regression against the baseline: wall time or peak memory more than
+    tolerance above it, or any increase in query count (which is deterministic for a given seed)
+    """
+    regressions = []
+    for scale, result in results.items():
+        base = baseline.get(scale)
+        if base is None:
+            continue
+        if base.get("triples") != result["triples"]:
+            regressions.append(f"{scale}x: generated graph differs from the baseline's ({result['triples']} vs {base.get('triples')} triples)")
+            continue
+
+        for key in ("wall_seconds", "peak_memory_mb"):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{scale}x: {key} {result[key]} > {base[key]} (+{result[key] / base[key] - 1:.0%})")
+        if result["queries"] > base["queries"]:
+            regressions.append(f"{scale}x: queries {result['queries']} > {base['queries']}")
+    return regressions
+
+def check_proximity_join(seed: int = 0, n: int = 400, time_thresh: float = 600, dist_thresh: float = 30) -> list[str]:
+    """
+    Compares proximity_join against a brute-force pairing of every left and right observation on a
+    small random input (scattered points, dwelling tracks and points across the antimeridian), and
+    returns a description of every pair one finds and the other does not
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-10-01", tz = "UTC")
+
+    def points(size: int) -> pd.DataFrame:
+        lat = np.concatenate([rng.uniform(10, 12, size), np.full(size, 14.5), rng.uniform(-5, 5, size)])
+        lon = np.concatenate([rng.uniform(120, 122, size), np.full(size, 121.0), rng.choice([179.9, -179.9], size)])
+        seconds = rng.uniform(0, 2 * 86400, 3 * size)
+        return pd.DataFrame({"id": np.arange(3 * size), "time": start + pd.to_timedelta(seconds, unit = "s"), "lat": lat, "lon": lon})
+
+    left, right = points(n // 3), points(n // 3)
+    joined = proximity_join(left, right, time_thresh, dist_thresh)
+    found = set(zip(joined["id1"], joined["id2"]))
+
+    left_cells, right_cells = grid_cells(left["lat"], left["lon"], dist_thresh), grid_cells(right["lat"], right["lon"], dist_thresh)
+    same_time = np.abs(to_seconds(left["time"])[:, None] - to_seconds(right["time"])[None, :]) <= time_thresh
+    same_place = (np.abs(left_cells[:, None, :] - right_cells[None, :, :]) <= 1).all(axis = 2)
+    i, j = np.nonzero(same_time & same_place)
+    expected = set(zip(left["id"].to_numpy()[i], right["id"].to_numpy()[j]))
+
+    return [f"proximity_join missing pair {pair}" for pair in sorted(expected - found)] + [
+        f"proximity_join extra pair {pair}" for pair in sorted(found - expected)
+    ]
+
+def load_baseline(path: str = BASELINE) -> dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding = "utf-8") as file:
+        return json.load(file)
+
+def save_baseline(results: dict[str, dict], path: str = BASELINE):
+    """Merges results into the stored baseline, replacing the scales that were run"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w", encoding = "utf-8") as file:
+        json.dump(baseline, file, indent = 2, sort_keys = True)
+        file.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark retrieve -> cluster -> serialize on synthetic graphs and compare against a baseline")
+    parser.add_argument("--scales", type = int, nargs = "+", default = list(SCALES))
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--baseline", default = BASELINE)
+    parser.add_argument("--tolerance", type = float, default = TOLERANCE)
+    parser.add_argument("--update-baseline", action = "store_true", help = "Store these results as the new baseline")
+    args = parser.parse_args()
+
+    mismatches = check_proximity_join(args.seed)
+    for mismatch in mismatches:
+        print("MISMATCH", mismatch)
+    if mismatches:
+        sys.exit(1)
+
+    results = run(args.scales, args.seed)
+    baseline = load_baseline(args.baseline)
+
+    columns = ["vessels", "triples", "load_seconds", "wall_seconds", "query_seconds", "serialize_seconds", "queries", "peak_memory_mb"]
+    print(f"{'scale':>6} " + " ".join(f"{col:>17}" for col in columns))
+    for scale, result in results.items():
+        print(f"{scale + 'x':>6} " + " ".join(f"{result[col]:>17}" for col in columns))
+        if scale in baseline:
+            print(f"{'base':>6} " + " ".join(f"{baseline[scale].get(col, ''):>17}" for col in columns))
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
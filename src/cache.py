@@ -0,0 +1,100 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pandas import DataFrame
+
+class QueryCache:
+    """
+    LRU cache of query results keyed on query text, with a size bound, a time-to-live,
+    hit/miss counters, and an optional SQLite tier that survives restarts.
+    Results are copied in and out, so callers can modify what they get back.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, path: str = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, DataFrame]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread = False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created REAL, value BLOB)")
+            self.db.commit()
+
+    def get(self, key: str) -> DataFrame | None:
+        """Returns a copy of the cached result for key, or None if it is missing or expired"""
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].copy()
+            if entry is not None:
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT created, value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[0] <= self.ttl:
+                    df = pickle.loads(row[1])
+                    self._remember(key, row[0], df)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return df.copy()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, df: DataFrame):
+        """Caches a copy of df under key"""
+        created = time.time()
+        df = df.copy()
+
+        with self.lock:
+            self._remember(key, created, df)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO results (key, created, value) VALUES (?, ?, ?)",
+                    (key, created, pickle.dumps(df))
+                )
+                self.db.commit()
+
+    def invalidate(self, key: str = None):
+        """Drops one cached result, or everything if key is None"""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+            if self.db is not None:
+                if key is None:
+                    self.db.execute("DELETE FROM results")
+                else:
+                    self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.db.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries)
+        }
+
+    def _remember(self, key: str, created: float, df: DataFrame):
+        """Adds an entry to the in-memory tier, evicting the least recently used beyond maxsize"""
+        self.entries[key] = (created, df)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last = False)
@@ -0,0 +1,183 @@
+import json
+import numpy as np
+import pandas as pd
+from geodesic import EARTH_RADIUS_KM
+from metrics import traced
+from schema import *
+
+# Timestamp format used in prompts (minute resolution, UTC)
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Rough characters per token for JSON, used when no tokenizer is given
+CHARS_PER_TOKEN = 4
+
+# Starting simplification thresholds: distance off the simplified line (km),
+# and the speed (knots) / course (degrees) changes that always keep a point
+TOLERANCE_KM = 0.5
+SPEED_DELTA_KNOTS = 2.0
+COURSE_DELTA_DEGREES = 30.0
+
+# Factor the thresholds grow by on each pass that misses the token budget
+BACKOFF = 2.0
+MAX_PASSES = 12
+
+@traced
+def compact(
+    cluster: Cluster,
+    token_budget: int = None,
+    tolerance_km: float = TOLERANCE_KM,
+    speed_delta: float = SPEED_DELTA_KNOTS,
+    course_delta: float = COURSE_DELTA_DEGREES,
+    count_tokens = None
+) -> tuple[Cluster, dict]:
+    """
+    Shrinks a cluster before it goes into a prompt: trajectories are simplified with
+    Douglas-Peucker while keeping every point where speed or course changes sharply, and
+    timestamps are formatted to the minute. If a token budget is given, thresholds are
+    loosened until the prompt fits (or no more points can be dropped).
+    Returns the compacted cluster and a report of how much it shrank.
+    count_tokens is any str -> int tokenizer; defaults to a characters-per-token estimate.
+    """
+    count_tokens = count_tokens or _estimate_tokens
+    before = to_prompt(cluster)
+
+    for passes in range(1, MAX_PASSES + 1):
+        compacted = Cluster(
+            vessel = _compact_vessel(cluster.vessel, tolerance_km, speed_delta, course_delta),
+            nearby_vessels = [_compact_vessel(v, tolerance_km, speed_delta, course_delta) for v in cluster.nearby_vessels]
+        )
+        after = to_prompt(compacted)
+        tokens = count_tokens(after)
+
+        if token_budget is None or tokens <= token_budget or _count_points(compacted) <= _min_points(compacted):
+            break
+
+        tolerance_km *= BACKOFF
+        speed_delta *= BACKOFF
+        course_delta *= BACKOFF
+
+    points_before, points_after = _count_points(cluster), _count_points(compacted)
+    return compacted, {
+        "points_before": points_before,
+        "points_after": points_after,
+        "chars_before": len(before),
+        "chars_after": len(after),
+        "tokens_before": count_tokens(before),
+        "tokens_after": tokens,
+        "ratio": round(len(after) / len(before), 3) if before else 1.0,
+        "tolerance_km": tolerance_km,
+        "passes": passes,
+        "within_budget": token_budget is None or tokens <= token_budget
+    }
+
+def to_prompt(cluster: Cluster) -> str:
+    """Serializes a cluster as compact JSON, leaving out empty event and point lists"""
+    return json.dumps(_drop_empty(cluster.model_dump()), separators = (",", ":"))
+
+def simplify(
+    lat, lon, speed = None, course = None,
+    tolerance_km: float = TOLERANCE_KM,
+    speed_delta: float = SPEED_DELTA_KNOTS,
+    course_delta: float = COURSE_DELTA_DEGREES
+) -> np.ndarray:
+    """
+    Returns the sorted indices of the points to keep from a time-ordered track: the
+    Douglas-Peucker simplification at tolerance_km, plus both sides of every speed or
+    course change of at least speed_delta / course_delta
+    """
+    lat, lon = np.asarray(lat, dtype = float), np.asarray(lon, dtype = float)
+    n = len(lat)
+    if n <= 2:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype = bool)
+    keep[[0, -1]] = True
+
+    changed = np.zeros(n - 1, dtype = bool)
+    if speed is not None:
+        changed |= np.abs(np.diff(np.asarray(speed, dtype = float))) >= speed_delta
+    if course is not None:
+        turn = np.abs(np.diff(np.asarray(course, dtype = float))) % 360
+        changed |= np.minimum(turn, 360 - turn) >= course_delta
+    keep[:-1] |= changed
+    keep[1:] |= changed
+
+    # Equirectangular km around the track's mean latitude, with longitudes unwrapped across the antimeridian
+    x = EARTH_RADIUS_KM * np.unwrap(np.radians(lon)) * np.cos(np.radians(lat.mean()))
+    y = EARTH_RADIUS_KM * np.radians(lat)
+
+    # Douglas-Peucker within each stretch between kept points
+    anchors = np.nonzero(keep)[0]
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        distance = _segment_distance(x[first + 1:last], y[first + 1:last], x[first], y[first], x[last], y[last])
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance_km:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.extend(((first, split), (split, last)))
+
+    return np.nonzero(keep)[0]
+
+def format_times(times) -> list[str]:
+    """Formats timestamps to TIME_FORMAT in UTC, leaving values that aren't timestamps as they are"""
+    times = list(times)
+    parsed = pd.to_datetime(pd.Series(times, dtype = object), utc = True, errors = "coerce")
+    return [t.strftime(TIME_FORMAT) if not pd.isna(t) else str(raw) for t, raw in zip(parsed, times)]
+
+def _compact_vessel(vessel: Vessel, tolerance_km: float, speed_delta: float, course_delta: float) -> Vessel:
+    """Simplifies a vessel's tracks and formats all of its timestamps"""
+    update = {}
+
+    for field in ("observed_points", "predicted_points"):
+        track = getattr(vessel, field)
+        track = track[np.argsort(track.seconds, kind = "stable")]
+        kept = track[simplify(
+            track.lat, track.lon, track.speed_knots, track.course_degrees,
+            tolerance_km, speed_delta, course_delta
+        )]
+        update[field] = kept.replace(timestamp = format_times(kept.timestamp))
+
+    for field in ("gap_events", "port_events", "fishing_events", "weather_events"):
+        events = getattr(vessel, field)
+        starts = format_times(e.start_time for e in events)
+        ends = format_times(e.end_time for e in events)
+        update[field] = [
+            e.model_copy(update = {"start_time": start, "end_time": end})
+            for e, start, end in zip(events, starts, ends)
+        ]
+
+    return vessel.model_copy(update = update)
+
+def _segment_distance(px, py, x0, y0, x1, y1) -> np.ndarray:
+    """Distance from points to the segment (x0, y0)-(x1, y1), all in projected km"""
+    dx, dy = x1 - x0, y1 - y0
+    length = dx ** 2 + dy ** 2
+    u = np.clip(((px - x0) * dx + (py - y0) * dy) / length, 0.0, 1.0) if length > 0 else 0.0
+    return np.hypot(px - (x0 + u * dx), py - (y0 + u * dy))
+
+def _drop_empty(value):
+    """Recursively removes empty lists and dicts from dumped model data"""
+    if isinstance(value, dict):
+        return {k: _drop_empty(v) for k, v in value.items() if v != [] and v != {}}
+    if isinstance(value, list):
+        return [_drop_empty(v) for v in value]
+    return value
+
+def _count_points(cluster: Cluster) -> int:
+    return sum(len(v.observed_points) + len(v.predicted_points) for v in [cluster.vessel, *cluster.nearby_vessels])
+
+def _min_points(cluster: Cluster) -> int:
+    """Fewest points compaction can reach: the two endpoints of every non-empty track"""
+    return sum(
+        min(len(points), 2)
+        for v in [cluster.vessel, *cluster.nearby_vessels]
+        for points in (v.observed_points, v.predicted_points)
+    )
+
+def _estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
@@ -0,0 +1,225 @@
+import numpy as np
+from pandas import Timestamp
+from geodesic import EARTH_RADIUS_KM, haversine
+from geometry import parse_wkt
+from metrics import traced
+from schema import *
+
+# Speed (knots) below which a vessel counts as dwelling
+LOITER_SPEED_KNOTS = 3.0
+
+# Shortest dwell (minutes) reported as loitering
+LOITER_MIN_DURATION = 30.0
+
+# Separation (km) within which two vessels count as meeting
+ENCOUNTER_KM = 30.0
+
+# Distance (km) from the predicted or reference track counted as a deviation
+DEVIATION_KM = 10.0
+
+# Longest gap (minutes) between two observations that positions are interpolated across
+MAX_GAP_MIN = 60.0
+
+@traced
+def detect(
+    cluster: Cluster,
+    reference_tracks: dict[str, np.ndarray] = None,
+    loiter_speed: float = LOITER_SPEED_KNOTS,
+    loiter_min_duration: float = LOITER_MIN_DURATION,
+    encounter_km: float = ENCOUNTER_KM,
+    deviation_km: float = DEVIATION_KM,
+    max_gap: float = MAX_GAP_MIN
+) -> Candidates:
+    """
+    Finds loitering, encounter and course deviation candidates for a cluster's vessel.
+    reference_tracks maps MovementPattern ids to (n, 2) lon/lat arrays (see reference_tracks()).
+    """
+    vessel = _Track.observed(cluster.vessel)
+
+    loitering = detect_loitering(vessel, loiter_speed, loiter_min_duration)
+
+    encounters = []
+    for neighbor in cluster.nearby_vessels:
+        encounters.extend(detect_encounters(vessel, _Track.observed(neighbor), encounter_km, max_gap))
+
+    deviations = prediction_deviations(cluster.vessel, deviation_km, max_gap)
+    for pattern, line in (reference_tracks or {}).items():
+        deviations.extend(detect_reference_deviations(vessel, pattern, line, deviation_km))
+
+    return Candidates(loitering = loitering, encounters = encounters, deviations = deviations)
+
+def reference_tracks(kg) -> dict[str, np.ndarray]:
+    """Loads every MovementPattern's LINESTRING geometry as an (n, 2) lon/lat array"""
+    tracks = {}
+    for pattern, wkt in zip(*kg.movement_patterns()[["pattern", "wkt"]].to_dict("list").values()):
+        kind, lines = parse_wkt(wkt)
+        if kind == "LINESTRING" and lines:
+            tracks[pattern] = lines[0]
+    return tracks
+
+def detect_loitering(track: "_Track", speed: float, min_duration: float) -> list[LoiteringCandidate]:
+    """Runs of consecutive observations below speed lasting at least min_duration minutes"""
+    candidates = []
+
+    for start, stop in _runs(track.speed < speed):
+        duration = (track.t[stop - 1] - track.t[start]) / 60
+        if stop - start < 2 or duration < min_duration:
+            continue
+
+        candidates.append(LoiteringCandidate(
+            vessel_id = track.id,
+            start_time = track.timestamp[start],
+            end_time = track.timestamp[stop - 1],
+            duration_min = round(duration, 1),
+            min_speed_knots = float(track.speed[start:stop].min()),
+            avg_speed_knots = round(float(track.speed[start:stop].mean()), 2),
+            lat = round(float(track.lat[start:stop].mean()), 4),
+            lon = round(float(track.lon[start:stop].mean()), 4)
+        ))
+    return candidates
+
+def detect_encounters(a: "_Track", b: "_Track", encounter_km: float, max_gap: float) -> list[EncounterCandidate]:
+    """
+    Windows where two vessels are within encounter_km. Each vessel's position is interpolated
+    at the other's observation times, and separations are evaluated on the merged timeline.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return []
+
+    t = np.union1d(a.t, b.t)
+    lat_a, lon_a, ok_a = a.interpolate(t, max_gap)
+    lat_b, lon_b, ok_b = b.interpolate(t, max_gap)
+    valid = ok_a & ok_b
+    if not valid.any():
+        return []
+
+    t, separation = t[valid], haversine(lat_a[valid], lon_a[valid], lat_b[valid], lon_b[valid])
+    candidates = []
+
+    for start, stop in _runs(separation <= encounter_km):
+        closest = start + int(np.argmin(separation[start:stop]))
+        candidates.append(EncounterCandidate(
+            vessel_A = a.id,
+            vessel_B = b.id,
+            start_time = _format(t[start]),
+            end_time = _format(t[stop - 1]),
+            duration_min = round((t[stop - 1] - t[start]) / 60, 1),
+            min_separation_km = round(float(separation[closest]), 3),
+            time_of_min_separation = _format(t[closest])
+        ))
+    return candidates
+
+def prediction_deviations(vessel: Vessel, deviation_km: float = DEVIATION_KM, max_gap: float = MAX_GAP_MIN) -> list[DeviationCandidate]:
+    """Windows where a vessel's observed points are over deviation_km from its own predicted points"""
+    return detect_prediction_deviations(_Track.observed(vessel), _Track.predicted(vessel), deviation_km, max_gap)
+
+def detect_prediction_deviations(observed: "_Track", predicted: "_Track", deviation_km: float, max_gap: float) -> list[DeviationCandidate]:
+    """Windows where the observed track, interpolated at prediction times, is over deviation_km from the prediction"""
+    if len(observed) == 0 or len(predicted) == 0:
+        return []
+
+    lat, lon, ok = observed.interpolate(predicted.t, max_gap)
+    distance = np.where(ok, haversine(lat, lon, predicted.lat, predicted.lon), 0.0)
+    return _deviations(observed.id, "Prediction", predicted.t, distance, deviation_km)
+
+def detect_reference_deviations(observed: "_Track", pattern: str, line: np.ndarray, deviation_km: float) -> list[DeviationCandidate]:
+    """
+    Windows where observations near a reference track (inside its bounding box grown by
+    deviation_km) are over deviation_km from it
+    """
+    if len(observed) == 0 or len(line) < 2:
+        return []
+
+    x, y = _project(observed.lon, observed.lat, line[:, 1].mean())
+    lx, ly = _project(line[:, 0], line[:, 1], line[:, 1].mean())
+    near = (x >= lx.min() - deviation_km) & (x <= lx.max() + deviation_km) & \
+        (y >= ly.min() - deviation_km) & (y <= ly.max() + deviation_km)
+    if not near.any():
+        return []
+
+    distance = np.zeros(len(observed))
+    distance[near] = _polyline_distance(x[near], y[near], lx, ly)
+    return _deviations(observed.id, pattern, observed.t, distance, deviation_km)
+
+class _Track:
+    """Time-sorted columns of one vessel's observed or predicted track"""
+
+    def __init__(self, vessel_id: str, track: Track):
+        order = np.argsort(track.seconds, kind = "stable")
+        self.id = vessel_id
+        self.timestamp = track.timestamp[order]
+        self.t = track.seconds[order]
+        self.lat = track.lat[order]
+        self.lon = track.lon[order]
+        self.speed = track.speed_knots[order]
+
+    @classmethod
+    def observed(cls, vessel: Vessel) -> "_Track":
+        return cls(vessel.id, vessel.observed_points)
+
+    @classmethod
+    def predicted(cls, vessel: Vessel) -> "_Track":
+        return cls(vessel.id, vessel.predicted_points)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def interpolate(self, t: np.ndarray, max_gap: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Linearly interpolates position at times t. Returns lat, lon, and a mask of times that are
+        inside the track and not inside a gap longer than max_gap minutes
+        """
+        right = np.clip(np.searchsorted(self.t, t, side = "left"), 0, len(self.t) - 1)
+        left = np.clip(right - 1, 0, len(self.t) - 1)
+        exact = self.t[right] == t
+
+        inside = (t >= self.t[0]) & (t <= self.t[-1])
+        gap = self.t[right] - self.t[left]
+        valid = inside & (exact | (gap <= max_gap * 60))
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            w = np.where(gap > 0, (t - self.t[left]) / gap, 0.0)
+        w = np.where(exact, 1.0, np.clip(w, 0.0, 1.0))
+
+        lat = self.lat[left] + w * (self.lat[right] - self.lat[left])
+        lon = self.lon[left] + w * (self.lon[right] - self.lon[left])
+        return lat, lon, valid
+
+def _deviations(vessel_id: str, reference: str, t: np.ndarray, distance: np.ndarray, deviation_km: float) -> list[DeviationCandidate]:
+    """Turns runs of distance above deviation_km into deviation candidates"""
+    return [
+        DeviationCandidate(
+            vessel_id = vessel_id,
+            reference = reference,
+            start_time = _format(t[start]),
+            end_time = _format(t[stop - 1]),
+            max_deviation_km = round(float(distance[start:stop].max()), 3)
+        )
+        for start, stop in _runs(distance > deviation_km)
+    ]
+
+def _runs(mask: np.ndarray) -> list[tuple[int, int]]:
+    """Returns [start, stop) index pairs of the runs of True in a boolean array"""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype = np.int8), [0])))
+    return list(zip(np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]))
+
+def _project(lon, lat, lat0: float) -> tuple[np.ndarray, np.ndarray]:
+    """Equirectangular projection to km around latitude lat0"""
+    x = EARTH_RADIUS_KM * np.radians(np.asarray(lon, dtype = float)) * np.cos(np.radians(lat0))
+    y = EARTH_RADIUS_KM * np.radians(np.asarray(lat, dtype = float))
+    return x, y
+
+def _polyline_distance(x, y, lx, ly) -> np.ndarray:
+    """Distance from each point to the nearest segment of a polyline, all in projected km"""
+    x0, y0, x1, y1 = lx[:-1], ly[:-1], lx[1:], ly[1:]
+    dx, dy = x1 - x0, y1 - y0
+    length = np.maximum(dx ** 2 + dy ** 2, 1e-12)
+
+    # (points, segments): position of each point's projection along each segment
+    u = np.clip(((x[:, None] - x0) * dx + (y[:, None] - y0) * dy) / length, 0.0, 1.0)
+    px, py = x0 + u * dx, y0 + u * dy
+    return np.sqrt((x[:, None] - px) ** 2 + (y[:, None] - py) ** 2).min(axis = 1)
+
+def _format(t: float) -> str:
+    """Formats seconds since the epoch like the timestamps in Vessel objects"""
+    return str(Timestamp(t, unit = "s", tz = "UTC").to_pydatetime())
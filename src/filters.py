@@ -0,0 +1,146 @@
+import re
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from detector import DEVIATION_KM, MAX_GAP_MIN, prediction_deviations
+from schema import Cluster, Vessel
+from zones import ZoneIndex
+
+# Importance criteria from data/filtering_guidelines.txt, in order
+RULES = (
+    "cross_flag",
+    "cross_type",
+    "restricted_zone",
+    "osint_48h",
+    "trajectory_deviation",
+    "favorable_weather"
+)
+
+# Columns every event table has, whatever it was built from
+COLUMNS = [
+    "event_id", "kind", "zone",
+    "a_id", "a_flag", "a_type", "b_id", "b_flag", "b_type",
+    "near_port", "osint_48h", "deviation", "weather_ok"
+]
+
+# Zone ids / codes counted as restricted (EEZs)
+RESTRICTED_ZONE = r"^EEZ[_:]"
+
+# Distance from port (km) within which an event counts as near a port boundary
+PORT_DISTANCE_KM = 5.0
+
+# Weather severities considered favorable for at-sea activity
+FAVORABLE_SEVERITY = {"Calm", "Low", "Mild"}
+
+def records_frame(records: list[dict]) -> DataFrame:
+    """Builds an event table from encounter records in the synthetic_events.json format"""
+    df = pd.json_normalize(records)
+    if df.empty:
+        return DataFrame(columns = COLUMNS)
+
+    def column(name, default = None):
+        return df[name] if name in df.columns else pd.Series(default, index = df.index)
+
+    behavior_a = column("VesselA.RecentBehavior", "").fillna("").astype(str)
+    behavior_b = column("VesselB.RecentBehavior", "").fillna("").astype(str)
+
+    return DataFrame({
+        "event_id": column("EncounterID"),
+        "kind": "Encounter",
+        "zone": column("Zone", "").fillna("").astype(str),
+        "a_id": column("VesselA.Name"),
+        "a_flag": column("VesselA.Flag"),
+        "a_type": column("VesselA.Type"),
+        "b_id": column("VesselB.Name"),
+        "b_flag": column("VesselB.Flag"),
+        "b_type": column("VesselB.Type"),
+        "near_port": False,
+        "osint_48h": column("VesselA.OSINT48h", False).fillna(False).astype(bool) | column("VesselB.OSINT48h", False).fillna(False).astype(bool),
+        "deviation": behavior_a.str.contains("Deviation") | behavior_b.str.contains("Deviation"),
+        "weather_ok": column("VesselA.WeatherOK", False).fillna(False).astype(bool) & column("VesselB.WeatherOK", False).fillna(False).astype(bool)
+    })
+
+def cluster_frame(
+    cluster: Cluster,
+    zone_index: ZoneIndex = None,
+    deviation_km: float = DEVIATION_KM,
+    max_gap: float = MAX_GAP_MIN
+) -> DataFrame:
+    """
+    Builds an event table from a cluster: one potential interaction per neighbor,
+    or a single row for the vessel alone if it has no neighbors.
+    Zones come from the vessels' observed points if a ZoneIndex is given, else from their events' locations.
+    A row deviates if any of its vessels' observed points stray over deviation_km from its predicted
+    points (see detector.prediction_deviations). Clusters carry no OSINT, so osint_48h is always False.
+    """
+    vessel = cluster.vessel
+    rows = []
+
+    # Each vessel's deviation is checked once, though the cluster's vessel is in every row
+    deviates = {
+        v.id: bool(prediction_deviations(v, deviation_km, max_gap))
+        for v in [vessel, *cluster.nearby_vessels]
+    }
+
+    for neighbor in cluster.nearby_vessels or [None]:
+        members = [vessel] if neighbor is None else [vessel, neighbor]
+
+        if zone_index is not None:
+            lat = np.concatenate([v.observed_points.lat for v in members])
+            lon = np.concatenate([v.observed_points.lon for v in members])
+            zones = list(zone_index.lookup(lat, lon)["zone"].unique())
+        else:
+            zones = [event.location for v in members for event in _events(v)]
+
+        rows.append({
+            "event_id": vessel.id if neighbor is None else f"{vessel.id}__{neighbor.id}",
+            "kind": "Vessel" if neighbor is None else "Encounter",
+            "zone": next((zone for zone in zones if re.match(RESTRICTED_ZONE, zone)), zones[0] if zones else ""),
+            "a_id": vessel.id,
+            "a_flag": vessel.flag,
+            "a_type": vessel.type,
+            "b_id": None if neighbor is None else neighbor.id,
+            "b_flag": None if neighbor is None else neighbor.flag,
+            "b_type": None if neighbor is None else neighbor.type,
+            "near_port": any(
+                v.port_events or (v.observed_points.dist_from_port_km <= PORT_DISTANCE_KM).any()
+                for v in members
+            ),
+            "osint_48h": False,
+            "deviation": any(deviates[v.id] for v in members),
+            "weather_ok": any(v.weather_events for v in members) and all(
+                event.severity in FAVORABLE_SEVERITY for v in members for event in v.weather_events
+            )
+        })
+
+    return DataFrame(rows, columns = COLUMNS)
+
+def evaluate(df: DataFrame) -> DataFrame:
+    """
+    Evaluates all six importance rules as column operations. Returns a copy of df with one
+    boolean column per rule, "matched_rules" (names of the rules matched) and "important"
+    """
+    df = df.copy()
+    has_pair = df["b_id"].notna()
+
+    df["cross_flag"] = has_pair & df["a_flag"].notna() & df["b_flag"].notna() & (df["a_flag"] != df["b_flag"])
+    df["cross_type"] = has_pair & df["a_type"].notna() & df["b_type"].notna() & (df["a_type"] != df["b_type"])
+    df["restricted_zone"] = df["zone"].fillna("").astype(str).str.contains(RESTRICTED_ZONE) | df["near_port"].astype(bool)
+    df["osint_48h"] = df["osint_48h"].astype(bool)
+    df["trajectory_deviation"] = (df["kind"] == "CourseDeviation") | df["deviation"].astype(bool)
+    df["favorable_weather"] = df["weather_ok"].astype(bool)
+
+    matched = df[list(RULES)].to_numpy(dtype = bool)
+    names = np.array(RULES, dtype = object)
+    df["matched_rules"] = [list(names[row]) for row in matched]
+    df["important"] = matched.any(axis = 1)
+    return df
+
+def important(df: DataFrame) -> DataFrame:
+    """Returns only the events matching at least one rule, tagged with the rules they matched"""
+    tagged = evaluate(df)
+    return tagged[tagged["important"]]
+
+def _events(vessel: Vessel) -> list:
+    """All context events of a vessel"""
+    return [*vessel.gap_events, *vessel.port_events, *vessel.fishing_events, *vessel.weather_events]
@@ -0,0 +1,85 @@
+from collections import Counter, deque
+from typing import Iterator
+from KnowledgeGraph import KnowledgeGraph
+from helper import construct_vessels
+from schema import Cluster, Vessel
+
+def build_clusters(
+    kg: KnowledgeGraph,
+    vessel_ids: list[str] = None,
+    time_thresh: int = 600,
+    dist_thresh: int = 30,
+    chunk_size: int = 100,
+    start = None,
+    end = None,
+    bbox: tuple = None
+) -> Iterator[Cluster]:
+    """
+    Yields one cluster per vessel (all vessels if vessel_ids is None), sharing work across clusters.
+    The neighbor graph is computed once, and each vessel is hydrated exactly once, in batches of
+    chunk_size clusters. Hydrated vessels are kept only until the last cluster that uses them has been
+    yielded, and clusters are visited in neighbor-graph order, so memory stays bounded by the local
+    neighborhood rather than the fleet.
+    With start / end and bbox (min_lon, min_lat, max_lon, max_lat), neighbors, events and points
+    all come from that window and area only.
+    """
+    if vessel_ids is None:
+        vessel_ids = kg.extract_vessels()
+
+    graph = kg.nearby_graph(vessel_ids, time_thresh, dist_thresh, start, end, bbox)
+    order = _graph_order(vessel_ids, graph)
+
+    # Number of clusters still to be built that each vessel belongs to
+    remaining = Counter()
+    for vessel_id in order:
+        remaining.update([vessel_id, *graph[vessel_id]])
+
+    vessels: dict[str, Vessel] = {}
+
+    for offset in range(0, len(order), chunk_size):
+        chunk = order[offset:offset + chunk_size]
+
+        members = [m for vessel_id in chunk for m in (vessel_id, *graph[vessel_id])]
+        missing = [m for m in dict.fromkeys(members) if m not in vessels]
+        if missing:
+            vessels.update(construct_vessels(kg.find_related_events_batch(missing, start, end, bbox), kg, start, end, bbox))
+
+        for vessel_id in chunk:
+            yield Cluster(
+                vessel = vessels[vessel_id],
+                nearby_vessels = [vessels[neighbor] for neighbor in graph[vessel_id]]
+            )
+
+            for member in (vessel_id, *graph[vessel_id]):
+                remaining[member] -= 1
+                if remaining[member] == 0:
+                    del vessels[member]
+
+def write_clusters(kg: KnowledgeGraph, path: str, vessel_ids: list[str] = None, **kwargs) -> int:
+    """Streams clusters to path as NDJSON (one cluster per line) and returns how many were written"""
+    count = 0
+    with open(path, "w", encoding = "utf-8") as file:
+        for cluster in build_clusters(kg, vessel_ids, **kwargs):
+            file.write(cluster.model_dump_json())
+            file.write("\n")
+            count += 1
+    return count
+
+def _graph_order(vessel_ids: list[str], graph: dict[str, list[str]]) -> list[str]:
+    """Orders vessels breadth-first through the neighbor graph so neighboring clusters are built together"""
+    order, seen = [], set()
+
+    for root in vessel_ids:
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+
+        while queue:
+            vessel_id = queue.popleft()
+            order.append(vessel_id)
+            for neighbor in graph.get(vessel_id, []):
+                if neighbor in graph and neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return order
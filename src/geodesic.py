@@ -0,0 +1,67 @@
+import numpy as np
+from metrics import traced
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Default cap on scratch memory used when computing distance matrices
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Number of float64 temporaries alive per matrix cell while computing haversine
+_TEMPORARIES = 4
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Returns great-circle distance in km between (lat1, lon1) and (lat2, lon2).
+    Inputs are decimal degrees and broadcast against each other like NumPy arrays.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype = float)) for x in (lat1, lon1, lat2, lon2))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+@traced
+def within(lat1, lon1, lat2, lon2, threshold: float) -> np.ndarray:
+    """Returns a boolean mask of which point pairs are within threshold km"""
+    return haversine(lat1, lon1, lat2, lon2) <= threshold
+
+def _chunk_rows(n_cols: int, max_bytes: int) -> int:
+    """Number of matrix rows that fit in max_bytes of scratch memory"""
+    return max(1, max_bytes // (8 * _TEMPORARIES * max(n_cols, 1)))
+
+def iter_distance_matrix(lat1, lon1, lat2, lon2, max_bytes: int = MAX_CHUNK_BYTES):
+    """
+    Yields (row_offset, block) pairs covering the pairwise distance matrix between
+    points 1 (rows) and points 2 (columns), with each block sized to stay under max_bytes.
+    """
+    lat1, lon1 = np.asarray(lat1, dtype = float), np.asarray(lon1, dtype = float)
+    lat2, lon2 = np.asarray(lat2, dtype = float), np.asarray(lon2, dtype = float)
+    step = _chunk_rows(len(lat2), max_bytes)
+
+    for start in range(0, len(lat1), step):
+        stop = start + step
+        yield start, haversine(lat1[start:stop, None], lon1[start:stop, None], lat2[None, :], lon2[None, :])
+
+def distance_matrix(lat1, lon1, lat2, lon2, max_bytes: int = MAX_CHUNK_BYTES) -> np.ndarray:
+    """
+    Returns the (len(points 1), len(points 2)) matrix of distances in km.
+    Intermediates are computed in row chunks so only the result itself grows with input size.
+    """
+    out = np.empty((len(lat1), len(lat2)), dtype = float)
+    for start, block in iter_distance_matrix(lat1, lon1, lat2, lon2, max_bytes):
+        out[start:start + len(block)] = block
+    return out
+
+def pairs_within(lat1, lon1, lat2, lon2, threshold: float, max_bytes: int = MAX_CHUNK_BYTES) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns index arrays (i, j) of every pair of points 1[i] and points 2[j] within threshold km,
+    without ever holding more than one max_bytes chunk of the distance matrix.
+    """
+    rows, cols = [], []
+    for start, block in iter_distance_matrix(lat1, lon1, lat2, lon2, max_bytes):
+        i, j = np.nonzero(block <= threshold)
+        rows.append(i + start)
+        cols.append(j)
+
+    if not rows:
+        return np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
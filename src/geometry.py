@@ -0,0 +1,46 @@
+import re
+import numpy as np
+
+# Optional CRS IRI prefix on GeoSPARQL literals, e.g. "<http://www.opengis.net/def/crs/EPSG/0/4326> POINT(...)"
+CRS_PATTERN = re.compile(r"^\s*<[^>]*>\s*")
+RING_PATTERN = re.compile(r"\(([^()]+)\)")
+
+def parse_wkt(wkt: str) -> tuple[str, list[np.ndarray]]:
+    """
+    Parses a POINT, LINESTRING or POLYGON WKT literal into its geometry type and
+    a list of (n, 2) lon/lat coordinate arrays (the rings, for polygons)
+    """
+    wkt = CRS_PATTERN.sub("", str(wkt))
+    kind = wkt[:wkt.index("(")].strip().upper()
+
+    rings = []
+    for ring in RING_PATTERN.findall(wkt):
+        coords = [pair.split() for pair in ring.split(",")]
+        rings.append(np.array(coords, dtype = float))
+    return kind, rings
+
+def points_in_polygon(lon, lat, rings: list[np.ndarray]) -> np.ndarray:
+    """
+    Returns a boolean mask of which points fall inside a polygon given by its rings
+    (outer ring first, then holes), using a vectorized even-odd ray casting test
+    """
+    lon = np.asarray(lon, dtype = float)
+    lat = np.asarray(lat, dtype = float)
+    inside = np.zeros(lon.shape, dtype = bool)
+
+    for ring in rings:
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+
+        # Every point against every edge: (points, edges)
+        crosses = (y1 > lat[..., None]) != (y2 > lat[..., None])
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            x_cross = (x2 - x1) * (lat[..., None] - y1) / (y2 - y1) + x1
+        inside ^= (crosses & (lon[..., None] < x_cross)).sum(axis = -1) % 2 == 1
+    return inside
+
+def wkt_contains(polygon_wkt: str, point_wkt: str) -> bool:
+    """Returns True if a POINT WKT literal falls inside a POLYGON WKT literal"""
+    _, rings = parse_wkt(polygon_wkt)
+    _, (point,) = parse_wkt(point_wkt)
+    return bool(points_in_polygon(point[:, 0], point[:, 1], rings)[0])
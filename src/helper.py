@@ -1,198 +1,162 @@
+import time
 from schema import *
 from KnowledgeGraph import KnowledgeGraph
+from pandas import DataFrame
+from llm_cache import LLMCache
+from metrics import record_llm, traced
 
 # Object construction
-def construct_vessel(vessel_id: str, events: list, kg: KnowledgeGraph) -> Vessel:
+@traced
+def construct_vessel(vessel_id: str, events: list, kg: KnowledgeGraph, start = None, end = None, bbox: tuple = None) -> Vessel:
     """Constructs a vessel object given a vessel id and related events"""
-    info = kg.vessel_info(vessel_id)
-    name = info["name"].astype(str).iloc[0]
-    type = info["type"].astype(str).iloc[0]
-    flag = info["flag"].astype(str).iloc[0]
-
-    gap_events, port_events, fishing_events, weather_events = [], [], [], []
-
-    for event in events[0]:
-        gap_info = kg.event_info(event)
-        location = gap_info["location"].astype(str).iloc[0]
-        start_time = gap_info["start"].astype(str).iloc[0]
-        end_time = gap_info["end"].astype(str).iloc[0]
-        distance_km = gap_info["gap_distance"].astype(float).iloc[0]
-        duration_hours = gap_info["gap_duration"].astype(float).iloc[0]
-        speed_knots = gap_info["gap_speed"].astype(float).iloc[0]
-        intentional_disabling = gap_info["gap_intentional"].astype(bool).iloc[0]
-
-        gap_events.append(
-            GapEvent(
-                id = event, 
-                location = location, 
-                start_time = start_time, 
-                end_time = end_time, 
-                distance_km = distance_km, 
-                duration_hours = duration_hours, 
-                speed_knots = speed_knots, 
-                intentional_disabling = intentional_disabling
-            )
-        )
-
-    for event in events[1]:
-        port_info = kg.event_info(event)
-        port = port_info["port"].astype(str).iloc[0]
-        location = port_info["location"].astype(str).iloc[0]
-        start_time = port_info["start"].astype(str).iloc[0]
-        end_time = port_info["end"].astype(str).iloc[0]
-        start_dist_from_port_km = port_info["port_dist"].astype(float).iloc[0]
-        start_dist_from_shore_km = port_info["shore_dist"].astype(float).iloc[0]
-
-        port_events.append(
-            PortEvent(
-                id = event, 
-                port = port, 
-                location = location, 
-                start_time = start_time, 
-                end_time = end_time, 
-                start_dist_from_port_km = start_dist_from_port_km, 
-                start_dist_from_shore_km = start_dist_from_shore_km
-            )
-        )
-
-    for event in events[2]:
-        fishing_info = kg.event_info(event)
-        location = fishing_info["location"].astype(str).iloc[0]
-        start_time = fishing_info["start"].astype(str).iloc[0]
-        end_time = fishing_info["end"].astype(str).iloc[0]
-        fishing_effort_score = fishing_info["score"].astype(float).iloc[0]
-        gear_type = fishing_info["gear_type"].astype(str).iloc[0]
-
-        fishing_events.append(
-            FishingEvent(
-                id = event, 
-                location = location, 
-                start_time = start_time, 
-                end_time = end_time, 
-                fishing_effort_score = fishing_effort_score, 
-                gear_type = gear_type
-            )
-        )
-
-    for event in events[3]:
-        weather_info = kg.event_info(event)
-        location = weather_info["location"].astype(str).iloc[0]
-        start_time = weather_info["start"].astype(str).iloc[0]
-        end_time = weather_info["end"].astype(str).iloc[0]
-        weather_type = weather_info["weather"].astype(str).iloc[0]
-        severity = weather_info["severity"].astype(str).iloc[0]
-
-        weather_events.append(
-            WeatherEvent(
-                id = event, 
-                location = location, 
-                start_time = start_time, 
-                end_time = end_time, 
-                weather_type = weather_type, 
-                severity = severity
-            )
-        )
+    return construct_vessels({vessel_id: events}, kg, start, end, bbox)[vessel_id]
 
-    observed_points, predicted_points = [], []
-    trajectory_sequences = kg.extract_trajectory_sequences(vessel_id)
-    points = []
-
-    for seq in trajectory_sequences:
-        points.extend(kg.extract_observations(seq))
-
-    for point in points:
-        point_info = kg.observation_info(point)
-
-        if point[:3] == "ais":
-            timestamp = point_info["time"].astype(str).iloc[0]
-            lat = point_info["lat"].astype(float).iloc[0]
-            lon = point_info["lon"].astype(float).iloc[0]
-            speed_knots = point_info["speed"].astype(float).iloc[0]
-            course_degrees = point_info["course"].astype(float).iloc[0]
-            dist_from_port_km = point_info["port_dist"].astype(float).iloc[0]
-            dist_from_shore_km = point_info["shore_dist"].astype(float).iloc[0]
-
-            observed_points.append(
-                Observation(
-                    timestamp = timestamp,
-                    lat = lat,
-                    lon = lon,
-                    speed_knots = speed_knots,
-                    course_degrees = course_degrees,
-                    dist_from_port_km = dist_from_port_km,
-                    dist_from_shore_km = dist_from_shore_km
+@traced
+def construct_vessels(events: dict[str, list], kg: KnowledgeGraph, start = None, end = None, bbox: tuple = None) -> dict[str, Vessel]:
+    """
+    Constructs vessel objects for many vessels at once, given a mapping of vessel id to related events.
+    All data is fetched through KnowledgeGraph.hydrate in a constant number of queries.
+    Observed and predicted points are limited to start / end and bbox (min_lon, min_lat, max_lon, max_lat), if given.
+    """
+    return vessels_from_data(events, kg.hydrate(list(events), related_event_ids(events), start, end, bbox))
+
+def related_event_ids(events: dict[str, list]) -> list[str]:
+    """Flattens a mapping of vessel id to related events into the list of event ids"""
+    return [event for vessel_events in events.values() for event_list in vessel_events for event in event_list]
+
+@traced
+def vessels_from_data(events: dict[str, list], data: dict[str, DataFrame]) -> dict[str, Vessel]:
+    """Constructs vessel objects from related events and the frames returned by KnowledgeGraph.hydrate"""
+    info = _rows_by(data["vessels"], "vessel")
+    observations = ObservationTrack.from_frame(data["observations"], "vessel", OBSERVATION_FIELDS)
+    predictions = PredictionTrack.from_frame(data["predictions"], "vessel", PREDICTION_FIELDS)
+
+    details = {}
+    for kind in KnowledgeGraph.EVENT_PROPERTIES:
+        details.update(_rows_by(data.get(kind, DataFrame()), "event"))
+
+    vessels = {}
+    for vessel_id, (gap_ids, port_ids, fishing_ids, weather_ids) in events.items():
+        vessel_info = info[vessel_id]
+
+        vessels[vessel_id] = Vessel(
+            id = vessel_id,
+            name = vessel_info["name"],
+            type = vessel_info["type"],
+            flag = vessel_info["flag"],
+            observed_points = observations.get(vessel_id) or ObservationTrack.from_points([]),
+            predicted_points = predictions.get(vessel_id) or PredictionTrack.from_points([]),
+            gap_events = [
+                GapEvent(
+                    id = event, 
+                    location = details[event]["location"], 
+                    start_time = details[event]["start"], 
+                    end_time = details[event]["end"], 
+                    distance_km = details[event]["gap_distance"], 
+                    duration_hours = details[event]["gap_duration"], 
+                    speed_knots = details[event]["gap_speed"], 
+                    intentional_disabling = details[event]["gap_intentional"]
                 )
-            )
-        else:
-            timestamp = point_info["time"].astype(str).iloc[0]
-            lat = point_info["lat"].astype(float).iloc[0]
-            lon = point_info["lon"].astype(float).iloc[0]
-            speed_knots = point_info["speed"].astype(float).iloc[0]
-            course_degrees = point_info["course"].astype(float).iloc[0]
-
-            predicted_points.append(
-                Prediction(
-                    timestamp = timestamp,
-                    lat = lat,
-                    lon = lon,
-                    speed_knots = speed_knots,
-                    course_degrees = course_degrees
+                for event in gap_ids
+            ],
+            port_events = [
+                PortEvent(
+                    id = event, 
+                    port = details[event]["port"], 
+                    location = details[event]["location"], 
+                    start_time = details[event]["start"], 
+                    end_time = details[event]["end"], 
+                    start_dist_from_port_km = details[event]["port_dist"], 
+                    start_dist_from_shore_km = details[event]["shore_dist"]
                 )
-            )
-    
-    return Vessel(
-        id = vessel_id,
-        name = name,
-        type = type,
-        flag = flag,
-        observed_points = observed_points,
-        predicted_points = predicted_points,
-        gap_events = gap_events,
-        port_events = port_events,
-        fishing_events = fishing_events,
-        weather_events = weather_events
-    )
-
-def construct_cluster(vessel_id: str, neighbors: str, events: list, kg: KnowledgeGraph) -> Cluster:
-    """Constructs a vessel object given a vessel id, nearby vessels, and related events"""
+                for event in port_ids
+            ],
+            fishing_events = [
+                FishingEvent(
+                    id = event, 
+                    location = details[event]["location"], 
+                    start_time = details[event]["start"], 
+                    end_time = details[event]["end"], 
+                    fishing_effort_score = details[event]["score"], 
+                    gear_type = details[event]["gear_type"]
+                )
+                for event in fishing_ids
+            ],
+            weather_events = [
+                WeatherEvent(
+                    id = event, 
+                    location = details[event]["location"], 
+                    start_time = details[event]["start"], 
+                    end_time = details[event]["end"], 
+                    weather_type = details[event]["weather"], 
+                    severity = details[event]["severity"]
+                )
+                for event in weather_ids
+            ]
+        )
 
-    vessel = construct_vessel(vessel_id, events, kg)
+    return vessels
 
-    nearby_vessels = []
+@traced
+def construct_cluster(vessel_id: str, neighbors: str, events: list, kg: KnowledgeGraph, start = None, end = None, bbox: tuple = None) -> Cluster:
+    """
+    Constructs a vessel object given a vessel id, nearby vessels, and related events.
+    Neighbors' events and every vessel's points are limited to start / end and bbox, if given.
+    """
+    cluster_events = kg.find_related_events_batch([n for n in neighbors if n != vessel_id], start, end, bbox)
+    cluster_events[vessel_id] = events
 
-    for neighbor in neighbors:
-        nearby_vessels.append(
-            construct_vessel(neighbor, kg.find_related_events(neighbor), kg)
-        )
+    vessels = construct_vessels(cluster_events, kg, start, end, bbox)
 
     return Cluster(
-        vessel=vessel, 
-        nearby_vessels = nearby_vessels
+        vessel=vessels[vessel_id], 
+        nearby_vessels = [vessels[neighbor] for neighbor in neighbors]
     )
 
+# Column name -> type used when converting query results into model fields
+COLUMN_TYPES = {
+    "name": str, "type": str, "flag": str,
+    "port": str, "location": str, "start": str, "end": str,
+    "gap_distance": float, "gap_duration": float, "gap_speed": float, "gap_intentional": bool,
+    "score": float, "gear_type": str, "weather": str, "severity": str
+}
+
+# Track field -> column of KnowledgeGraph.vessels_observations
+OBSERVATION_FIELDS = {
+    "timestamp": "time", "lat": "lat", "lon": "lon", "speed_knots": "speed", "course_degrees": "course",
+    "dist_from_port_km": "port_dist", "dist_from_shore_km": "shore_dist"
+}
+PREDICTION_FIELDS = {
+    "timestamp": "time", "lat": "lat", "lon": "lon", "speed_knots": "speed", "course_degrees": "course"
+}
+
+def _rows_by(df: DataFrame, key: str) -> dict:
+    """Converts a query result into {key value: row dict}, casting each column once to the type its model field expects"""
+    if df.empty:
+        return {}
+
+    df = df.astype({col: typ for col, typ in COLUMN_TYPES.items() if col in df.columns})
+    rows = {}
+
+    for row in df.to_dict("records"):
+        rows.setdefault(row[key], row)
+    return rows
+
 # Benchmarking
-def extract_facts(text: str, client) -> list[str]:
+def extract_facts(text: str, client, cache: LLMCache = None) -> list[str]:
     """Extracts list of atomic facts from piece of text"""
     SYSTEM_PROMPT = "Extract a list of atomic facts from the given text or JSON."
 
-    res = client.beta.chat.completions.parse(
-        model = "gpt-5",
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"Text: {text}"}
-        ],
-        response_format = AtomicFacts
-    )
-
-    return res.choices[0].message.parsed.facts
+    parsed = parse_llm(client, SYSTEM_PROMPT, f"Text: {text}", AtomicFacts, cache)
+    return parsed.facts
 
-def fact_check(text1: str, text2: str, client) -> tuple[list[str], list[str]]:
+def fact_check(text1: str, text2: str, client, cache: LLMCache = None) -> tuple[list[str], list[str]]:
     """
     Returns a dictionary where each key is an atomic fact from text1 whose 
     value is equal to list of referenced atomic fracts from text2
     """
-    text1_facts = extract_facts(text1)
-    text2_facts = extract_facts(text2)
+    text1_facts = extract_facts(text1, client, cache)
+    text2_facts = extract_facts(text2, client, cache)
 
     SYSTEM_PROMPT = """
         Given 2 lists of atomic facts, each corresponding to a unique piece of text, return 2 lists.
@@ -202,16 +166,31 @@ def fact_check(text1: str, text2: str, client) -> tuple[list[str], list[str]]:
         If no atomic facts are referenced, the value should be an empty list.
     """
 
+    parsed = parse_llm(
+        client,
+        SYSTEM_PROMPT,
+        f"text1 facts: {text1_facts} \n\n text2 facts: {text2_facts}",
+        FactCheck,
+        cache
+    )
+    return parsed.keys, parsed.references
+
+def parse_llm(client, system_prompt: str, user_content: str, response_format, cache: LLMCache = None, model: str = "gpt-5"):
+    """Sends a structured-output request and returns the parsed result, through the cache if given"""
+    if cache is not None:
+        return cache.parse(client, model, system_prompt, user_content, response_format)
+
+    start = time.perf_counter()
     res = client.beta.chat.completions.parse(
-        model = "gpt-5",
+        model = model,
         messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"text1 facts: {text1_facts} \n\n text2 facts: {text2_facts}"}
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
         ],
-        response_format = FactCheck
+        response_format = response_format
     )
-
-    return res.choices[0].message.parsed.keys, res.choices[0].message.parsed.references
+    record_llm(model, time.perf_counter() - start, res, kind = "parse")
+    return res.choices[0].message.parsed
 
 def precision(keys: list[str], references: list[list[str]]) -> float:
     """Returns precision (# relevant facts / total facts) of explanation"""
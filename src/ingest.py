@@ -0,0 +1,313 @@
+import argparse
+import csv
+import json
+import math
+import socket
+import sys
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Iterator
+import numpy as np
+from pandas import DataFrame, Timestamp
+from backends import MARITIME
+from geodesic import haversine
+from KnowledgeGraph import KnowledgeGraph
+from proximity import NEIGHBOR_OFFSETS, grid_cells, to_seconds
+from schema import GapAlert, ProximityAlert
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+# Message field -> (predicate, XSD datatype or None for plain strings) of the :AISObservation triples
+FIELDS = {
+    "mmsi": ("mmsi", None),
+    "lat": ("lat", "decimal"),
+    "lon": ("lon", "decimal"),
+    "speed": ("speed", "decimal"),
+    "course": ("course", "decimal"),
+    "port_dist": ("distanceFromPort_km", "decimal"),
+    "shore_dist": ("distanceFromShore_km", "decimal"),
+    "time": ("timestamp", "dateTime")
+}
+
+# Other names the feed may use for message fields
+ALIASES = {"timestamp": "time", "sog": "speed", "cog": "course", "latitude": "lat", "longitude": "lon"}
+
+KM_PER_NM = 1.852
+
+class StreamIndex:
+    """
+    Sliding-window spatiotemporal index over the most recent AIS positions.
+    Positions are bucketed into dist_thresh km grid cells and kept for window seconds behind the
+    latest time seen, so each new position is only compared against recent positions in its own
+    and neighboring cells. Reports each vessel pair once when it first comes within dist_thresh km
+    and time_thresh seconds (again only after the pair has been apart for a whole window), and
+    each silence longer than gap_hours between consecutive positions of a vessel.
+    """
+
+    def __init__(self, window: float = 3600, time_thresh: float = 600, dist_thresh: float = 30, gap_hours: float = 6.0):
+        self.window = window
+        self.time_thresh = time_thresh
+        self.dist_thresh = dist_thresh
+        self.gap_hours = gap_hours
+
+        self.cells: dict[tuple, deque] = {}
+        self.arrivals: deque = deque()
+        self.last: dict[str, tuple[float, float, float]] = {}
+        self.pairs: dict[tuple[str, str], float] = {}
+        self.watermark = -math.inf
+
+    def __len__(self) -> int:
+        return len(self.arrivals)
+
+    def update(self, t: float, mmsi: str, lat: float, lon: float, cell: tuple) -> list:
+        """Adds one position (cell from proximity.grid_cells) and returns the alerts it raises"""
+        alerts = self._gap(t, mmsi, lat, lon)
+
+        # Recent positions of other vessels in this and neighboring cells, within time_thresh
+        candidates = [
+            point
+            for offset in NEIGHBOR_OFFSETS
+            for point in self.cells.get((cell[0] + offset[0], cell[1] + offset[1], cell[2] + offset[2]), ())
+            if point[1] != mmsi and abs(point[0] - t) <= self.time_thresh
+        ]
+        if candidates:
+            other_t, other_mmsi, other_lat, other_lon = zip(*candidates)
+            distance = haversine(lat, lon, np.array(other_lat), np.array(other_lon))
+
+            for i in np.flatnonzero(distance <= self.dist_thresh):
+                pair = tuple(sorted((mmsi, other_mmsi[i])))
+                last_close = self.pairs.get(pair)
+                self.pairs[pair] = max(t, last_close or t)
+
+                if last_close is None or t - last_close > self.window:
+                    alerts.append(ProximityAlert(
+                        mmsi_A = pair[0],
+                        mmsi_B = pair[1],
+                        time = _format(t),
+                        distance_km = round(float(distance[i]), 3),
+                        time_offset_s = abs(t - other_t[i])
+                    ))
+
+        self.cells.setdefault(cell, deque()).append((t, mmsi, lat, lon))
+        self.arrivals.append((t, cell))
+        self.watermark = max(self.watermark, t)
+        self._evict()
+        return alerts
+
+    def _gap(self, t: float, mmsi: str, lat: float, lon: float) -> list:
+        """Checks the silence since the vessel's previous position; late (out of order) positions are ignored"""
+        previous = self.last.get(mmsi)
+        if previous is not None and t < previous[0]:
+            return []
+        self.last[mmsi] = (t, lat, lon)
+
+        if previous is None or t - previous[0] <= self.gap_hours * 3600:
+            return []
+
+        hours = (t - previous[0]) / 3600
+        distance = float(haversine(previous[1], previous[2], lat, lon))
+        return [GapAlert(
+            mmsi = mmsi,
+            start_time = _format(previous[0]),
+            end_time = _format(t),
+            duration_hours = round(hours, 3),
+            distance_km = round(distance, 3),
+            implied_speed_knots = round(distance / KM_PER_NM / hours, 3)
+        )]
+
+    def _evict(self):
+        """Drops positions and pair states older than the window"""
+        horizon = self.watermark - self.window
+
+        # Positions arrive roughly in time order, so the oldest are at the front
+        while self.arrivals and self.arrivals[0][0] < horizon:
+            _, cell = self.arrivals.popleft()
+            points = self.cells[cell]
+            points.popleft()
+            if not points:
+                del self.cells[cell]
+
+        if len(self.pairs) > 4 * len(self.arrivals) + 1024:
+            self.pairs = {pair: t for pair, t in self.pairs.items() if t >= horizon}
+
+class AISIngestor:
+    """
+    Writes a stream of AIS messages into the knowledge graph as :AISObservation triples, in batches of
+    batch_size messages (or sooner if max_delay seconds pass while messages are waiting), and keeps a
+    StreamIndex up to date so new proximity pairs and AIS gaps are reported as they arrive instead of
+    by re-running find_nearby_vessels over the whole history.
+    """
+
+    def __init__(
+        self,
+        kg: KnowledgeGraph,
+        batch_size: int = 1000,
+        max_delay: float = 5.0,
+        window: float = 3600,
+        time_thresh: float = 600,
+        dist_thresh: float = 30,
+        gap_hours: float = 6.0,
+        source: str = "AIS_Stream"
+    ):
+        self.kg = kg
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.source = source
+        self.index = StreamIndex(window, time_thresh, dist_thresh, gap_hours)
+        self.written = 0
+
+    def ingest(self, messages) -> Iterator:
+        """
+        Consumes messages (dicts; None stands for "no message yet" from an idle source) and yields
+        ProximityAlert / GapAlert objects after each batch is written
+        """
+        batch, first = [], None
+
+        for message in messages:
+            if message is not None:
+                batch.append(message)
+                first = first or time.monotonic()
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - first >= self.max_delay):
+                yield from self.ingest_batch(batch)
+                batch, first = [], None
+
+        if batch:
+            yield from self.ingest_batch(batch)
+
+    def ingest_batch(self, messages: list[dict]) -> list:
+        """Writes one batch of messages and returns the alerts they raise, in time order"""
+        df = DataFrame([_normalize(message) for message in messages])
+        if df.empty:
+            return []
+
+        df["mmsi"] = df["mmsi"].astype(str)
+        t = to_seconds(df["time"])
+
+        self.kg.backend.add(self._ntriples(df, t))
+        self.kg.invalidate_cache()
+        self.written += len(df)
+
+        cells = grid_cells(df["lat"], df["lon"], self.index.dist_thresh)
+        mmsi, lat, lon = df["mmsi"].to_numpy(), df["lat"].to_numpy(dtype = float), df["lon"].to_numpy(dtype = float)
+
+        alerts = []
+        for i in np.argsort(t, kind = "stable"):
+            alerts.extend(self.index.update(t[i], mmsi[i], lat[i], lon[i], tuple(cells[i])))
+        return alerts
+
+    def _ntriples(self, df: DataFrame, t: np.ndarray) -> str:
+        """Renders a batch of messages as N-Triples"""
+        ids = df["id"] if "id" in df.columns else [f"ais_{m}_{int(s)}" for m, s in zip(df["mmsi"], t)]
+        times = [_format_iso(s) for s in t]
+        columns = [col for col in FIELDS if col in df.columns and col != "time"]
+
+        lines = []
+        for row, (obs_id, iso) in enumerate(zip(ids, times)):
+            subject = f"<{MARITIME}{obs_id}>"
+            lines.append(f"{subject} <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <{MARITIME}AISObservation> .")
+            lines.append(f"{subject} <{MARITIME}source> {_string(self.source)} .")
+            lines.append(f'{subject} <{MARITIME}timestamp> "{iso}"^^<{XSD}dateTime> .')
+
+            for col in columns:
+                value = df[col].iat[row]
+                if value is None or value != value:
+                    continue
+                predicate, datatype = FIELDS[col]
+                if datatype is None:
+                    literal = _string(value)
+                elif math.isfinite(float(value)):
+                    literal = f'"{_decimal(value)}"^^<{XSD}{datatype}>'
+                else:
+                    continue
+                lines.append(f"{subject} <{MARITIME}{predicate}> {literal} .")
+        return "\n".join(lines) + "\n"
+
+def file_messages(path: str) -> Iterator[dict]:
+    """Reads AIS messages from an NDJSON or CSV file"""
+    with open(path, encoding = "utf-8", newline = "") as file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+def socket_messages(host: str, port: int, idle: float = 1.0) -> Iterator[dict | None]:
+    """
+    Reads NDJSON AIS messages from a local TCP socket (a stand-in for the live feed) until it closes,
+    yielding None whenever no message arrives for idle seconds so pending batches can be flushed
+    """
+    with socket.create_connection((host, port)) as conn:
+        conn.settimeout(idle)
+        buffer = b""
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except socket.timeout:
+                yield None
+                continue
+            if not chunk:
+                break
+
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    if buffer.strip():
+        yield json.loads(buffer)
+
+def _normalize(message: dict) -> dict:
+    """Maps a message's fields to FIELDS names"""
+    return {ALIASES.get(key, key): value for key, value in message.items()}
+
+def _format(t: float) -> str:
+    return str(Timestamp(t, unit = "s", tz = "UTC").to_pydatetime())
+
+def _format_iso(t: float) -> str:
+    return Timestamp(t, unit = "s", tz = "UTC").isoformat().replace("+00:00", "Z")
+
+def _string(value) -> str:
+    """Plain N-Triples literal, with backslashes, quotes and line breaks escaped"""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    return f'"{text}"'
+
+def _decimal(value) -> str:
+    """Lexical form of an xsd:decimal: fixed-point, never exponent notation (1e-05 is written 0.00001)"""
+    return format(Decimal(repr(float(value))), "f")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Ingest AIS messages and report new proximity pairs and AIS gaps as NDJSON")
+    source = parser.add_mutually_exclusive_group(required = True)
+    source.add_argument("--file", help = "NDJSON or CSV file of AIS messages")
+    source.add_argument("--socket", help = "host:port of a local NDJSON feed")
+    parser.add_argument("--repo", help = "AllegroGraph repository to write to")
+    parser.add_argument("--ttl", nargs = "*", default = [], help = "Local RDF files to load into an embedded store instead")
+    parser.add_argument("--batch-size", type = int, default = 1000)
+    parser.add_argument("--window", type = float, default = 3600, help = "Seconds of history kept in the index")
+    parser.add_argument("--time-thresh", type = float, default = 600)
+    parser.add_argument("--dist-thresh", type = float, default = 30)
+    parser.add_argument("--gap-hours", type = float, default = 6.0)
+    args = parser.parse_args()
+
+    kg = KnowledgeGraph(args.repo) if args.repo else KnowledgeGraph.from_files(*args.ttl)
+    ingestor = AISIngestor(
+        kg, batch_size = args.batch_size, window = args.window,
+        time_thresh = args.time_thresh, dist_thresh = args.dist_thresh, gap_hours = args.gap_hours
+    )
+
+    if args.file:
+        messages = file_messages(args.file)
+    else:
+        host, port = args.socket.rsplit(":", 1)
+        messages = socket_messages(host, int(port))
+
+    for alert in ingestor.ingest(messages):
+        sys.stdout.write(alert.model_dump_json() + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import numpy as np
+from pandas import DataFrame
+from proximity import to_seconds
+
+class IntervalIndex:
+    """
+    Overlap queries over a fixed set of closed [start, end] intervals (in seconds).
+    Intervals are bucketed by length into powers-of-two classes, each sorted by start. An interval
+    overlaps a query window iff it starts before the window ends and within its class's maximum length
+    before the window starts, so each class answers with two binary searches plus a scan over
+    candidates that are at worst a constant factor more than the true matches.
+    """
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype = float)
+        ends = np.asarray(ends, dtype = float)
+        lengths = np.maximum(ends - starts, 0.0)
+        length_class = np.floor(np.log2(lengths + 1.0)).astype(np.int64)
+
+        self.classes = []
+        for c in np.unique(length_class):
+            members = np.nonzero(length_class == c)[0]
+            members = members[np.argsort(starts[members], kind = "stable")]
+            self.classes.append((members, starts[members], ends[members], lengths[members].max()))
+
+    def overlaps(self, starts, ends) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns index arrays (window, interval) for every query window [starts[w], ends[w]]
+        and every interval overlapping it
+        """
+        starts = np.asarray(starts, dtype = float)
+        ends = np.asarray(ends, dtype = float)
+        windows, intervals = [], []
+
+        for members, class_starts, class_ends, max_length in self.classes:
+            lo = np.searchsorted(class_starts, starts - max_length, side = "left")
+            hi = np.searchsorted(class_starts, ends, side = "right")
+            counts = np.maximum(hi - lo, 0)
+            if counts.sum() == 0:
+                continue
+
+            # Expand each window's [lo, hi) candidate range without a Python loop
+            window = np.repeat(np.arange(len(starts)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            position = np.repeat(lo, counts) + offsets
+
+            hit = class_ends[position] >= starts[window]
+            windows.append(window[hit])
+            intervals.append(members[position[hit]])
+
+        if not windows:
+            return np.empty(0, dtype = np.int64), np.empty(0, dtype = np.int64)
+        return np.concatenate(windows), np.concatenate(intervals)
+
+class EventIndex:
+    """Interval indexes over events, keyed by event type and zone"""
+
+    def __init__(self, events: DataFrame):
+        """Builds the index from a frame with "event", "type", "location", "start" and "end" columns"""
+        self.events = events.reset_index(drop = True)
+        self.indexes = {}
+
+        if self.events.empty:
+            return
+
+        starts = to_seconds(self.events["start"])
+        ends = to_seconds(self.events["end"])
+        keys = self.events[["type", "location"]].fillna("").itertuples(index = False, name = None)
+
+        for key, positions in DataFrame({"key": list(keys)}).groupby("key").indices.items():
+            self.indexes[key] = (IntervalIndex(starts[positions], ends[positions]), positions)
+
+    def overlapping(self, event_type: str, starts, ends, zones = None) -> DataFrame:
+        """
+        Returns (window, event) rows pairing each query window with the events of event_type overlapping it.
+        window indexes the query arrays and event indexes self.events. If zones is given,
+        window w only matches events located in zones[w].
+        """
+        starts = np.asarray(starts, dtype = float)
+        ends = np.asarray(ends, dtype = float)
+        zones = None if zones is None else np.asarray(zones, dtype = object)
+        windows, events = [], []
+
+        for (key_type, key_zone), (index, positions) in self.indexes.items():
+            if key_type != event_type:
+                continue
+
+            subset = np.arange(len(starts)) if zones is None else np.nonzero(zones == key_zone)[0]
+            if len(subset) == 0:
+                continue
+
+            window, interval = index.overlaps(starts[subset], ends[subset])
+            windows.append(subset[window])
+            events.append(positions[interval])
+
+        if not windows:
+            return DataFrame({"window": np.empty(0, dtype = np.int64), "event": np.empty(0, dtype = np.int64)})
+        return DataFrame({"window": np.concatenate(windows), "event": np.concatenate(events)})
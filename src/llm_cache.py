@@ -0,0 +1,107 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pydantic import BaseModel
+import metrics
+
+class LLMCache:
+    """
+    Content-addressed cache of parsed structured-output LLM responses.
+    Entries are keyed on model, system prompt, user content and response schema, and hold the
+    parsed pydantic result as JSON (in memory, and in SQLite if a path is given). Concurrent calls
+    with the same key are merged: one caller queries the model and the others wait for its result.
+    """
+
+    def __init__(self, path: str = None):
+        self.entries: dict[str, str] = {}
+        self.inflight: dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread = False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT)")
+            self.db.commit()
+
+    def key(self, model: str, system_prompt: str, user_content: str, response_format: type[BaseModel]) -> str:
+        """Returns the content address of a request"""
+        payload = json.dumps(
+            [model, system_prompt, user_content, response_format.model_json_schema()],
+            sort_keys = True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def parse(self, client, model: str, system_prompt: str, user_content: str, response_format: type[BaseModel]) -> BaseModel:
+        """Returns the parsed response for a request, calling the model only on a cache miss"""
+        key = self.key(model, system_prompt, user_content, response_format)
+
+        with self.lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                metrics.record_llm(model, 0.0, kind = "parse", cached = True)
+                return response_format.model_validate_json(value)
+
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.merged += 1
+
+        if not owner:
+            start = time.perf_counter()
+            value = future.result()
+            metrics.record_llm(model, time.perf_counter() - start, kind = "parse", merged = True)
+            return response_format.model_validate_json(value)
+
+        try:
+            start = time.perf_counter()
+            res = client.beta.chat.completions.parse(
+                model = model,
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                response_format = response_format
+            )
+            metrics.record_llm(model, time.perf_counter() - start, res, kind = "parse")
+            value = res.choices[0].message.parsed.model_dump_json()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self._store(key, value)
+            del self.inflight[key]
+        future.set_result(value)
+        return response_format.model_validate_json(value)
+
+    def stats(self) -> dict:
+        """Returns hit, miss and merged-request counters"""
+        return {"hits": self.hits, "misses": self.misses, "merged": self.merged, "size": len(self.entries)}
+
+    def _lookup(self, key: str) -> str | None:
+        """Returns the stored response JSON for key, checking memory then disk"""
+        value = self.entries.get(key)
+        if value is None and self.db is not None:
+            row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = self.entries[key] = row[0]
+        return value
+
+    def _store(self, key: str, value: str):
+        """Stores response JSON under key in memory and on disk"""
+        self.entries[key] = value
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value))
+            self.db.commit()
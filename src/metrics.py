@@ -0,0 +1,302 @@
+import functools
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds of the histogram buckets for timings (seconds) and per-call counts
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, math.inf)
+
+# Calls whose query, row and byte totals are recorded per call
+SPAN_TARGETS = {"construct_cluster", "construct_vessels", "construct_vessel", "KnowledgeGraph.hydrate"}
+
+# Calls that are SPARQL round trips
+QUERY_TARGETS = {"AllegroGraphBackend.rows", "RDFLibBackend.rows", "AllegroGraphBackend.construct", "RDFLibBackend.construct"}
+
+# Most recent per-query and per-call records kept for reports
+RECENT = 1000
+
+class Metrics:
+    """
+    Timing histograms, counters and recent per-query / per-call records, exportable as JSON or
+    Prometheus text. Metric series are keyed on a name and a set of labels.
+    """
+
+    def __init__(self):
+        self.histograms: dict[tuple, dict] = {}
+        self.counters: dict[tuple, float] = {}
+        self.queries: deque = deque(maxlen = RECENT)
+        self.calls: deque = deque(maxlen = RECENT)
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels):
+        """Adds a value to a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    "buckets": buckets, "counts": [0] * len(buckets),
+                    "count": 0, "sum": 0.0, "min": math.inf, "max": -math.inf
+                }
+            hist["counts"][next(i for i, bound in enumerate(buckets) if value <= bound)] += 1
+            hist["count"] += 1
+            hist["sum"] += value
+            hist["min"] = min(hist["min"], value)
+            hist["max"] = max(hist["max"], value)
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Adds to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.queries.clear()
+            self.calls.clear()
+
+    def to_dict(self) -> dict:
+        """Returns every series and the recent records as plain data"""
+        with self.lock:
+            return {
+                "histograms": [
+                    {
+                        "name": name, "labels": dict(labels),
+                        "count": hist["count"], "sum": hist["sum"], "min": hist["min"], "max": hist["max"],
+                        "buckets": {str(bound): count for bound, count in zip(hist["buckets"], _cumulative(hist["counts"]))}
+                    }
+                    for (name, labels), hist in self.histograms.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "queries": list(self.queries),
+                "calls": list(self.calls)
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), default = str, **kwargs)
+
+    def to_prometheus(self, prefix: str = "maritime_") -> str:
+        """Returns every series in the Prometheus text exposition format"""
+        lines, typed = [], set()
+
+        with self.lock:
+            for (name, labels), hist in sorted(self.histograms.items()):
+                metric = prefix + name
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                for bound, count in zip(hist["buckets"], _cumulative(hist["counts"])):
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f"{metric}_bucket{_labels(labels, le = le)} {count}")
+                lines.append(f"{metric}_sum{_labels(labels)} {hist['sum']}")
+                lines.append(f"{metric}_count{_labels(labels)} {hist['count']}")
+
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = prefix + name
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> str:
+        """Returns a text breakdown of where the time went, slowest first"""
+        with self.lock:
+            timings = sorted(
+                ((dict(labels)["target"], hist) for (name, labels), hist in self.histograms.items() if name == "call_seconds"),
+                key = lambda item: -item[1]["sum"]
+            )
+            counters = dict(self.counters)
+
+        lines = [f"{'call':<40} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+        for target, hist in timings:
+            lines.append(
+                f"{target:<40} {hist['count']:>7} {hist['sum']:>9.3f} "
+                f"{1000 * hist['sum'] / hist['count']:>9.2f} {1000 * hist['max']:>9.2f}"
+            )
+
+        def total(metric):
+            return sum(value for (name, _), value in counters.items() if name == metric)
+
+        lines.append("")
+        lines.append(
+            f"SPARQL: {total('sparql_queries_total'):.0f} queries, {total('sparql_rows_total'):.0f} rows, "
+            f"{total('sparql_bytes_total'):.0f} bytes"
+        )
+        if total("llm_calls_total"):
+            lines.append(
+                f"LLM: {total('llm_calls_total'):.0f} calls, {total('llm_prompt_tokens_total'):.0f} prompt tokens, "
+                f"{total('llm_completion_tokens_total'):.0f} completion tokens"
+            )
+        return "\n".join(lines)
+
+# Global registry, collecting while enable() is in effect
+METRICS = Metrics()
+
+# Registries collecting calls from every thread (enable), replaced whole so readers never need the lock
+_sinks: tuple[Metrics, ...] = ()
+_lock = threading.Lock()
+
+# Registries collecting calls made in the current context only (profile): this thread, and the
+# asyncio tasks and asyncio.to_thread workers started from it
+_profiles: ContextVar[tuple[Metrics, ...]] = ContextVar("profiles", default = ())
+
+_state = threading.local()
+
+def enabled() -> bool:
+    return bool(_sinks or _profiles.get())
+
+def enable(metrics: Metrics = METRICS):
+    """Starts collecting calls from every thread into metrics (the global registry by default)"""
+    global _sinks
+    with _lock:
+        if metrics not in _sinks:
+            _sinks = (*_sinks, metrics)
+
+def disable(metrics: Metrics = METRICS):
+    """Stops collecting into metrics"""
+    global _sinks
+    with _lock:
+        _sinks = tuple(sink for sink in _sinks if sink is not metrics)
+
+@contextmanager
+def profile():
+    """
+    Collects metrics for the calls made in a block, e.g. one notebook cell, into a fresh registry:
+
+        with profile() as p:
+            cluster = construct_cluster(...)
+        print(p.report())
+
+    Calls made by other threads at the same time are not collected, so concurrent profiles don't mix
+    """
+    metrics = Metrics()
+    token = _profiles.set((*_profiles.get(), metrics))
+    try:
+        yield metrics
+    finally:
+        _profiles.reset(token)
+
+def traced(fn):
+    """
+    Times a function or method (recorded under its qualified name, e.g. "KnowledgeGraph.hydrate").
+    Overrides in subclasses are timed only if decorated too. When nothing is collecting this costs
+    one check per call
+    """
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        sinks = _active()
+        if not sinks:
+            return fn(*args, **kwargs)
+        return _timed_call(sinks, name, fn, args, kwargs)
+    return wrapper
+
+def record_llm(
+    model: str,
+    seconds: float,
+    response = None,
+    kind: str = "completion",
+    cached: bool = False,
+    merged: bool = False
+):
+    """
+    Records the latency and token usage of one LLM call (a no-op when instrumentation is off).
+    Cached calls are answered from a cache, merged ones by waiting on an identical call in flight;
+    neither uses tokens
+    """
+    sinks = _active()
+    if not sinks:
+        return
+
+    usage = getattr(response, "usage", None)
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+
+    for metrics in sinks:
+        metrics.count("llm_calls_total", model = model, kind = kind, cached = str(cached).lower(), merged = str(merged).lower())
+        if merged:
+            metrics.observe("llm_wait_seconds", seconds, model = model, kind = kind)
+        elif not cached:
+            metrics.observe("llm_seconds", seconds, model = model, kind = kind)
+            metrics.count("llm_prompt_tokens_total", prompt, model = model, kind = kind)
+            metrics.count("llm_completion_tokens_total", completion, model = model, kind = kind)
+
+def _active() -> tuple[Metrics, ...]:
+    """Registries collecting the current call"""
+    return _sinks + _profiles.get()
+
+def _timed_call(sinks: tuple, name: str, fn, args, kwargs):
+    """Runs fn, recording its duration and, for spans and SPARQL round trips, query statistics"""
+    spans = _spans()
+    span = {"call": name, "queries": 0, "rows": 0, "bytes": 0}
+    spans.append(span)
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        spans.pop()
+
+        for metrics in sinks:
+            metrics.observe("call_seconds", seconds, target = name)
+
+    if name in QUERY_TARGETS:
+        _record_query(sinks, spans, seconds, result)
+    elif name in SPAN_TARGETS or name.split(".")[-1] in SPAN_TARGETS:
+        span["seconds"] = seconds
+        for metrics in sinks:
+            metrics.observe("queries_per_call", span["queries"], COUNT_BUCKETS, call = name)
+            metrics.calls.append(span)
+    return result
+
+def _record_query(sinks: tuple, spans: list, seconds: float, result):
+    """Attributes one round trip's rows and bytes to the innermost KnowledgeGraph method and all open spans"""
+    columns, rows = result
+    size = sum(len(term) for row in rows for term in row if term)
+    method = next((span["call"] for span in reversed(spans) if span["call"].startswith("KnowledgeGraph.")), "")
+
+    for span in spans:
+        span["queries"] += 1
+        span["rows"] += len(rows)
+        span["bytes"] += size
+
+    for metrics in sinks:
+        metrics.observe("sparql_query_seconds", seconds, method = method)
+        metrics.count("sparql_queries_total", method = method)
+        metrics.count("sparql_rows_total", len(rows), method = method)
+        metrics.count("sparql_bytes_total", size, method = method)
+        metrics.queries.append({"method": method, "seconds": seconds, "rows": len(rows), "bytes": size, "columns": columns})
+
+def _spans() -> list:
+    if not hasattr(_state, "spans"):
+        _state.spans = []
+    return _state.spans
+
+def _cumulative(counts: list[int]) -> list[int]:
+    total, out = 0, []
+    for count in counts:
+        total += count
+        out.append(total)
+    return out
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
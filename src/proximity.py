@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from geodesic import EARTH_RADIUS_KM
+from metrics import traced
+
+# Number of left-hand observations swept per block
+BLOCK_SIZE = 4096
+
+# Offsets of a grid cell and its 26 neighbors
+NEIGHBOR_OFFSETS = np.array(
+    [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)],
+    dtype = np.int64
+)
+
+# Odd 64-bit multipliers hashing a grid cell and time bucket into one int64 key (wrapping on overflow)
+KEY_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93], dtype = np.uint64)
+
+def to_seconds(times) -> np.ndarray:
+    """Converts a column of timestamps to float seconds since the epoch (UTC)"""
+    times = pd.to_datetime(pd.Series(times), utc = True)
+    return (times - pd.Timestamp(0, tz = "UTC")).dt.total_seconds().to_numpy(dtype = float)
+
+def grid_cells(lat, lon, cell_km: float) -> np.ndarray:
+    """
+    Buckets points into cubes of side cell_km on an earth-centered cartesian grid.
+    Two points within cell_km along the surface are always in the same or adjacent cells,
+    including across the antimeridian and near the poles.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype = float))
+    lon_rad = np.radians(np.asarray(lon, dtype = float))
+
+    xyz = EARTH_RADIUS_KM * np.column_stack((
+        np.cos(lat_rad) * np.cos(lon_rad),
+        np.cos(lat_rad) * np.sin(lon_rad),
+        np.sin(lat_rad)
+    ))
+    return np.floor(xyz / cell_km).astype(np.int64)
+
+@traced
+def proximity_join(left: DataFrame, right: DataFrame, time_thresh: float, dist_thresh: float) -> DataFrame:
+    """
+    Returns candidate pairs of observations from left and right that are within
+    time_thresh seconds and share a dist_thresh km grid neighborhood.
+
+    Both frames need "time", "lat" and "lon" columns. Other columns are carried through,
+    suffixed with 1 (left) and 2 (right). Observations are hashed on their grid cell and a time
+    bucket, and each left observation probes the neighboring cells in its own and the nearer
+    bucket, so only pairs close in both space and time are ever built: memory
+    stays bounded by the block size and the local density of observations, even for vessels
+    dwelling in one cell, rather than len(left) * len(right).
+    """
+    if dist_thresh <= 0:
+        raise ValueError(f"dist_thresh must be positive, got {dist_thresh}")
+    if time_thresh < 0:
+        raise ValueError(f"time_thresh must not be negative, got {time_thresh}")
+
+    left_cols = [f"{col}1" for col in left.columns]
+    right_cols = [f"{col}2" for col in right.columns]
+
+    if left.empty or right.empty:
+        return DataFrame(columns = left_cols + right_cols)
+
+    left = left.reset_index(drop = True)
+    right = right.reset_index(drop = True)
+
+    left_t = to_seconds(left["time"])
+    right_t = to_seconds(right["time"])
+    left_cells = grid_cells(left["lat"], left["lon"], dist_thresh)
+    right_cells = grid_cells(right["lat"], right["lon"], dist_thresh)
+
+    # Time buckets twice time_thresh wide: a left observation's [t - time_thresh, t + time_thresh]
+    # lies in its own bucket and at most the nearer neighbor (any width works for time_thresh 0)
+    width = 2 * time_thresh if time_thresh > 0 else 1.0
+    left_buckets = np.floor(left_t / width)
+    nearer = np.where(left_t / width - left_buckets < 0.5, -1, 1)
+    left_keys = _cell_keys(left_cells, left_buckets.astype(np.int64))
+    right_keys = _cell_keys(right_cells, np.floor(right_t / width).astype(np.int64))
+    neighbor_keys = _cell_keys(NEIGHBOR_OFFSETS, np.zeros(len(NEIGHBOR_OFFSETS), dtype = np.int64))
+    bucket_key = _cell_keys(np.zeros((1, 3), dtype = np.int64), np.ones(1, dtype = np.int64))[0]
+
+    left_order = np.argsort(left_t, kind = "stable")
+    right_order = np.argsort(right_t, kind = "stable")
+    right_sorted_t = right_t[right_order]
+
+    pairs = []
+
+    for block_start in range(0, len(left_order), BLOCK_SIZE):
+        block = left_order[block_start:block_start + BLOCK_SIZE]
+
+        # Right observations whose time could match any left observation in this block
+        lo = np.searchsorted(right_sorted_t, left_t[block].min() - time_thresh, side = "left")
+        hi = np.searchsorted(right_sorted_t, left_t[block].max() + time_thresh, side = "right")
+        if lo == hi:
+            continue
+        window = right_order[lo:hi]
+        targets = window[np.argsort(right_keys[window], kind = "stable")]
+        target_keys = right_keys[targets]
+
+        # Hash join on grid cell and time bucket: each left observation probes its cell and the
+        # 26 neighbors, in its own and the nearer time bucket
+        own = left_keys[block]
+        buckets = np.column_stack((own, own + nearer[block] * bucket_key))
+        probes = (buckets[:, :, None] + neighbor_keys[None, None, :]).ravel()
+        starts = np.searchsorted(target_keys, probes, side = "left")
+        counts = np.searchsorted(target_keys, probes, side = "right") - starts
+
+        i = np.repeat(block, counts.reshape(len(block), -1).sum(axis = 1))
+        ends = np.cumsum(counts)
+        j = targets[np.repeat(starts - ends + counts, counts) + np.arange(ends[-1])]
+
+        # Keys are hashes: drop the rare collisions along with the pairs too far apart in time
+        keep = np.abs(left_t[i] - right_t[j]) <= time_thresh
+        keep &= (np.abs(left_cells[i] - right_cells[j]) <= 1).all(axis = 1)
+        pairs.append((i[keep], j[keep]))
+
+    if not pairs:
+        return DataFrame(columns = left_cols + right_cols)
+
+    i = np.concatenate([p[0] for p in pairs])
+    j = np.concatenate([p[1] for p in pairs])
+
+    left_part = left.iloc[i].reset_index(drop = True)
+    left_part.columns = left_cols
+    right_part = right.iloc[j].reset_index(drop = True)
+    right_part.columns = right_cols
+    return pd.concat([left_part, right_part], axis = 1)
+
+def _cell_keys(cells: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """
+    Hashes grid cells and time buckets into int64 keys. The hash is linear, so the key of a cell
+    plus an offset is the cell's key plus the offset's
+    """
+    columns = np.column_stack((cells, buckets)).astype(np.uint64)
+    return (columns * KEY_MULTIPLIERS).sum(axis = 1, dtype = np.uint64).view(np.int64)
@@ -0,0 +1,133 @@
+import re
+from collections.abc import Iterator
+from itertools import islice
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from metrics import traced
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+# Column kinds a result can be decoded to: local names of IRIs, IRIs as "<...>" strings,
+# and typed literals
+KINDS = {"id", "iri", "string", "decimal", "integer", "dateTime", "boolean"}
+
+# Literal datatype -> column kind, for columns whose kind isn't given
+DATATYPE_KINDS = {
+    XSD + "decimal": "decimal", XSD + "double": "decimal", XSD + "float": "decimal",
+    XSD + "integer": "integer", XSD + "int": "integer", XSD + "long": "integer",
+    XSD + "short": "integer", XSD + "nonNegativeInteger": "integer",
+    XSD + "dateTime": "dateTime", XSD + "dateTimeStamp": "dateTime",
+    XSD + "boolean": "boolean"
+}
+
+# Rows decoded per frame in iterator mode
+BATCH_SIZE = 50_000
+
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+ESCAPE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+
+@traced
+def decode(columns: list[str], rows, types: dict[str, str] = None, local_names: bool = False) -> DataFrame:
+    """
+    Decodes SELECT result rows of N-Triples terms (None where unbound) into a DataFrame of typed
+    NumPy columns. types maps columns to kinds (see KINDS); other columns are typed from the
+    datatype of their first bound literal, and IRIs stay "<...>" strings (or become their local
+    names if local_names is set)
+    """
+    return _frame(columns, list(rows), dict(types or {}), local_names)
+
+def iter_decode(columns: list[str], rows, types: dict[str, str] = None, local_names: bool = False, batch_size: int = BATCH_SIZE) -> Iterator[DataFrame]:
+    """
+    Decodes result rows batch_size at a time, yielding one frame per batch, so very large results
+    never have to be held as Python objects all at once. Column kinds are fixed by the first batch
+    """
+    types = dict(types or {})
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        df = _frame(columns, batch, types, local_names)
+        types.update(df.attrs["kinds"])
+        yield df
+
+def local_name(term: str) -> str:
+    """Returns the part of an IRI term ("<...#name>" or "<.../name>") after its namespace"""
+    end = len(term) - 1 if term.endswith(">") else len(term)
+    return term[max(term.rfind("#", 0, end), term.rfind("/", 0, end)) + 1:end]
+
+def lexical(term: str) -> str:
+    """Returns the lexical form of a literal term, unescaped"""
+    value = term[1:term.rfind('"')]
+    return ESCAPE.sub(_unescape, value) if "\\" in value else value
+
+def datatype(term: str) -> str | None:
+    """Returns the datatype IRI of a literal term, or None if it has none"""
+    end = term.rfind('"')
+    return term[end + 4:-1] if term.startswith("^^<", end + 1) else None
+
+def _frame(columns: list[str], rows: list, types: dict[str, str], local_names: bool) -> DataFrame:
+    """Decodes one batch of rows column by column"""
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    data, kinds = {}, {}
+
+    for col, terms in zip(columns, values):
+        kind = types.get(col) or _infer(terms, local_names)
+        data[col] = _decode_column(terms, kind or "iri")
+        if kind:
+            kinds[col] = kind
+
+    df = DataFrame(data, columns = columns)
+    df.attrs["kinds"] = kinds
+    return df
+
+def _infer(terms, local_names: bool) -> str:
+    """Picks a column kind from its first bound term, or None if the column has none"""
+    term = next((t for t in terms if t), None)
+    if term is None:
+        return None
+    if not term.startswith('"'):
+        return "id" if local_names else "iri"
+    return DATATYPE_KINDS.get(datatype(term), "string")
+
+def _decode_column(terms, kind: str):
+    """Converts a column of terms to an array of the given kind"""
+    if kind == "iri":
+        return np.array([t or None for t in terms], dtype = object)
+
+    if kind == "id":
+        # Local names by slicing off the namespace of the column's first IRI; other terms take the slow path
+        first = next((t for t in terms if t), "")
+        prefix = first[:len(first) - len(local_name(first)) - 1] if first.startswith("<") else None
+        if not prefix:
+            return np.array([_term_id(t) if t else None for t in terms], dtype = object)
+
+        size = len(prefix)
+        return np.array([
+            (t[size:-1] if t.startswith(prefix) else _term_id(t)) if t else None
+            for t in terms
+        ], dtype = object)
+
+    lexicals = [lexical(t) if t else None for t in terms]
+
+    if kind == "decimal":
+        return np.array([v if v is not None else "nan" for v in lexicals], dtype = float)
+    if kind == "integer":
+        if None in lexicals:
+            return np.array([v if v is not None else "nan" for v in lexicals], dtype = float)
+        return np.array(lexicals, dtype = np.int64)
+    if kind == "dateTime":
+        return pd.to_datetime(pd.Series(lexicals, dtype = object), utc = True, format = "ISO8601").array
+    if kind == "boolean":
+        if None in lexicals:
+            return np.array([None if v is None else v in ("true", "1") for v in lexicals], dtype = object)
+        return np.array([v in ("true", "1") for v in lexicals], dtype = bool)
+    return np.array(lexicals, dtype = object)
+
+def _term_id(term: str) -> str:
+    """Local name of an IRI, or lexical form of a literal found in an id column"""
+    return lexical(term) if term.startswith('"') else local_name(term)
+
+def _unescape(match: re.Match) -> str:
+    code = match.group(1)
+    if code[0] in "uU" and len(code) > 1:
+        return chr(int(code[1:], 16))
+    return ESCAPES.get(code, code)
@@ -1,4 +1,7 @@
+import numpy as np
+import pandas as pd
 from pydantic import BaseModel, Field
+from pydantic_core import core_schema
 
 # inputs
 class Cluster(BaseModel):
@@ -10,8 +13,8 @@ class Vessel(BaseModel):
     name: str
     type: str
     flag: str
-    observed_points: list["Observation"] = Field(..., description = "List of observed points associated with vessel. Empty list if none.")
-    predicted_points: list["Prediction"] = Field(..., description = "List of predicted points associated with vessel. Empty list if none.")
+    observed_points: "ObservationTrack" = Field(..., description = "List of observed points associated with vessel. Empty list if none.")
+    predicted_points: "PredictionTrack" = Field(..., description = "List of predicted points associated with vessel. Empty list if none.")
     gap_events: list["GapEvent"] = Field(..., description = "List of AIS gap events associated with vessel. Empty list if none.")
     port_events: list["PortEvent"] = Field(..., description = "List of port visit events associated with vesse. Empty list if none.")
     fishing_events: list["FishingEvent"] = Field(..., description = "List of fishing events associated with vessel. Empty list if none.")
@@ -33,6 +36,129 @@ class Prediction(BaseModel):
     speed_knots: float
     course_degrees: float
 
+class Track:
+    """
+    Columnar (struct-of-arrays) sequence of points: one NumPy array per point field.
+    Validates from and serializes to a list of point objects, so JSON and JSON schema are
+    the same as list[point], while analytics read whole columns (track.lat, track.seconds, ...)
+    without building a model per point. Slicing and fancy indexing return new tracks, and
+    tracks built with from_frame from a result already ordered by key share its float columns.
+    """
+
+    point: type[BaseModel] = None
+
+    def __init__(self, columns: dict[str, np.ndarray]):
+        self.columns = {
+            field: np.asarray(columns[field], dtype = self._dtype(field))
+            for field in self.point.model_fields
+        }
+
+    @classmethod
+    def from_points(cls, points: list) -> "Track":
+        """Builds a track from point objects (or dicts with the point's fields)"""
+        points = [p.model_dump() if isinstance(p, BaseModel) else p for p in points]
+        return cls({field: [p[field] for p in points] for field in cls.point.model_fields})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key: str, columns: dict[str, str]) -> dict[str, "Track"]:
+        """
+        Splits a bulk query result into one track per value of its key column, in row order.
+        columns maps point fields to frame columns. Each column is converted once, and every
+        track holds views into those arrays; if the frame is already ordered by key, float
+        columns are not copied at all and the tracks view the frame's own arrays.
+        """
+        if df.empty:
+            return {}
+
+        keys = df[key].to_numpy()
+        # Bulk results come ordered by key: a slice keeps their columns as views, where a sort copies them
+        order = slice(None) if (keys[1:] >= keys[:-1]).all() else np.argsort(keys, kind = "stable")
+        keys = keys[order]
+        arrays = {
+            field: cls._convert(df[column].to_numpy()[order], cls._dtype(field))
+            for field, column in columns.items()
+        }
+
+        bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        starts, stops = np.concatenate(([0], bounds)), np.concatenate((bounds, [len(keys)]))
+        return {
+            keys[start]: cls({field: array[start:stop] for field, array in arrays.items()})
+            for start, stop in zip(starts, stops)
+        }
+
+    @property
+    def seconds(self) -> np.ndarray:
+        """Timestamps as float seconds since the epoch (UTC), parsed once"""
+        if "_seconds" not in self.__dict__:
+            times = pd.to_datetime(pd.Series(self.timestamp, dtype = object), utc = True)
+            self._seconds = (times - pd.Timestamp(0, tz = "UTC")).dt.total_seconds().to_numpy(dtype = float)
+        return self._seconds
+
+    def replace(self, **columns) -> "Track":
+        """Returns a track with some columns replaced"""
+        return type(self)({**self.columns, **columns})
+
+    def to_list(self) -> list[dict]:
+        """Returns the points as a list of plain dicts"""
+        fields = list(self.columns)
+        return [dict(zip(fields, row)) for row in zip(*(self.columns[f].tolist() for f in fields))]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(f"{type(self).__name__} has no column {name!r}")
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.point(**{field: _scalar(column[index]) for field, column in self.columns.items()})
+        return type(self)({field: column[index] for field, column in self.columns.items()})
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and len(self) == len(other) and all(
+            np.array_equal(self.columns[f], other.columns[f]) for f in self.columns
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} points)"
+
+    @classmethod
+    def _dtype(cls, field: str):
+        return float if cls.point.model_fields[field].annotation is float else object
+
+    @staticmethod
+    def _convert(values: np.ndarray, dtype) -> np.ndarray:
+        if dtype is float:
+            return values.astype(float, copy = False)
+        return np.array([str(v) for v in values], dtype = object)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+        from_points = core_schema.no_info_after_validator_function(
+            cls.from_points, handler.generate_schema(list[cls.point])
+        )
+        return core_schema.json_or_python_schema(
+            json_schema = from_points,
+            python_schema = core_schema.union_schema([core_schema.is_instance_schema(cls), from_points]),
+            serialization = core_schema.plain_serializer_function_ser_schema(lambda track: track.to_list())
+        )
+
+def _scalar(value):
+    """Unwraps a NumPy scalar into the Python value a model field expects"""
+    return value.item() if isinstance(value, np.generic) else value
+
+class ObservationTrack(Track):
+    point = Observation
+
+class PredictionTrack(Track):
+    point = Prediction
+
 class GapEvent(BaseModel):
     id: str
     location: str
@@ -108,6 +234,59 @@ class CourseDeviationEvent(BaseModel):
     vessel: "Vessel"
     explanation: str = Field(..., description = "Explanation of why this event is believed to have occurred")
 
+# Pre-computed candidates
+class Candidates(BaseModel):
+    loitering: list["LoiteringCandidate"] = Field(..., description = "Low-speed dwell windows. Empty list if none.")
+    encounters: list["EncounterCandidate"] = Field(..., description = "Close approaches between cluster members. Empty list if none.")
+    deviations: list["DeviationCandidate"] = Field(..., description = "Divergence from predicted or reference tracks. Empty list if none.")
+
+    def is_empty(self) -> bool:
+        return not (self.loitering or self.encounters or self.deviations)
+
+class LoiteringCandidate(BaseModel):
+    vessel_id: str
+    start_time: str
+    end_time: str
+    duration_min: float
+    min_speed_knots: float
+    avg_speed_knots: float
+    lat: float = Field(..., description = "Mean latitude during the window")
+    lon: float = Field(..., description = "Mean longitude during the window")
+
+class EncounterCandidate(BaseModel):
+    vessel_A: str
+    vessel_B: str
+    start_time: str
+    end_time: str
+    duration_min: float
+    min_separation_km: float
+    time_of_min_separation: str
+
+class DeviationCandidate(BaseModel):
+    vessel_id: str
+    reference: str = Field(..., description = "Prediction, or the id of the reference MovementPattern")
+    start_time: str
+    end_time: str
+    max_deviation_km: float
+
+# Streaming notifications
+class ProximityAlert(BaseModel):
+    kind: str = "proximity"
+    mmsi_A: str
+    mmsi_B: str
+    time: str = Field(..., description = "Time of the observation that brought the vessels together")
+    distance_km: float
+    time_offset_s: float = Field(..., description = "Time between the two vessels' observations")
+
+class GapAlert(BaseModel):
+    kind: str = "gap"
+    mmsi: str
+    start_time: str
+    end_time: str
+    duration_hours: float
+    distance_km: float
+    implied_speed_knots: float
+
 # Benchmarking
 class AtomicFacts(BaseModel):
     facts: list[str] = Field(..., description = "List of atomic facts in a piece of text")
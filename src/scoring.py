@@ -0,0 +1,273 @@
+import ast
+import json
+import math
+import re
+from pandas import DataFrame, Timestamp
+from pydantic import BaseModel
+from helper import fact_check, precision
+
+# Unit spelling -> (dimension, factor to the dimension's base unit: km, knots, hours, degrees)
+UNITS = {
+    "km": ("distance", 1.0), "kilometers": ("distance", 1.0), "kilometres": ("distance", 1.0),
+    "m": ("distance", 0.001), "meters": ("distance", 0.001), "metres": ("distance", 0.001),
+    "nm": ("distance", 1.852), "nmi": ("distance", 1.852), "nautical miles": ("distance", 1.852), "nautical mile": ("distance", 1.852),
+    "knots": ("speed", 1.0), "knot": ("speed", 1.0), "kn": ("speed", 1.0), "kt": ("speed", 1.0), "kts": ("speed", 1.0),
+    "km/h": ("speed", 1 / 1.852),
+    "hours": ("duration", 1.0), "hour": ("duration", 1.0), "hrs": ("duration", 1.0), "hr": ("duration", 1.0), "h": ("duration", 1.0),
+    "minutes": ("duration", 1 / 60), "minute": ("duration", 1 / 60), "mins": ("duration", 1 / 60), "min": ("duration", 1 / 60),
+    "seconds": ("duration", 1 / 3600), "s": ("duration", 1 / 3600),
+    "degrees": ("angle", 1.0), "degree": ("angle", 1.0), "deg": ("angle", 1.0), "°": ("angle", 1.0)
+}
+
+# Field name suffix -> (dimension, factor to the dimension's base unit) of source values
+FIELD_UNITS = {
+    "_km": ("distance", 1.0), "_nm": ("distance", 1.852), "_knots": ("speed", 1.0), "_hours": ("duration", 1.0),
+    "_min": ("duration", 1 / 60), "_s": ("duration", 1 / 3600), "_degrees": ("angle", 1.0),
+    "lat": ("coordinate", 1.0), "lon": ("coordinate", 1.0), "speed": ("speed", 1.0), "sog": ("speed", 1.0),
+    "course": ("angle", 1.0), "cog": ("angle", 1.0)
+}
+
+# Relative tolerance of numeric matches, on top of the precision the number is stated with
+RELATIVE_TOLERANCE = 0.02
+
+# Largest difference (minutes) between a stated time and a source timestamp
+TIME_TOLERANCE_MIN = 5.0
+
+DATETIME = re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2}|\s?UTC)?")
+TIME_OF_DAY = re.compile(r"\b(\d{1,2}):(\d{2})(?::\d{2})?\s?(?:Z|UTC)?(?![\d:])")
+COORDINATE = re.compile(r"(-?\d+(?:\.\d+)?)\s?°?\s?([NSEW])\b")
+QUANTITY = re.compile(
+    r"(?<![\w.])(-?\d+(?:,\d{3})*(?:\.\d+)?)\s?("
+    + "|".join(sorted((re.escape(unit) for unit in UNITS), key = len, reverse = True))
+    + r")?(?![\w/])"
+)
+IDENTIFIER = re.compile(r"\b[A-Za-z]+(?:_[A-Za-z0-9]+)+\b|\b\d{9}\b")
+
+class Claim(BaseModel):
+    """A checkable statement found in an explanation: its text, kind and parsed value"""
+    text: str
+    kind: str
+    value: str | float
+    dimension: str | None = None
+    tolerance: float = 0.0
+
+class SourceIndex:
+    """
+    Every value of a source document (a Cluster, dict / list, or its JSON or Python-literal text),
+    indexed for matching claims: numbers by dimension in base units, timestamps, and strings
+    """
+
+    def __init__(self, source):
+        self.numbers: list[tuple[str, float, str | None]] = []
+        self.times: list[tuple[str, Timestamp]] = []
+        self.strings: dict[str, tuple[str, str]] = {}
+        self._walk(_load(source), "")
+
+    def _walk(self, value, path: str):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                self._walk(item, f"{path}.{key}" if path else str(key))
+        elif isinstance(value, list):
+            self.numbers.append((f"len({path})", float(len(value)), "count"))
+            for i, item in enumerate(value):
+                self._walk(item, f"{path}[{i}]")
+        elif isinstance(value, bool) or value is None:
+            return
+        elif isinstance(value, (int, float)):
+            dimension, factor = _field_unit(path)
+            self.numbers.append((path, float(value) * factor, dimension))
+        else:
+            text = str(value)
+            time = _parse_time(text) if DATETIME.fullmatch(text.strip()) else None
+            if time is not None:
+                self.times.append((path, time))
+                return
+            number = _number(text)
+            if number is not None:
+                dimension, factor = _field_unit(path)
+                self.numbers.append((path, number * factor, dimension))
+            self.strings.setdefault(_normalize(text), (path, text))
+
+    def support(self, claim: Claim) -> list[str]:
+        """Returns the source facts ("path = value") that support a claim"""
+        if claim.kind == "invalid":
+            return []
+        if claim.kind == "time":
+            stated = Timestamp(claim.value)
+            return [f"{path} = {time}" for path, time in self.times if abs((time - stated).total_seconds()) <= claim.tolerance]
+        if claim.kind == "time_of_day":
+            minutes = float(claim.value)
+            return [
+                f"{path} = {time}" for path, time in self.times
+                if abs((time.hour * 60 + time.minute - minutes + 720) % 1440 - 720) <= claim.tolerance
+            ]
+        if claim.kind == "date":
+            return [f"{path} = {time}" for path, time in self.times if time.strftime("%Y-%m-%d") == claim.value]
+        if claim.kind in ("entity", "identifier"):
+            match = self.strings.get(_normalize(claim.value))
+            return [f"{match[0]} = {match[1]}"] if match is not None else []
+
+        value = float(claim.value)
+        return [
+            f"{path} = {number:g}" for path, number, dimension in self.numbers
+            if _compatible(claim.dimension, dimension) and abs(number - value) <= claim.tolerance
+        ]
+
+def extract_claims(text: str, index: SourceIndex = None) -> list[Claim]:
+    """
+    Pulls checkable claims out of an explanation: timestamps, dates and times of day, coordinates,
+    numbers (with their units, if stated), ids and MMSIs, and - if a source index is given - every
+    source string value (vessel names, flags, zones, types) mentioned in the text
+    """
+    found = []
+    taken = [False] * len(text)
+
+    def take(match: re.Match) -> bool:
+        """Claims a span of text, unless an earlier (more specific) claim overlaps it"""
+        start, end = match.span()
+        if any(taken[start:end]):
+            return False
+        taken[start:end] = [True] * (end - start)
+        return True
+
+    def add(match: re.Match, **claim):
+        found.append((match.start(), Claim(text = match.group(0).strip(), **claim)))
+
+    for match in DATETIME.finditer(text):
+        raw = match.group(0).strip()
+        if not take(match):
+            continue
+        time = _parse_time(raw)
+        if time is None:
+            # An impossible date (e.g. 2025-02-30) is a claim nothing can support
+            add(match, kind = "invalid", value = raw)
+        elif len(raw) == 10:
+            add(match, kind = "date", value = raw)
+        else:
+            add(match, kind = "time", value = time.isoformat(), tolerance = TIME_TOLERANCE_MIN * 60)
+
+    for match in TIME_OF_DAY.finditer(text):
+        if int(match.group(1)) < 24 and take(match):
+            minutes = int(match.group(1)) * 60 + int(match.group(2))
+            add(match, kind = "time_of_day", value = float(minutes), tolerance = TIME_TOLERANCE_MIN)
+
+    if index is not None:
+        # Longest source strings first, so "SEAFARER I" is claimed before "I" could be
+        for value in sorted(index.strings, key = len, reverse = True):
+            if len(value) < 2 or _number(value) is not None:
+                continue
+            pattern = r"(?<!\w)" + r"[\s_]+".join(re.escape(part) for part in value.split()) + r"(?!\w)"
+            for match in re.finditer(pattern, text, flags = re.IGNORECASE):
+                if take(match):
+                    add(match, kind = "entity", value = value)
+
+    for match in IDENTIFIER.finditer(text):
+        if take(match):
+            add(match, kind = "identifier", value = match.group(0))
+
+    for match in COORDINATE.finditer(text):
+        if take(match):
+            value = float(match.group(1)) * (-1 if match.group(2) in "SW" else 1)
+            add(match, kind = "number", value = value, dimension = "coordinate", tolerance = _tolerance(match.group(1)))
+
+    for match in QUANTITY.finditer(text):
+        raw, unit = match.group(1).replace(",", ""), match.group(2)
+        if not take(match):
+            continue
+        dimension, factor = UNITS[unit.lower()] if unit else (None, 1.0)
+        add(match, kind = "number", value = float(raw) * factor, dimension = dimension, tolerance = _tolerance(raw) * factor)
+
+    return [claim for _, claim in sorted(found, key = lambda item: item[0])]
+
+def fact_check_local(text: str, source) -> tuple[list[str], list[list[str]]]:
+    """
+    Offline, deterministic stand-in for helper.fact_check against a source document: returns the
+    claims found in text and, for each, the source facts that support it (empty if none), so
+    helper.precision(*fact_check_local(text, source)) gives the same metric as the LLM path
+    """
+    index = SourceIndex(source)
+    claims = extract_claims(text, index)
+    return [claim.text for claim in claims], [index.support(claim) for claim in claims]
+
+def score(text: str, source) -> dict:
+    """Local precision of an explanation against its source, with the supported and unsupported claims"""
+    keys, references = fact_check_local(text, source)
+    return {
+        "precision": precision(keys, references) if keys else 1.0,
+        "claims": len(keys),
+        "supported": [key for key, refs in zip(keys, references) if refs],
+        "unsupported": [key for key, refs in zip(keys, references) if not refs]
+    }
+
+def calibrate(texts: list[str], sources: list, client, cache = None) -> DataFrame:
+    """
+    Scores a sample of explanations both locally and with the LLM fact check, for spot-checking how
+    closely the local scorer tracks it
+    """
+    rows = []
+    for text, source in zip(texts, sources):
+        keys, references = fact_check(text, _dump(source), client, cache)
+        rows.append({
+            "local": score(text, source)["precision"],
+            "llm": precision(keys, references) if keys else 1.0
+        })
+
+    df = DataFrame(rows, columns = ["local", "llm"])
+    df["difference"] = df["local"] - df["llm"]
+    return df
+
+def _load(source):
+    """Parses a source document into plain dicts and lists"""
+    if isinstance(source, BaseModel):
+        return source.model_dump(mode = "json")
+    if isinstance(source, str):
+        try:
+            return json.loads(source)
+        except ValueError:
+            return ast.literal_eval(source)
+    return source
+
+def _dump(source) -> str:
+    if isinstance(source, str):
+        return source
+    return json.dumps(_load(source), default = str)
+
+def _field_unit(path: str) -> tuple[str | None, float]:
+    """Dimension and base-unit factor of a source value, from its field name"""
+    field = re.sub(r"\[\d+\]$", "", path).rsplit(".", 1)[-1].lower()
+    for suffix, unit in FIELD_UNITS.items():
+        if field.endswith(suffix):
+            return unit
+    return None, 1.0
+
+def _compatible(claimed: str | None, source: str | None) -> bool:
+    """Whether a claimed number's dimension can match a source value's"""
+    if claimed is None:
+        return True
+    if claimed == "angle":
+        return source in ("angle", "coordinate")
+    if claimed == "coordinate":
+        return source == "coordinate"
+    return claimed == source or source is None
+
+def _tolerance(raw: str) -> float:
+    """Half a unit in the last stated digit, or RELATIVE_TOLERANCE of the value if larger"""
+    decimals = len(raw.split(".")[1]) if "." in raw else 0
+    return max(0.5 * 10 ** -decimals, RELATIVE_TOLERANCE * abs(float(raw)))
+
+def _parse_time(text: str) -> Timestamp | None:
+    try:
+        time = Timestamp(text.replace("UTC", "").strip())
+    except ValueError:
+        return None
+    return time.tz_localize("UTC") if time.tzinfo is None else time.tz_convert("UTC")
+
+def _number(text: str) -> float | None:
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).replace("_", " ").split()).lower()
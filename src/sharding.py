@@ -0,0 +1,198 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+from pandas import Timedelta, Timestamp
+from fleet import _graph_order
+from geodesic import EARTH_RADIUS_KM
+from helper import construct_vessels
+from KnowledgeGraph import KnowledgeGraph
+from schema import Cluster
+
+# Default shard size: tile edge (degrees) and time slice (hours)
+TILE_DEGREES = 10.0
+SLICE_HOURS = 24.0
+
+# Knowledge graph of the current worker process, created once by _init_worker
+_kg: KnowledgeGraph = None
+
+def partition(kg: KnowledgeGraph, tile_degrees: float = TILE_DEGREES, slice_hours: float = SLICE_HOURS, start = None, end = None, bbox: tuple = None) -> list[tuple]:
+    """
+    Splits the AIS observations in scope into shards of one tile_degrees lat / lon tile and one
+    slice_hours time slice, keeping only tiles and slices that hold observations.
+    Returns each shard's core as (start, end, bbox); see halo() for the region a shard actually scans.
+    """
+    tiles = kg.occupied_tiles(tile_degrees, start, end, bbox)
+    step = slice_hours * 3600
+    shards = []
+
+    for tile_lat, tile_lon, first, last in tiles[["tile_lat", "tile_lon", "first", "last"]].itertuples(index = False):
+        core = (tile_lon * tile_degrees, tile_lat * tile_degrees, (tile_lon + 1) * tile_degrees, (tile_lat + 1) * tile_degrees)
+        for k in range(math.floor(first.timestamp() / step), math.floor(last.timestamp() / step) + 1):
+            shards.append((Timestamp(k * step, unit = "s", tz = "UTC"), Timestamp((k + 1) * step, unit = "s", tz = "UTC"), core))
+    return shards
+
+def halo(shard: tuple, time_thresh: float, dist_thresh: float) -> tuple:
+    """
+    Widens a shard core by time_thresh seconds and dist_thresh km on every side, so every pair of
+    observations within both thresholds that has one side in the core lies entirely inside the result.
+    The widened box wraps across the antimeridian (min_lon > max_lon) where needed.
+    """
+    start, end, (min_lon, min_lat, max_lon, max_lat) = shard
+    angle = dist_thresh / EARTH_RADIUS_KM
+
+    min_lat = max(min_lat - math.degrees(angle), -90.0)
+    max_lat = min(max_lat + math.degrees(angle), 90.0)
+
+    # Widest longitude difference of two points within dist_thresh at the box's highest latitude
+    ratio = math.sin(angle / 2) / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    margin = 2 * math.degrees(math.asin(ratio)) if ratio < 1 else 180.0
+    if max_lon - min_lon + 2 * margin >= 360:
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        min_lon, max_lon = _wrap(min_lon - margin), _wrap(max_lon + margin)
+
+    delta = Timedelta(seconds = time_thresh)
+    return Timestamp(start) - delta, Timestamp(end) + delta, (min_lon, min_lat, max_lon, max_lat)
+
+def sharded_nearby_graph(
+    kg_factory,
+    vessel_ids: list[str] = None,
+    time_thresh: int = 600,
+    dist_thresh: int = 30,
+    tile_degrees: float = TILE_DEGREES,
+    slice_hours: float = SLICE_HOURS,
+    workers: int = None,
+    start = None,
+    end = None,
+    bbox: tuple = None
+) -> dict[str, list[str]]:
+    """
+    Same result as KnowledgeGraph.nearby_graph, computed shard by shard in a pool of worker processes.
+    kg_factory is a picklable callable returning a KnowledgeGraph (e.g. functools.partial(KnowledgeGraph.from_files, path));
+    each worker calls it once. Shards overlap by a halo, and neighbors found in several shards are merged.
+    """
+    kg = kg_factory()
+    if vessel_ids is None:
+        vessel_ids = kg.extract_vessels()
+    shards = partition(kg, tile_degrees, slice_hours, start, end, bbox)
+
+    with _pool(kg_factory, workers) as pool:
+        return _nearby(pool, shards, vessel_ids, time_thresh, dist_thresh, start, end, bbox)
+
+def build_clusters_sharded(
+    kg_factory,
+    vessel_ids: list[str] = None,
+    time_thresh: int = 600,
+    dist_thresh: int = 30,
+    tile_degrees: float = TILE_DEGREES,
+    slice_hours: float = SLICE_HOURS,
+    chunk_size: int = 100,
+    workers: int = None,
+    start = None,
+    end = None,
+    bbox: tuple = None
+) -> Iterator[Cluster]:
+    """
+    Same clusters as fleet.build_clusters, built in a pool of worker processes: the neighbor graph
+    shard by shard (see sharded_nearby_graph), then clusters in chunks of chunk_size vessels taken in
+    neighbor-graph order, each chunk hydrated by one worker. Every vessel's cluster is yielded exactly
+    once, in the same order as build_clusters.
+    """
+    kg = kg_factory()
+    if vessel_ids is None:
+        vessel_ids = kg.extract_vessels()
+    shards = partition(kg, tile_degrees, slice_hours, start, end, bbox)
+
+    with _pool(kg_factory, workers) as pool:
+        graph = _nearby(pool, shards, vessel_ids, time_thresh, dist_thresh, start, end, bbox)
+        order = _graph_order(vessel_ids, graph)
+
+        chunks = [
+            {vessel_id: graph[vessel_id] for vessel_id in order[offset:offset + chunk_size]}
+            for offset in range(0, len(order), chunk_size)
+        ]
+        for clusters in pool.map(_clusters, chunks, [(start, end, bbox)] * len(chunks)):
+            yield from clusters
+
+def _nearby(pool: ProcessPoolExecutor, shards: list[tuple], vessel_ids: list[str], time_thresh: int, dist_thresh: int, start, end, bbox: tuple) -> dict[str, list[str]]:
+    """Runs every shard's nearby_graph in the pool and merges the results"""
+    scopes = [halo(shard, time_thresh, dist_thresh) for shard in shards]
+    merged = {vessel_id: {} for vessel_id in vessel_ids}
+
+    jobs = [(vessel_ids, time_thresh, dist_thresh, *_clip(scope, start, end, bbox)) for scope in scopes]
+    for graph in pool.map(_shard_nearby, jobs):
+        for vessel_id, neighbors in graph.items():
+            merged[vessel_id].update(dict.fromkeys(neighbors))
+
+    return {vessel_id: list(neighbors) for vessel_id, neighbors in merged.items()}
+
+def _shard_nearby(job: tuple) -> dict[str, list[str]]:
+    vessel_ids, time_thresh, dist_thresh, start, end, bbox = job
+    return _kg.nearby_graph(vessel_ids, time_thresh, dist_thresh, start, end, bbox)
+
+def _clusters(graph: dict[str, list[str]], scope: tuple) -> list[Cluster]:
+    """Builds the clusters of one chunk of vessels, hydrating each member once"""
+    start, end, bbox = scope
+    members = list(dict.fromkeys(m for vessel_id, neighbors in graph.items() for m in (vessel_id, *neighbors)))
+    vessels = construct_vessels(_kg.find_related_events_batch(members, start, end, bbox), _kg, start, end, bbox)
+
+    return [
+        Cluster(vessel = vessels[vessel_id], nearby_vessels = [vessels[neighbor] for neighbor in neighbors])
+        for vessel_id, neighbors in graph.items()
+    ]
+
+def _pool(kg_factory, workers: int = None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers = workers or os.cpu_count(), initializer = _init_worker, initargs = (kg_factory,))
+
+def _init_worker(kg_factory):
+    global _kg
+    _kg = kg_factory()
+
+def _clip(scope: tuple, start = None, end = None, bbox: tuple = None) -> tuple:
+    """
+    Limits a shard's widened scope to the caller's start / end and bbox. Where the two longitude
+    ranges intersect in two separate pieces, the caller's range is kept whole: any region between
+    the shard's and the caller's gives the same pairs, since the results of all shards are merged
+    """
+    shard_start, shard_end, box = scope
+    if start is not None:
+        shard_start = max(shard_start, _utc(start))
+    if end is not None:
+        shard_end = min(shard_end, _utc(end))
+    if bbox is None:
+        return shard_start, shard_end, box
+
+    min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox)
+    pieces = [
+        (max(a[0], b[0]), min(a[1], b[1]))
+        for a in _spans(box[0], box[2])
+        for b in _spans(min_lon, max_lon)
+        if max(a[0], b[0]) <= min(a[1], b[1])
+    ]
+    # Pieces meeting at the antimeridian are one wrapping range
+    east = [piece for piece in pieces if piece[1] == 180.0]
+    west = [piece for piece in pieces if piece[0] == -180.0]
+    if len(pieces) == 2 and east and west and east[0] != west[0]:
+        pieces = [(east[0][0], west[0][1])]
+    if len(pieces) == 1:
+        min_lon, max_lon = pieces[0]
+
+    return shard_start, shard_end, (min_lon, max(box[1], min_lat), max_lon, min(box[3], max_lat))
+
+def _spans(min_lon: float, max_lon: float) -> list[tuple]:
+    """A longitude range as non-wrapping spans"""
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+def _utc(value) -> Timestamp:
+    value = Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+def _wrap(lon: float) -> float:
+    if lon < -180:
+        return lon + 360
+    if lon > 180:
+        return lon - 360
+    return lon
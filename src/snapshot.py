@@ -0,0 +1,597 @@
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pandas import DataFrame, Timestamp, concat
+from pyarrow.fs import LocalFileSystem
+from KnowledgeGraph import KnowledgeGraph
+from metrics import traced
+
+SNAPSHOT_VERSION = 1
+
+# Rows per Parquet row group: observation files are sorted by vessel, so row group statistics let
+# vessel filters skip most of a day
+ROW_GROUP_SIZE = 64 * 1024
+
+# Rows decoded and written per batch while exporting observations
+BATCH_SIZE = 200_000
+
+TIME = pa.timestamp("us", tz = "UTC")
+
+# Column -> predicate of every event property, across all event kinds (participants are in memberships)
+EVENT_COLUMNS = {
+    col: predicate
+    for properties in KnowledgeGraph.EVENT_PROPERTIES.values()
+    for col, predicate in properties.items()
+    if col != "participant"
+}
+
+# Schema of every table; observations and predictions are also partitioned by day
+SCHEMAS = {
+    "vessels": pa.schema([("vessel", pa.string()), ("mmsi", pa.string()), ("name", pa.string()), ("flag", pa.string()), ("type", pa.string())]),
+    "trajectories": pa.schema([
+        ("trajectory", pa.string()), ("vessel", pa.string()), ("traj_start", TIME), ("traj_end", TIME),
+        ("last_lat", pa.float64()), ("last_lon", pa.float64())
+    ]),
+    "observations": pa.schema([
+        ("observation", pa.string()), ("trajectory", pa.string()), ("vessel", pa.string()), ("mmsi", pa.string()),
+        ("time", TIME), ("lat", pa.float64()), ("lon", pa.float64()), ("speed", pa.float64()), ("course", pa.float64()),
+        ("port_dist", pa.float64()), ("shore_dist", pa.float64())
+    ]),
+    "predictions": pa.schema([
+        ("observation", pa.string()), ("trajectory", pa.string()), ("vessel", pa.string()), ("mmsi", pa.string()),
+        ("time", TIME), ("lat", pa.float64()), ("lon", pa.float64()), ("speed", pa.float64()), ("course", pa.float64())
+    ]),
+    "events": pa.schema(
+        [("event", pa.string()), ("wkt", pa.string())]
+        + [
+            (col, TIME if col in ("start", "end") else pa.bool_() if col == "gap_intentional" else pa.float64() if col in (
+                "gap_distance", "gap_duration", "gap_speed", "port_dist", "shore_dist", "score"
+            ) else pa.string())
+            for col in EVENT_COLUMNS
+        ]
+    ),
+    "memberships": pa.schema([("event", pa.string()), ("membership", pa.string()), ("vessel", pa.string())]),
+    "zones": pa.schema([("zone", pa.string()), ("code", pa.string()), ("wkt", pa.string())]),
+    "patterns": pa.schema([("pattern", pa.string()), ("wkt", pa.string())])
+}
+
+# Event columns stored as booleans, which pandas reads back as objects since other event kinds leave them null
+BOOLEAN_COLUMNS = [field.name for field in SCHEMAS["events"] if pa.types.is_boolean(field.type)]
+
+# Table -> (class, id column, column -> literal property, column -> link) of the triples a snapshot
+# serves neighborhoods from (observations and predictions are read per call, see _observation_triples)
+TRIPLES = {
+    "vessels": ("VesselIdentity", "vessel", {"mmsi": "mmsi", "name": "vesselName", "flag": "flag"}, {"type": "vesselType"}),
+    "trajectories": ("TrajectorySequence", "trajectory", {}, {"vessel": "forVessel"}),
+    "events": ("Event", "event", {col: predicate for col, predicate in EVENT_COLUMNS.items() if col != "location"}, {"location": "location"}),
+    "memberships": (None, "membership", {}, {"vessel": "memberVessel"}),
+    "zones": ("Zone", "zone", {"code": "zoneCode"}, {}),
+    "patterns": ("MovementPattern", "pattern", {}, {})
+}
+
+# Tables partitioned by day of their time column. Days are not split further by vessel: one file per
+# vessel and day would be mostly tiny files, so each day's files are sorted by vessel instead and
+# vessel filters skip row groups by their statistics
+PARTITIONED = {"observations": "ais", "predictions": "prediction"}
+
+NO_ENDPOINT = "A snapshot has no SPARQL endpoint: query the live store, or use the KnowledgeGraph methods it serves"
+
+DAY = pa.schema([("day", pa.string())])
+
+def export(kg: KnowledgeGraph, path: str, start = None, end = None, bbox: tuple = None) -> dict[str, int]:
+    """
+    Writes everything KnowledgeGraph reads into a directory of typed Parquet tables that
+    SnapshotKnowledgeGraph serves without a store: vessels, trajectory windows, AIS observations and
+    predictions (partitioned by day, sorted by vessel), events, gap event memberships, zones and movement patterns.
+    With start / end and bbox only observations and predictions in scope are kept, so queries scoped
+    within it give the same results as the live graph. Replaces any snapshot at path; returns row counts
+    """
+    if os.path.exists(os.path.join(path, "manifest.json")):
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok = True)
+
+    counts = {}
+    for name, query in _export_queries(kg).items():
+        counts[name] = _write_table(_table(kg._select(query), name), os.path.join(path, f"{name}.parquet"))
+
+    for name, kind in PARTITIONED.items():
+        counts[name] = 0
+        for i, df in enumerate(kg.iter_select(_observations_query(kg, kind, start, end, bbox), BATCH_SIZE)):
+            counts[name] += _write_partitioned(df, name, os.path.join(path, name), i)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created": Timestamp.now(tz = "UTC").isoformat(),
+        "scope": {
+            "start": kg._timestamp(start).isoformat() if start is not None else None,
+            "end": kg._timestamp(end).isoformat() if end is not None else None,
+            "bbox": list(bbox) if bbox is not None else None
+        },
+        "rows": counts
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding = "utf-8") as file:
+        json.dump(manifest, file, indent = 2)
+    return counts
+
+class SnapshotKnowledgeGraph(KnowledgeGraph):
+    """
+    Read-only KnowledgeGraph served from a snapshot directory written by export(). Small tables are
+    memory-mapped and loaded once; observations and predictions are scanned per call as memory-mapped
+    datasets, with scope (day partitions, time, bbox) and vessel filters pushed down into the scan.
+    Methods return the same frames as against the store the snapshot was taken from, except neighborhood,
+    which only walks the properties and links the snapshot keeps. There is no SPARQL endpoint behind it.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "manifest.json"), encoding = "utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.manifest['version']} (expected {SNAPSHOT_VERSION})")
+
+        # No store behind a snapshot: every method reading one is overridden below
+        self.backend = None
+        self.cache = None
+        self._zone_index = None
+        self._event_index = None
+        self._triples = None
+        self.path = path
+        self.filesystem = LocalFileSystem(use_mmap = True)
+
+        self.tables = {
+            name: pq.read_table(os.path.join(path, f"{name}.parquet"), memory_map = True).to_pandas()
+            for name in SCHEMAS if name not in PARTITIONED
+        }
+        self.datasets = {
+            name: ds.dataset(
+                os.path.join(path, name),
+                schema = SCHEMAS[name].append(DAY.field("day")),
+                format = "parquet",
+                partitioning = ds.partitioning(DAY, flavor = "hive"),
+                filesystem = self.filesystem
+            )
+            for name in PARTITIONED
+        }
+
+    @traced
+    def extract_vessels(self) -> list[str]:
+        """Extract all vessel ids"""
+        return list(dict.fromkeys(self.tables["vessels"]["vessel"]))
+
+    @traced
+    def vessel_info(self, vessel_id: str) -> DataFrame:
+        """Extract vessel data"""
+        return self.vessels_info([vessel_id])[["name", "flag", "type"]]
+
+    @traced
+    def vessels_info(self, vessel_ids: list[str]) -> DataFrame:
+        """Extract vessel data for many vessels"""
+        if not vessel_ids:
+            return DataFrame()
+        df = self.tables["vessels"]
+        df = df[df["vessel"].isin(vessel_ids)][["vessel", "name", "flag", "type"]].dropna().drop_duplicates()
+        return df.reset_index(drop = True)
+
+    @traced
+    def extract_trajectory_sequences(self, vessel_id: str) -> list[str]:
+        """Extract trajectory sequences ids for each vessel"""
+        df = self.tables["trajectories"]
+        return list(df.loc[df["vessel"] == vessel_id, "trajectory"])
+
+    @traced
+    def extract_observations(self, traj_seq_id: str, start = None, end = None, bbox: tuple = None) -> list[str]:
+        """Extract observations (and predictions) from trajectory sequence, optionally only those in scope"""
+        observations = [
+            self._scan(name, ["observation"], pc.field("trajectory") == traj_seq_id, start, end, bbox)["observation"]
+            for name in PARTITIONED
+        ]
+        return sorted(concat(observations, ignore_index = True))
+
+    @traced
+    def observation_info(self, observation_id: str) -> DataFrame:
+        """Extract observation data"""
+        kind = "ais" if observation_id[:3] == "ais" else "prediction"
+        columns = list(self.OBSERVATION_PROPERTIES[kind])
+        df = self._scan(_table_name(kind), ["observation", *columns], pc.field("observation") == observation_id)
+        return df.drop_duplicates("observation")[columns].dropna().reset_index(drop = True)
+
+    @traced
+    def trajectory_windows(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Start time, end time and last position of every trajectory sequence of many vessels,
+        optionally only trajectories overlapping start / end whose last position is inside bbox
+        """
+        if not vessel_ids:
+            return DataFrame()
+        df = self.tables["trajectories"].dropna()
+        mask = df["vessel"].isin(vessel_ids) & _bbox_mask(df, "last_lat", "last_lon", bbox)
+        if start is not None:
+            mask &= df["traj_end"] >= self._timestamp(start)
+        if end is not None:
+            mask &= df["traj_start"] <= self._timestamp(end)
+        return df[mask][["vessel", "trajectory", "traj_start", "traj_end", "last_lat", "last_lon"]].reset_index(drop = True)
+
+    @traced
+    def movement_patterns(self) -> DataFrame:
+        """Returns the id and WKT geometry of every reference MovementPattern"""
+        return self.tables["patterns"].sort_values("pattern").reset_index(drop = True)
+
+    @traced
+    def occupied_tiles(self, tile_degrees: float, start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """Returns the tile_degrees lat / lon tiles holding AIS observations, as KnowledgeGraph.occupied_tiles"""
+        df = self._scan("observations", ["observation", "time", "lat", "lon"], None, start, end, bbox).drop_duplicates("observation")
+        df = df.dropna(subset = ["time", "lat", "lon"])
+        if df.empty:
+            return DataFrame(columns = ["tile_lat", "tile_lon", "first", "last", "count"])
+
+        df = df.assign(tile_lat = np.floor(df["lat"] / float(tile_degrees)), tile_lon = np.floor(df["lon"] / float(tile_degrees)))
+        tiles = df.groupby(["tile_lat", "tile_lon"])["time"].agg(first = "min", last = "max", count = "count")
+        return tiles.reset_index().sort_values(["tile_lat", "tile_lon"]).reset_index(drop = True)
+
+    @traced
+    def vessels_observations(self, vessel_ids: list[str], kind: str = "ais", start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Extract every observation (kind="ais") or prediction (kind="prediction") used by the trajectory
+        sequences of many vessels, ordered by vessel, trajectory and observation, optionally only those in scope
+        """
+        if not vessel_ids:
+            return DataFrame()
+        known = set(self.tables["vessels"]["vessel"])
+        vessel_ids = [vessel_id for vessel_id in dict.fromkeys(vessel_ids) if vessel_id in known]
+        columns = ["vessel", "trajectory", "observation", *self.OBSERVATION_PROPERTIES[kind]]
+
+        df = self._scan(_table_name(kind), columns, pc.field("vessel").isin(vessel_ids), start, end, bbox).dropna()
+        return df.sort_values(["vessel", "trajectory", "observation"]).reset_index(drop = True)
+
+    @traced
+    def event_info(self, event_id: str) -> DataFrame:
+        """Extract information about an event"""
+        kind = self.event_kind(event_id)
+        return self._event_details(kind, [event_id])[list(self.EVENT_PROPERTIES[kind])]
+
+    @traced
+    def events_info(self, event_ids: list[str]) -> dict[str, DataFrame]:
+        """Extract information about many events, by event kind"""
+        by_kind = {}
+        for event_id in dict.fromkeys(event_ids):
+            by_kind.setdefault(self.event_kind(event_id), []).append(event_id)
+        return {kind: self._event_details(kind, ids) for kind, ids in by_kind.items()}
+
+    @traced
+    def neighborhood(self, seeds: list[str], hops: int = 2, start = None, end = None, limit: int = None) -> DataFrame:
+        """
+        Returns the triples within hops links of the seed nodes, as KnowledgeGraph.neighborhood, from the
+        properties and links the snapshot keeps (see TRIPLES): geometries, provenance sources, groups and
+        properties the export does not copy are left out. limit caps the triples returned, deepest hops first
+        """
+        triples = self._snapshot_triples()
+        links = triples[~triples["literal"] & (triples["predicate"] != "type")]
+        forward = links[links["predicate"].isin(self.NEIGHBOR_FORWARD)]
+        backward = links[links["predicate"].isin(self.NEIGHBOR_BACKWARD)]
+        outside = set(self._events_outside(start, end))
+        trajectories = set(self.tables["trajectories"]["trajectory"])
+
+        labels = triples[triples["literal"] & triples["predicate"].isin(self.SEED_LABELS) & triples["object"].isin(seeds)]
+        frontier = set(seeds) | set(labels["subject"])
+        reached = set(frontier)
+        parts = [triples[triples["subject"].isin(frontier) & (triples["literal"] | (triples["predicate"] == "type"))]]
+
+        # Each hop walks links from the nodes first reached by the previous one: links from earlier nodes were walked already
+        for _ in range(hops):
+            observations, properties = self._observation_triples([node for node in frontier if node in trajectories], start, end)
+            steps = concat([
+                forward[forward["subject"].isin(frontier)].assign(node = lambda df: df["object"]),
+                backward[backward["object"].isin(frontier)].assign(node = lambda df: df["subject"]),
+                observations.assign(node = lambda df: df["object"])
+            ], ignore_index = True)
+            steps = steps[~steps["node"].isin(outside)]
+
+            frontier = set(steps["node"]) - reached
+            reached |= frontier
+            parts += [
+                steps.drop(columns = "node"),
+                triples[triples["subject"].isin(frontier) & (triples["literal"] | (triples["predicate"] == "type"))],
+                properties
+            ]
+
+        df = concat(parts, ignore_index = True).drop_duplicates()
+        df = df.astype({"subject": "str", "predicate": "str", "object": "str", "literal": bool})
+        if limit is not None:
+            df = df.head(int(limit))
+        return df.reset_index(drop = True)
+
+    def iter_select(self, query: str, batch_size: int = 50_000):
+        raise NotImplementedError(NO_ENDPOINT)
+
+    def _select(self, query: str) -> DataFrame:
+        raise NotImplementedError(NO_ENDPOINT)
+
+    def _construct(self, query: str) -> DataFrame:
+        raise NotImplementedError(NO_ENDPOINT)
+
+    def _match_gap_events(self, vessel_ids: list[str], start = None, end = None, bbox: tuple = None, windows: DataFrame = None) -> DataFrame:
+        """AIS gap events the vessel participates in (gap events have no coordinates, so bbox does not apply)"""
+        events = self.tables["events"]
+        events = events[events["type"] == "AISGapEvent"]
+        if start is not None:
+            events = events[events["end"] >= self._timestamp(start)]
+        if end is not None:
+            events = events[events["start"] <= self._timestamp(end)]
+
+        memberships = self.tables["memberships"]
+        memberships = memberships[memberships["vessel"].isin(vessel_ids)]
+        return memberships.merge(events[["event"]], on = "event")[["vessel", "event"]]
+
+    def _event_rows(self) -> DataFrame:
+        """Type, start / end time, location and berth WKT (if any) of every event"""
+        df = self.tables["events"][["event", "type", "start", "end", "location", "wkt"]]
+        return df.dropna(subset = ["type", "start", "end"]).reset_index(drop = True)
+
+    def _zone_rows(self) -> DataFrame:
+        """Id and WKT geometry of every zone"""
+        return self.tables["zones"][["zone", "wkt"]].drop_duplicates().reset_index(drop = True)
+
+    def _observation_points(self, start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """Vessel, MMSI, time and position of every AIS observation in scope, matched to vessels by MMSI"""
+        points = self._scan("observations", ["observation", "mmsi", "time", "lat", "lon"], pc.field("mmsi").is_valid(), start, end, bbox)
+        points = points.drop_duplicates("observation").dropna()
+        vessels = self.tables["vessels"][["vessel", "mmsi"]].dropna().drop_duplicates()
+        return vessels.merge(points, on = "mmsi")[["vessel", "mmsi", "time", "lat", "lon"]]
+
+    def _event_details(self, kind: str, event_ids: list[str]) -> DataFrame:
+        """Event id and the properties of one event kind, for the events having all of them"""
+        properties = self.EVENT_PROPERTIES[kind]
+        df = self.tables["events"]
+        df = df[df["event"].isin(event_ids)]
+
+        if "participant" in properties:
+            participants = self.tables["memberships"][["event", "membership"]].rename(columns = {"membership": "participant"})
+            df = df.merge(participants, on = "event")
+        df = df[["event", *properties]].dropna()
+        return df.astype({col: bool for col in BOOLEAN_COLUMNS if col in df.columns}).reset_index(drop = True)
+
+    def _events_outside(self, start = None, end = None) -> list[str]:
+        """Events ending before start or starting after end"""
+        events = self.tables["events"]
+        mask = np.zeros(len(events), dtype = bool)
+        if start is not None:
+            mask |= events["end"] < self._timestamp(start)
+        if end is not None:
+            mask |= events["start"] > self._timestamp(end)
+        return list(events.loc[mask, "event"])
+
+    def _snapshot_triples(self) -> DataFrame:
+        """Subject, predicate, object and literal of every triple in TRIPLES, built once"""
+        if self._triples is None:
+            parts = []
+            for name, (cls, id_col, literals, objects) in TRIPLES.items():
+                df = self.tables[name]
+                if cls is not None:
+                    parts.append(_triples(df, id_col, {id_col: "type"}, literal = False, objects = {id_col: cls}))
+                parts.append(_triples(df, id_col, literals, literal = True))
+                parts.append(_triples(df, id_col, objects, literal = False))
+
+            # Memberships link events to their participants
+            parts.append(_triples(self.tables["memberships"], "event", {"membership": "participantMembership"}, literal = False))
+            self._triples = concat(parts, ignore_index = True).drop_duplicates().reset_index(drop = True)
+        return self._triples
+
+    def _observation_triples(self, trajectories: list[str], start = None, end = None) -> tuple[DataFrame, DataFrame]:
+        """
+        The usesObservation links from trajectories to their observations and predictions within start / end,
+        and the types and literal properties of those observations
+        """
+        links, properties = [], []
+        for name, kind in PARTITIONED.items() if trajectories else ():
+            columns = {"mmsi": "mmsi", **self.OBSERVATION_PROPERTIES[kind]}
+            df = self._scan(name, ["observation", "trajectory", *columns], pc.field("trajectory").isin(trajectories), start, end)
+            links.append(_triples(df, "trajectory", {"observation": "usesObservation"}, literal = False))
+
+            df = df.drop_duplicates("observation")
+            cls = "AISObservation" if kind == "ais" else "PredictedObservation"
+            properties.append(_triples(df, "observation", {"observation": "type"}, literal = False, objects = {"observation": cls}))
+            properties.append(_triples(df, "observation", columns, literal = True))
+
+        empty = [DataFrame(columns = ["subject", "predicate", "object", "literal"])]
+        return concat(links or empty, ignore_index = True), concat(properties or empty, ignore_index = True)
+
+    def _scan(self, name: str, columns: list[str], condition = None, start = None, end = None, bbox: tuple = None) -> DataFrame:
+        """
+        Reads columns of a partitioned table, keeping rows matching condition and scope. Day partitions
+        outside start / end are skipped, and the remaining filters are checked against row group statistics
+        """
+        conditions = [] if condition is None else [condition]
+        if start is not None:
+            start = self._timestamp(start)
+            conditions += [pc.field("day") >= start.strftime("%Y-%m-%d"), pc.field("time") >= pa.scalar(start, TIME)]
+        if end is not None:
+            end = self._timestamp(end)
+            conditions += [pc.field("day") <= end.strftime("%Y-%m-%d"), pc.field("time") <= pa.scalar(end, TIME)]
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox)
+            conditions += [pc.field("lat") >= min_lat, pc.field("lat") <= max_lat]
+            if min_lon <= max_lon:
+                conditions += [pc.field("lon") >= min_lon, pc.field("lon") <= max_lon]
+            else:
+                conditions.append((pc.field("lon") >= min_lon) | (pc.field("lon") <= max_lon))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.datasets[name].to_table(columns = columns, filter = expression).to_pandas()
+
+def _export_queries(kg: KnowledgeGraph) -> dict[str, str]:
+    """Query dumping each unpartitioned table, with every property optional so nothing is lost"""
+    event_optionals = "\n".join(f"OPTIONAL {{ ?event :{predicate} ?{col} }}" for col, predicate in EVENT_COLUMNS.items())
+    return {
+        "vessels": """
+            SELECT ?vessel ?mmsi ?name ?flag ?type
+            WHERE {
+                ?vessel a :VesselIdentity .
+                OPTIONAL { ?vessel :mmsi ?mmsi }
+                OPTIONAL { ?vessel :vesselName ?name }
+                OPTIONAL { ?vessel :flag ?flag }
+                OPTIONAL { ?vessel :vesselType ?type }
+            }
+        """,
+        "trajectories": """
+            SELECT ?trajectory ?vessel ?traj_start ?traj_end ?last_lat ?last_lon
+            WHERE {
+                ?trajectory a :TrajectorySequence ;
+                    :forVessel ?vessel .
+                OPTIONAL { ?trajectory :hasFirstObservation ?obs_first . ?obs_first :timestamp ?traj_start }
+                OPTIONAL {
+                    ?trajectory :hasLastObservation ?obs_last .
+                    ?obs_last :timestamp ?traj_end ; :lat ?last_lat ; :lon ?last_lon
+                }
+            }
+        """,
+        "events": f"""
+            SELECT ?event ?wkt {" ".join(f"?{col}" for col in EVENT_COLUMNS)}
+            WHERE {{
+                ?event a :Event .
+                {event_optionals}
+                OPTIONAL {{ ?event :berthGeometry ?geom . ?geom :asWKT ?wkt }}
+            }}
+        """,
+        "memberships": """
+            SELECT ?event ?membership ?vessel
+            WHERE {
+                ?event a :Event ;
+                    :participantMembership ?membership .
+                OPTIONAL { ?membership :memberVessel ?vessel }
+            }
+        """,
+        "zones": """
+            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
+
+            SELECT ?zone ?code ?wkt
+            WHERE {
+                ?zone a :Zone ;
+                    :zoneGeometry ?geom .
+                ?geom geo:asWKT ?wkt .
+                OPTIONAL { ?zone :zoneCode ?code }
+            }
+        """,
+        "patterns": """
+            PREFIX geo: <http://www.opengis.net/ont/geosparql#>
+
+            SELECT ?pattern ?wkt
+            WHERE {
+                ?pattern a :MovementPattern ;
+                    :hasGeometry ?geom .
+                ?geom geo:asWKT ?wkt .
+            }
+        """
+    }
+
+def _observations_query(kg: KnowledgeGraph, kind: str, start = None, end = None, bbox: tuple = None) -> str:
+    """Query dumping every observation (or prediction) in scope, once per trajectory using it"""
+    obs_class = "AISObservation" if kind == "ais" else "PredictedObservation"
+    properties = kg.OBSERVATION_PROPERTIES[kind]
+    optionals = "\n".join(f"OPTIONAL {{ ?observation :{predicate} ?{col} }}" for col, predicate in properties.items())
+    return f"""
+        SELECT ?observation ?trajectory ?vessel ?mmsi {kg._select_vars(properties)}
+        WHERE {{
+            ?observation a :{obs_class} .
+            OPTIONAL {{ ?observation :mmsi ?mmsi }}
+            {optionals}
+            OPTIONAL {{ ?trajectory :usesObservation ?observation . OPTIONAL {{ ?trajectory :forVessel ?vessel }} }}
+            {kg._scope_filter("time", "lat", "lon", start, end, bbox)}
+        }}
+    """
+
+def _table(df: DataFrame, name: str) -> pa.Table:
+    """Converts a decoded frame to its table's schema (columns missing from the frame are all null)"""
+    schema = SCHEMAS[name]
+    columns = {}
+    for field in schema:
+        values = df[field.name] if field.name in df.columns else [None] * len(df)
+        if pa.types.is_string(field.type):
+            values = [None if value is None or value != value else str(value) for value in values]
+        columns[field.name] = pa.array(values, type = field.type, from_pandas = True)
+    return pa.table(columns, schema = schema)
+
+def _write_table(table: pa.Table, path: str) -> int:
+    pq.write_table(table, path, row_group_size = ROW_GROUP_SIZE)
+    return table.num_rows
+
+def _write_partitioned(df: DataFrame, name: str, path: str, batch: int) -> int:
+    """Writes one batch of observations into day partitions, sorted by vessel, trajectory and observation"""
+    table = _table(df, name)
+    if table.num_rows == 0:
+        return 0
+
+    table = table.sort_by([("vessel", "ascending"), ("trajectory", "ascending"), ("observation", "ascending")])
+    days = pc.strftime(table["time"], format = "%Y-%m-%d")
+    ds.write_dataset(
+        table.append_column("day", days),
+        path,
+        format = "parquet",
+        partitioning = ds.partitioning(DAY, flavor = "hive"),
+        basename_template = f"part-{batch}-{{i}}.parquet",
+        existing_data_behavior = "overwrite_or_ignore",
+        max_rows_per_group = ROW_GROUP_SIZE,
+        min_rows_per_group = min(ROW_GROUP_SIZE, table.num_rows),
+        preserve_order = True
+    )
+    return table.num_rows
+
+def _bbox_mask(df: DataFrame, lat_col: str, lon_col: str, bbox: tuple = None):
+    """Boolean mask of rows inside bbox (min_lon > max_lon crosses the antimeridian), like KnowledgeGraph._scope_filter"""
+    mask = np.ones(len(df), dtype = bool)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox)
+        lat, lon = df[lat_col], df[lon_col]
+        mask &= (lat >= min_lat) & (lat <= max_lat)
+        mask &= ((lon >= min_lon) & (lon <= max_lon)) if min_lon <= max_lon else ((lon >= min_lon) | (lon <= max_lon))
+    return mask
+
+def _triples(df: DataFrame, id_col: str, predicates: dict[str, str], literal: bool, objects: dict[str, str] = None) -> DataFrame:
+    """
+    Triples from the id column of df to each column -> predicate (its non-null values, as lexical forms if
+    literal), or to a fixed object per column if given, such as a class
+    """
+    parts = []
+    for col, predicate in predicates.items():
+        rows = df[list(dict.fromkeys([id_col, col]))].dropna()
+        values = [objects[col]] * len(rows) if objects is not None else [_lexical(value) for value in rows[col]]
+        parts.append(DataFrame({"subject": rows[id_col].astype(str).to_numpy(), "predicate": predicate, "object": values, "literal": literal}))
+    if not parts:
+        return DataFrame(columns = ["subject", "predicate", "object", "literal"])
+    return concat(parts, ignore_index = True).astype({"literal": bool})
+
+def _lexical(value) -> str:
+    """Lexical form of a table value, as the store writes it"""
+    if isinstance(value, Timestamp):
+        return value.isoformat()
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    return str(value)
+
+def _table_name(kind: str) -> str:
+    return next(name for name, table_kind in PARTITIONED.items() if table_kind == kind)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Export a knowledge graph to a columnar snapshot")
+    parser.add_argument("output", help = "Snapshot directory")
+    parser.add_argument("paths", nargs = "*", help = "RDF files to load (default: the AllegroGraph repository given by --repo)")
+    parser.add_argument("--repo", help = "AllegroGraph repository name")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--bbox", type = float, nargs = 4, metavar = ("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"))
+    args = parser.parse_args()
+
+    kg = KnowledgeGraph.from_files(*args.paths) if args.paths else KnowledgeGraph(args.repo)
+    counts = export(kg, args.output, args.start, args.end, args.bbox)
+    print(", ".join(f"{name}: {rows}" for name, rows in counts.items()))
+
+if __name__ == "__main__":
+    main()
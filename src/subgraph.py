@@ -0,0 +1,195 @@
+import json
+import re
+from collections import deque
+from pandas import DataFrame, Timedelta, Timestamp
+from KnowledgeGraph import KnowledgeGraph
+from metrics import traced
+
+# Links walked out from the encounter's vessels and zone, and triples kept for the prompt
+HOPS = 3
+MAX_TRIPLES = 150
+
+# Hours before the encounter's time block still retrieved, for recent port calls, gaps and loitering
+CONTEXT_HOURS = 24
+
+# Query solutions allowed per triple kept, bounding the work the store does for one encounter
+LIMIT_FACTOR = 20
+
+# Relevance of a node by class: vessels and events explain an encounter, raw track points least
+CLASS_WEIGHTS = {
+    "VesselIdentity": 4.0,
+    "Event": 3.0,
+    "Zone": 3.0,
+    "VesselType": 2.5,
+    "ProvenanceSource": 2.0,
+    "PredictedObservation": 1.5,
+    "AISObservation": 1.0,
+    "TrajectorySequence": 1.0,
+    "GroupMembership": 1.0,
+    "Group": 0.5,
+    "Geometry": 0.5
+}
+DEFAULT_WEIGHT = 1.0
+
+# Share of a node's relevance kept per link away from the encounter's vessels and zone
+HOP_DECAY = 0.5
+
+# Literal properties placing a node in time
+TIME_PROPERTIES = ("timestamp", "startTime", "endTime")
+
+def encounter_scope(record: dict) -> tuple[list[str], str, Timestamp, Timestamp]:
+    """
+    Vessels, zone and time block of an encounter record like those in synthetic_events.json
+    (DayUTC "2025-06-10", TimeBlockUTC "1200-1500Z"; a block ending before it starts ends the next day)
+    """
+    match = re.fullmatch(r"(\d{2})(\d{2})-(\d{2})(\d{2})Z?", record["TimeBlockUTC"])
+    if match is None:
+        raise ValueError(f"Unrecognized time block {record['TimeBlockUTC']!r}")
+
+    hour1, min1, hour2, min2 = (int(value) for value in match.groups())
+    day = Timestamp(record["DayUTC"], tz = "UTC")
+    start = day + Timedelta(hours = hour1, minutes = min1)
+    end = day + Timedelta(hours = hour2, minutes = min2)
+    if end <= start:
+        end += Timedelta(days = 1)
+
+    return [record["VesselA"]["Name"], record["VesselB"]["Name"]], record["Zone"], start, end
+
+@traced
+def encounter_subgraph(
+    kg: KnowledgeGraph,
+    vessels: list[str],
+    zone: str,
+    start,
+    end,
+    hops: int = HOPS,
+    max_triples: int = MAX_TRIPLES,
+    context_hours: float = CONTEXT_HOURS
+) -> DataFrame:
+    """
+    Retrieves the context of an encounter between vessels (ids or names) in zone (id or code) during
+    start / end: the hops-link neighborhood of the vessels and the zone (types, zone geometry, events,
+    provenance sources, trajectories, observations and predictions) from context_hours before start
+    until end, in one CONSTRUCT query against a store or from the tables of a snapshot (see
+    SnapshotKnowledgeGraph.neighborhood). Nodes are then ranked by relevance and kept whole, most
+    relevant first, up to max_triples triples (see rank)
+    """
+    start, end = kg._timestamp(start), kg._timestamp(end)
+    seeds = [*vessels, zone]
+    triples = kg.neighborhood(seeds, hops, start - Timedelta(hours = context_hours), end, max_triples * LIMIT_FACTOR)
+    return rank(triples, seeds, start, end, max_triples)
+
+def rank(triples: DataFrame, seeds: list[str], start = None, end = None, max_triples: int = MAX_TRIPLES) -> DataFrame:
+    """
+    Ranks the nodes of a neighborhood (see KnowledgeGraph.neighborhood) and keeps the triples of the
+    most relevant ones, up to max_triples. A node's relevance is its class weight (CLASS_WEIGHTS),
+    decayed by HOP_DECAY per link from the nearest seed and by its distance in time from start / end
+    (in multiples of the window's length), and never above the relevance of the node it is reached from,
+    so every kept node stays linked to a seed. Rows are subject, predicate, object, literal, hop and
+    score, grouped by node, most relevant first
+    """
+    columns = ["subject", "predicate", "object", "literal", "hop", "score"]
+    if triples.empty:
+        return DataFrame(columns = columns)
+
+    links = triples[~triples["literal"] & (triples["predicate"] != "type")]
+    neighbors = {}
+    for subject, obj in zip(links["subject"], links["object"]):
+        neighbors.setdefault(subject, set()).add(obj)
+        neighbors.setdefault(obj, set()).add(subject)
+
+    labels = triples[triples["literal"] & triples["predicate"].isin(KnowledgeGraph.SEED_LABELS)]
+    roots = set(seeds) | set(labels.loc[labels["object"].isin(seeds), "subject"])
+    hops = _hops([node for node in triples["subject"].unique() if node in roots], neighbors)
+
+    weights = _class_weights(triples)
+    distances = _time_distances(triples, start, end)
+
+    # Relevance in breadth-first order, capped by the best relevance among the nodes one link closer
+    scores = {}
+    for node, hop in sorted(hops.items(), key = lambda item: item[1]):
+        score = weights.get(node, DEFAULT_WEIGHT) * HOP_DECAY ** hop / (1 + distances.get(node, 0.0))
+        parents = [scores[other] for other in neighbors.get(node, ()) if hops.get(other) == hop - 1]
+        scores[node] = min(score, max(parents)) if parents else score
+
+    by_subject = {subject: df for subject, df in triples.groupby("subject", sort = False)}
+    kept, rows = set(), []
+    for node in sorted(scores, key = lambda node: (-scores[node], hops[node], node)):
+        own = by_subject.get(node)
+        node_rows = [] if own is None else [
+            row for row in own.itertuples(index = False)
+            if row.literal or row.predicate == "type" or row.object in kept
+        ]
+        # Links from kept nodes to this one
+        node_rows += [
+            row for other in neighbors.get(node, ()) if other in kept and other in by_subject
+            for row in by_subject[other].itertuples(index = False)
+            if not row.literal and row.object == node
+        ]
+        if len(rows) + len(node_rows) > max_triples:
+            break
+
+        kept.add(node)
+        rows += [(*row, hops[node], scores[node]) for row in node_rows]
+
+    return DataFrame(rows, columns = columns)
+
+def to_prompt(subgraph: DataFrame) -> str:
+    """Serializes a subgraph as compact JSON: {node: {predicate: value or list of values}}, in rank order"""
+    nodes = {}
+    for subject, predicate, obj in zip(subgraph["subject"], subgraph["predicate"], subgraph["object"]):
+        properties = nodes.setdefault(subject, {})
+        if predicate not in properties:
+            properties[predicate] = obj
+        elif isinstance(properties[predicate], list):
+            if obj not in properties[predicate]:
+                properties[predicate].append(obj)
+        elif properties[predicate] != obj:
+            properties[predicate] = [properties[predicate], obj]
+    return json.dumps(nodes, separators = (",", ":"), ensure_ascii = False)
+
+def _hops(roots: list[str], neighbors: dict[str, set]) -> dict[str, int]:
+    """Links from the nearest root to every node reachable from one"""
+    hops = {root: 0 for root in roots}
+    queue = deque(roots)
+    while queue:
+        node = queue.popleft()
+        for other in neighbors.get(node, ()):
+            if other not in hops:
+                hops[other] = hops[node] + 1
+                queue.append(other)
+    return hops
+
+def _class_weights(triples: DataFrame) -> dict[str, float]:
+    """Highest CLASS_WEIGHTS entry among each node's classes"""
+    types = triples[(triples["predicate"] == "type") & ~triples["literal"]]
+    weights = {}
+    for node, cls in zip(types["subject"], types["object"]):
+        if cls in CLASS_WEIGHTS:
+            weights[node] = max(weights.get(node, 0.0), CLASS_WEIGHTS[cls])
+    return weights
+
+def _time_distances(triples: DataFrame, start = None, end = None) -> dict[str, float]:
+    """
+    How far each timed node lies outside start / end, in multiples of the window's length
+    (0 for nodes overlapping it)
+    """
+    if start is None or end is None:
+        return {}
+    length = max((end - start).total_seconds(), 1.0)
+
+    times = triples[triples["literal"] & triples["predicate"].isin(TIME_PROPERTIES)]
+    spans = {}
+    for node, value in zip(times["subject"], times["object"]):
+        try:
+            time = Timestamp(value)
+        except ValueError:
+            continue
+        time = time.tz_localize("UTC") if time.tzinfo is None else time.tz_convert("UTC")
+        first, last = spans.get(node, (time, time))
+        spans[node] = (min(first, time), max(last, time))
+
+    return {
+        node: max((start - last).total_seconds(), (first - end).total_seconds(), 0.0) / length
+        for node, (first, last) in spans.items()
+    }
@@ -0,0 +1,330 @@
+import argparse
+import math
+import numpy as np
+from pandas import Timestamp
+
+# Vessel types, flags and name parts drawn from when generating vessels
+VESSEL_TYPES = {
+    "SmallTrawler": ("Small Trawler", "FISH_TRW_S"),
+    "ReeferCarrier": ("Reefer Carrier (Fish)", "CARR_REEF"),
+    "BunkerTanker": ("Bunker Tanker", "TANK_BUNK"),
+    "CoastGuard": ("Coast Guard Cutter", "LE_CG"),
+    "Longliner": ("Longliner", "FISH_LONG")
+}
+FLAGS = ["PH", "PAN", "MHL", "JPN", "VNM", "CHN", "KOR", "LBR", "IDN", "TWN"]
+NAMES = ["SEAFARER", "OCEAN", "SEA", "PACIFIC", "KAITO", "GOLDEN", "STAR", "CORAL", "MOTHER", "FUEL", "WIND", "MARU"]
+GEARS = ["Longline", "Trawl", "Purse seine", "Gillnet", "Pole and line"]
+WEATHER = [("Clear", "Calm"), ("Rain", "Moderate"), ("Squall", "High"), ("Typhoon", "Severe")]
+PORTS = ["Cebu North Port", "General Santos", "Cam Ranh", "Kaohsiung", "Majuro", "Suva"]
+
+# Zones are square cells of ZONE_DEGREES on a grid between +/-ZONE_LATITUDE, laid out from START_LON eastwards
+ZONE_DEGREES = 5.0
+ZONE_LATITUDE = 60.0
+START_LON = 100.0
+
+# Defaults of one 1x scale unit
+VESSELS = 10
+POINTS = 24
+ENCOUNTER_RATE = 0.3
+ZONES = 5
+EVENTS = 2
+PREDICTIONS = 2
+START_TIME = "2025-10-04T00:00:00Z"
+DAYS = 4
+
+# Mean minutes between a vessel's AIS positions
+INTERVAL_MIN = 30.0
+
+KM_PER_NM = 1.852
+KM_PER_DEGREE = 111.195
+
+PREFIXES = """@prefix : <http://example.org/maritime#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix geo: <http://www.opengis.net/ont/geosparql#> .
+"""
+
+def scaled(scale: int) -> dict:
+    """Generator settings for scale times the 1x unit: vessels, zones and therefore area grow together, so density stays the same"""
+    return {"vessels": VESSELS * scale, "zones": ZONES * scale}
+
+def generate(
+    path: str,
+    vessels: int = VESSELS,
+    points: int = POINTS,
+    encounter_rate: float = ENCOUNTER_RATE,
+    zones: int = ZONES,
+    events: int = EVENTS,
+    predictions: int = PREDICTIONS,
+    start: str = START_TIME,
+    days: float = DAYS,
+    seed: int = 0
+) -> dict:
+    """
+    Writes a synthetic knowledge graph following kg_schema.txt (in the layout of synthetic_kg.ttl) to a
+    Turtle file and returns counts of what was written. The same arguments always produce the same file.
+    vessels: vessel identities, each with one trajectory of points AIS observations and predictions predicted ones
+    encounter_rate: fraction of vessels that rendezvous with (come within a few km and minutes of) another vessel
+    zones: square zone polygons the vessels start in
+    events: mean number of gap, port visit, fishing and weather events per vessel
+    """
+    rng = np.random.default_rng(seed)
+    t0 = Timestamp(start).timestamp()
+    counts = {"vessels": vessels, "zones": zones, "observations": 0, "predictions": 0, "events": 0, "encounters": 0, "triples": 0}
+
+    with open(path, "w", encoding = "utf-8") as file:
+        def write(subject: str, *properties: str):
+            file.write(f"{subject} {' ; '.join(properties)} .\n")
+            counts["triples"] += len(properties)
+
+        file.write(PREFIXES)
+
+        for type_id, (name, code) in VESSEL_TYPES.items():
+            write(f":{type_id}", "a :VesselType", f':typeName "{name}"', f':typeCode "{code}"')
+
+        write(":SRC_AIS", "a :ProvenanceSource", ':sourceId "SRC_AIS"', ':sourceName "AIS_GlobalFeed"', ':sourceType "SensorNetwork"')
+        write(":SRC_WX", "a :ProvenanceSource", ':sourceId "SRC_WX"', ':sourceName "NOAA_Weather_API"', ':sourceType "WeatherFeed"')
+        write(":pattern_route_cluster", "a :PatternType", ':code "RTC"', ':name "RouteCluster"')
+
+        # Zones
+        boxes = _zone_boxes(zones)
+        for i, (min_lon, min_lat, max_lon, max_lat) in enumerate(boxes):
+            wkt = _polygon(min_lon, min_lat, max_lon, max_lat)
+            write(f":Zone_{i:04d}", "a :Zone", f':zoneCode "ZONE:{i:04d}"', f':zoneLabel "Synthetic zone {i}"', f":zoneGeometry :geom_zone_{i:04d}")
+            write(
+                f":geom_zone_{i:04d}", "a :Geometry, geo:Geometry", f':asWKT "{wkt}"',
+                f'geo:asWKT "<http://www.opengis.net/def/crs/EPSG/0/4326> {wkt}"^^geo:wktLiteral', ':crs "EPSG:4326"',
+                f':centroidLat "{(min_lat + max_lat) / 2}"^^xsd:decimal', f':centroidLon "{_lon(min_lon + ZONE_DEGREES / 2)}"^^xsd:decimal'
+            )
+
+        # Reference routes across every other zone
+        for i in range(0, zones, 2):
+            min_lon, min_lat, _, max_lat = boxes[i]
+            route = [(_lon(min_lon + ZONE_DEGREES * f), min_lat + (max_lat - min_lat) * (0.3 + 0.4 * f)) for f in (0.1, 0.4, 0.7, 0.9)]
+            wkt = "LINESTRING(" + ",".join(f"{lon:.3f} {lat:.3f}" for lon, lat in route) + ")"
+            write(f":geom_track_ref{i:04d}", "a :Geometry, geo:Geometry", f':asWKT "{wkt}"',
+                  f'geo:asWKT "<http://www.opengis.net/def/crs/EPSG/0/4326> {wkt}"^^geo:wktLiteral', ':crs "EPSG:4326"')
+            write(f":ref_track_{i:04d}", "a :MovementPattern", ":patternType :pattern_route_cluster", f":hasGeometry :geom_track_ref{i:04d}")
+
+        # Anchor (time, position, zone) of every track; rendezvous vessels anchor next to their partner's track
+        anchors = {}
+        partners = {}
+        order = rng.permutation(vessels)
+        n_pairs = int(round(vessels * encounter_rate / 2))
+        for pair in zip(order[:n_pairs], order[n_pairs:2 * n_pairs]):
+            a, b = sorted(map(int, pair))
+            partners[b] = a
+        counts["encounters"] = len(partners)
+
+        tracks = {}
+        for v in range(vessels):
+            vessel_id = f"Vessel_{v:05d}"
+            mmsi = f"{400000000 + v:09d}"
+            type_id = list(VESSEL_TYPES)[rng.integers(len(VESSEL_TYPES))]
+            name = f"{NAMES[rng.integers(len(NAMES))]} {NAMES[rng.integers(len(NAMES))]} {v}"
+            write(
+                f":{vessel_id}", "a :VesselIdentity", f':mmsi "{mmsi}"', f':vesselName "{name}"',
+                f':flag "{FLAGS[rng.integers(len(FLAGS))]}"', f":vesselType :{type_id}"
+            )
+
+            if v in partners:
+                # Meet the partner at one of its positions: within ~5 km and ~5 minutes
+                other = tracks[partners[v]]
+                k = int(rng.integers(len(other["t"])))
+                anchors[v] = (
+                    other["t"][k] + rng.uniform(-300, 300),
+                    other["lat"][k] + rng.uniform(-0.03, 0.03),
+                    _lon(other["lon"][k] + rng.uniform(-0.03, 0.03)),
+                    other["zone"]
+                )
+            else:
+                zone = int(rng.integers(zones)) if zones else -1
+                min_lon, min_lat, max_lon, max_lat = boxes[zone] if zones else (0.0, 0.0, 1.0, 1.0)
+                anchors[v] = (
+                    t0 + rng.uniform(0.25, 0.75) * days * 86400,
+                    rng.uniform(min_lat + 1, max_lat - 1),
+                    _lon(min_lon + rng.uniform(1, ZONE_DEGREES - 1)),
+                    zone
+                )
+
+            track = tracks[v] = _track(rng, *anchors[v][:3], points)
+            track["zone"] = anchors[v][3]
+
+            # AIS observations
+            obs_ids = [f"ais_{v:05d}_{k:04d}" for k in range(points)]
+            for k, obs_id in enumerate(obs_ids):
+                write(
+                    f":{obs_id}", "a :AISObservation", f':obsId "{obs_id}"', f':mmsi "{mmsi}"',
+                    f':lat "{track["lat"][k]:.5f}"^^xsd:decimal', f':lon "{track["lon"][k]:.5f}"^^xsd:decimal',
+                    f':speed "{track["speed"][k]:.1f}"^^xsd:decimal', f':course "{track["course"][k]:.0f}"^^xsd:decimal',
+                    f':distanceFromPort_km "{track["port"][k]:.1f}"^^xsd:decimal',
+                    f':distanceFromShore_km "{track["shore"][k]:.1f}"^^xsd:decimal',
+                    ':source "AIS_GlobalFeed"', f':timestamp "{_iso(track["t"][k])}"^^xsd:dateTime'
+                )
+            counts["observations"] += points
+
+            # Predictions continue the track past its last position
+            pred_ids = [f"pred_{v:05d}_{k:04d}" for k in range(predictions)]
+            lat, lon, course, speed, t = track["lat"][-1], track["lon"][-1], track["course"][-1], track["speed"][-1], track["t"][-1]
+            for k, pred_id in enumerate(pred_ids):
+                minutes = INTERVAL_MIN * (k + 1)
+                lat, lon = _step(lat, lon, course, speed * KM_PER_NM * INTERVAL_MIN / 60)
+                write(
+                    f":{pred_id}", "a :PredictedObservation", f":forVessel :{vessel_id}",
+                    f':timestamp "{_iso(t + minutes * 60)}"^^xsd:dateTime',
+                    f':lat "{lat:.5f}"^^xsd:decimal', f':lon "{lon:.5f}"^^xsd:decimal',
+                    f':sog "{speed:.1f}"^^xsd:decimal', f':cog "{course:.0f}"^^xsd:decimal',
+                    ':modelVersion "v1.2.3"', ':predictionMethod "TransformerTrajectory"',
+                    f':predictionTimeGenerated "{_iso(t)}"^^xsd:dateTime'
+                )
+            counts["predictions"] += predictions
+
+            uses = ", ".join(f":{i}" for i in obs_ids + pred_ids)
+            write(
+                f":traj_{v:05d}", "a :TrajectorySequence", f":forVessel :{vessel_id}",
+                f":hasFirstObservation :{obs_ids[0]}", f":hasLastObservation :{obs_ids[-1]}",
+                f':observationCount "{points}"^^xsd:integer', f":usesObservation {uses}"
+            )
+
+            # Events overlapping the track, placed where its matching rules in KnowledgeGraph will find them
+            last_zone = _zone_of(boxes, track["lat"][-1], track["lon"][-1])
+            for e in range(rng.poisson(events)):
+                counts["events"] += 1
+                event_id = f"{v:05d}_{e:02d}"
+                kind = rng.integers(4)
+                start_t = rng.uniform(track["t"][0], track["t"][-1])
+                end_t = start_t + rng.uniform(0.5, 8) * 3600
+                zone = last_zone if last_zone is not None else track["zone"]
+                common = [
+                    ':hasProvenance :SRC_AIS' if kind != 3 else ':hasProvenance :SRC_WX',
+                    f":location :Zone_{zone:04d}" if zone >= 0 else None,
+                    f':startTime "{_iso(start_t)}"^^xsd:dateTime', f':endTime "{_iso(end_t)}"^^xsd:dateTime'
+                ]
+                common = [p for p in common if p]
+
+                if kind == 0:
+                    hours = (end_t - start_t) / 3600
+                    distance = rng.uniform(1, 80)
+                    write(f":group_gap_{event_id}", "a :Group", ':groupType "GapActor"')
+                    write(f":gm_gap_{event_id}", "a :GroupMembership", f":memberVessel :{vessel_id}", ':membershipRole "solo"', f":memberOf :group_gap_{event_id}")
+                    write(
+                        f":gap_{event_id}", "a :Event", f':eventId "gap_{event_id}"', ':eventType "AISGapEvent"', *common,
+                        f':gapDistance_km "{distance:.1f}"^^xsd:decimal', f':gapDuration_hours "{hours:.2f}"^^xsd:decimal',
+                        f':gapImpliedSpeed_knots "{distance / KM_PER_NM / hours:.1f}"^^xsd:decimal',
+                        f':gapIntentionalDisabling "{str(bool(rng.random() < 0.2)).lower()}"^^xsd:boolean',
+                        f':numPositions12HoursBeforeSat "{rng.integers(0, 20)}"^^xsd:integer',
+                        f':positionsPerDaySatReception "{rng.uniform(1, 20):.1f}"^^xsd:decimal',
+                        f":participantMembership :gm_gap_{event_id}"
+                    )
+                elif kind == 1:
+                    # Berth within a few km of the track's last position
+                    lat, lon = _step(track["lat"][-1], track["lon"][-1], rng.uniform(0, 360), rng.uniform(0, 10))
+                    write(f":geom_berth_{event_id}", "a :Geometry, geo:Geometry", f':asWKT "POINT({lon:.4f} {lat:.4f})"',
+                          f'geo:asWKT "<http://www.opengis.net/def/crs/EPSG/0/4326> POINT({lon:.4f} {lat:.4f})"^^geo:wktLiteral', ':crs "EPSG:4326"')
+                    write(
+                        f":port_{event_id}", "a :Event", f':eventId "port_{event_id}"', ':eventType "PortVisitEvent"',
+                        f':portName "{PORTS[rng.integers(len(PORTS))]}"', f":berthGeometry :geom_berth_{event_id}", *common,
+                        f':startDistanceFromPort_km "{rng.uniform(0, 5):.1f}"^^xsd:decimal', f':endDistanceFromPort_km "{rng.uniform(0, 1):.1f}"^^xsd:decimal',
+                        f':startDistanceFromShore_km "{rng.uniform(0, 5):.1f}"^^xsd:decimal', f':endDistanceFromShore_km "{rng.uniform(0, 1):.1f}"^^xsd:decimal'
+                    )
+                elif kind == 2:
+                    write(
+                        f":fish_{event_id}", "a :Event", f':eventId "fish_{event_id}"', ':eventType "FishingEvent"', *common,
+                        f':fishingEffortScore "{rng.uniform(0, 1):.2f}"^^xsd:decimal', f':gearType "{GEARS[rng.integers(len(GEARS))]}"'
+                    )
+                else:
+                    weather, severity = WEATHER[rng.integers(len(WEATHER))]
+                    write(
+                        f":wx_{event_id}", "a :Event", f':eventId "wx_{event_id}"', ':eventType "WeatherEvent"',
+                        f':weatherType "{weather}"', f':severity "{severity}"', *common
+                    )
+
+    return counts
+
+def _track(rng: np.random.Generator, t: float, lat: float, lon: float, points: int) -> dict:
+    """A random-walk track of points positions passing through (lat, lon) at time t"""
+    before = int(rng.integers(points))
+    gaps = rng.uniform(0.5, 1.5, points - 1) * INTERVAL_MIN * 60
+    times = t + np.concatenate([[0.0], np.cumsum(gaps)]) - (np.sum(gaps[:before]) if before else 0.0)
+
+    speed = np.clip(rng.normal(8, 3, points), 0, 20)
+    course = (rng.uniform(0, 360) + np.cumsum(rng.normal(0, 15, points))) % 360
+
+    lats, lons = np.empty(points), np.empty(points)
+    lats[before], lons[before] = lat, lon
+    for k in range(before + 1, points):
+        km = speed[k - 1] * KM_PER_NM * (times[k] - times[k - 1]) / 3600
+        lats[k], lons[k] = _step(lats[k - 1], lons[k - 1], course[k - 1], km)
+    for k in range(before - 1, -1, -1):
+        km = speed[k] * KM_PER_NM * (times[k + 1] - times[k]) / 3600
+        lats[k], lons[k] = _step(lats[k + 1], lons[k + 1], (course[k] + 180) % 360, km)
+
+    port = rng.uniform(5, 800) + np.cumsum(rng.normal(0, 5, points))
+    return {
+        "t": times, "lat": lats, "lon": lons, "speed": speed, "course": course,
+        "port": np.abs(port), "shore": np.abs(port) * rng.uniform(0.2, 0.6)
+    }
+
+def _step(lat: float, lon: float, course: float, km: float) -> tuple[float, float]:
+    """Position km along course (degrees true) from (lat, lon), on a local flat approximation"""
+    rad = math.radians(course)
+    lat2 = max(min(lat + km * math.cos(rad) / KM_PER_DEGREE, 89.9), -89.9)
+    lon2 = lon + km * math.sin(rad) / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat2, _lon(lon2)
+
+def _zone_boxes(zones: int) -> list[tuple]:
+    """(min_lon, min_lat, max_lon, max_lat) of each zone, filling rows of the grid from the equator outwards"""
+    rows = int(2 * ZONE_LATITUDE // ZONE_DEGREES)
+    lats = sorted((-ZONE_LATITUDE + r * ZONE_DEGREES for r in range(rows)), key = lambda lat: abs(lat + ZONE_DEGREES / 2))
+    cols = int(360 // ZONE_DEGREES)
+    boxes = []
+    for i in range(zones):
+        row, col = divmod(i, cols)
+        min_lat = lats[row % rows]
+        min_lon = _lon(START_LON + col * ZONE_DEGREES)
+        boxes.append((min_lon, min_lat, min_lon + ZONE_DEGREES, min_lat + ZONE_DEGREES))
+    return boxes
+
+def _zone_of(boxes: list[tuple], lat: float, lon: float) -> int | None:
+    for i, (min_lon, min_lat, max_lon, max_lat) in enumerate(boxes):
+        if min_lat <= lat <= max_lat and (min_lon <= lon <= max_lon or min_lon <= lon + 360 <= max_lon):
+            return i
+    return None
+
+def _polygon(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> str:
+    """WKT of a box; boxes crossing the antimeridian keep eastern longitudes past 180"""
+    ring = [(min_lon, min_lat), (max_lon, min_lat), (max_lon, max_lat), (min_lon, max_lat), (min_lon, min_lat)]
+    return "POLYGON((" + ",".join(f"{lon:.1f} {lat:.1f}" for lon, lat in ring) + "))"
+
+def _lon(lon: float) -> float:
+    """Wraps a longitude into [-180, 180)"""
+    return (lon + 180) % 360 - 180
+
+def _iso(t: float) -> str:
+    return Timestamp(t, unit = "s", tz = "UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Write a seeded synthetic maritime knowledge graph as Turtle")
+    parser.add_argument("path")
+    parser.add_argument("--scale", type = int, help = "Multiple of the 1x unit (sets --vessels and --zones)")
+    parser.add_argument("--vessels", type = int, default = VESSELS)
+    parser.add_argument("--points", type = int, default = POINTS)
+    parser.add_argument("--encounter-rate", type = float, default = ENCOUNTER_RATE)
+    parser.add_argument("--zones", type = int, default = ZONES)
+    parser.add_argument("--events", type = float, default = EVENTS)
+    parser.add_argument("--predictions", type = int, default = PREDICTIONS)
+    parser.add_argument("--start", default = START_TIME)
+    parser.add_argument("--days", type = float, default = DAYS)
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    settings = {
+        "vessels": args.vessels, "points": args.points, "encounter_rate": args.encounter_rate, "zones": args.zones,
+        "events": args.events, "predictions": args.predictions, "start": args.start, "days": args.days, "seed": args.seed
+    }
+    if args.scale:
+        settings.update(scaled(args.scale))
+    print(generate(args.path, **settings))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+from pandas import DataFrame
+from geometry import parse_wkt, points_in_polygon
+
+class ZoneIndex:
+    """
+    Point-in-zone lookups against a fixed set of zone polygons.
+    Polygons are parsed once into coordinate rings with bounding boxes. A lookup sorts the query
+    points by longitude once, binary-searches each zone's longitude range, filters by latitude,
+    and only runs the exact ray-casting test on points inside the zone's bounding box.
+    """
+
+    def __init__(self, zones: DataFrame):
+        """Builds the index from a frame with "zone" and "wkt" columns"""
+        self.zones = []
+        self.rings = []
+        bounds = []
+
+        for zone, wkt in zip(zones["zone"], zones["wkt"]):
+            kind, rings = parse_wkt(wkt)
+            if kind != "POLYGON" or not rings:
+                continue
+
+            outer = rings[0]
+            self.zones.append(zone)
+            self.rings.append(rings)
+            bounds.append((outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()))
+
+        self.bounds = np.array(bounds, dtype = float).reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def lookup(self, lat, lon) -> DataFrame:
+        """
+        Returns one (point, zone) row for every point inside every zone,
+        where point is the position of the coordinate in the input arrays
+        """
+        lat, lon, order, sorted_lon = self._prepare(lat, lon)
+        points, zones = [], []
+
+        for k, zone in enumerate(self.zones):
+            inside = self._points_in_zone(k, lat, lon, order, sorted_lon)
+            points.append(inside)
+            zones.extend([zone] * len(inside))
+
+        if not points:
+            return DataFrame({"point": np.empty(0, dtype = np.int64), "zone": []})
+        return DataFrame({"point": np.concatenate(points), "zone": zones})
+
+    def contains(self, zone: str, lat, lon) -> np.ndarray:
+        """Returns a boolean mask of which points fall inside one zone"""
+        lat, lon, order, sorted_lon = self._prepare(lat, lon)
+        mask = np.zeros(lat.shape, dtype = bool)
+
+        if zone in self.zones:
+            mask[self._points_in_zone(self.zones.index(zone), lat, lon, order, sorted_lon)] = True
+        return mask
+
+    def _prepare(self, lat, lon) -> tuple:
+        """Converts coordinates to arrays and sorts them by longitude"""
+        lat = np.asarray(lat, dtype = float).ravel()
+        lon = np.asarray(lon, dtype = float).ravel()
+        order = np.argsort(lon, kind = "stable")
+        return lat, lon, order, lon[order]
+
+    def _points_in_zone(self, k: int, lat, lon, order, sorted_lon) -> np.ndarray:
+        """Returns the positions of the points inside the k-th zone"""
+        min_lon, min_lat, max_lon, max_lat = self.bounds[k]
+
+        lo = np.searchsorted(sorted_lon, min_lon, side = "left")
+        hi = np.searchsorted(sorted_lon, max_lon, side = "right")
+        candidates = order[lo:hi]
+        candidates = candidates[(lat[candidates] >= min_lat) & (lat[candidates] <= max_lat)]
+
+        return candidates[points_in_polygon(lon[candidates], lat[candidates], self.rings[k])]